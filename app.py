@@ -4,19 +4,35 @@
 #   streamlit
 #   curl_cffi
 #   beautifulsoup4
+#   lxml (optional, faster parser)
+#
+# Scraping, caching and scoring live in engine.py, which runs without Streamlit.
 
-import csv
-import io
 import json
 import re
-from collections import Counter
-
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+from html import escape
+
+import numpy as np
 import streamlit as st
 import streamlit.components.v1 as components
-from bs4 import BeautifulSoup
-from curl_cffi import requests as cf_requests
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+
+import metrics
+from engine import (
+    _BACKGROUND_SECTIONS, _SECTION_KEYS, ProductContent, ProductRecord, _asin_from_url, _background_fetcher,
+    _build_csv, _compute_best_value, _content_table, _http_pool, _image_cache, _price_float, _price_history,
+    _WATCH_ENABLED, _product_cache, _single_flight, _watcher, fetch_amazon_data,
+)
 
 st.set_page_config(layout="wide", page_title="Amazon Comparison", initial_sidebar_state="collapsed")
+metrics.serve()     # /metrics when SCRAPER_METRICS_PORT is set
+if _WATCH_ENABLED:
+    _watcher().start()  # SCRAPER_WATCH=1: keep opened products fresh in the cache
 st.title("🛍️ Amazon Product Comparison")
 
 st.markdown(
@@ -47,9 +63,13 @@ if "visible_fields"   not in st.session_state: st.session_state.visible_fields
 if "product_data"     not in st.session_state: st.session_state.product_data     = []
 if "num_columns"      not in st.session_state: st.session_state.num_columns      = 2
 if "show_debug"       not in st.session_state: st.session_state.show_debug       = False
+if "swr"              not in st.session_state: st.session_state.swr              = True
 if "_params_loaded"   not in st.session_state: st.session_state._params_loaded   = False
+if "derived_key"      not in st.session_state: st.session_state.derived_key      = None
+if "table_mode"       not in st.session_state: st.session_state.table_mode       = False
 
 # ── Load URLs from shareable query params (once per session) ──
+_TABLE_AUTO_COLUMNS = 8     # a link with more products than this opens in table mode
 if not st.session_state._params_loaded:
     params = st.query_params
     if "urls" in params:
@@ -58,6 +78,7 @@ if not st.session_state._params_loaded:
         if url_list:
             st.session_state.product_data = [{"url": u} for u in url_list]
             st.session_state.num_columns  = len(url_list)
+            st.session_state.table_mode   = len(url_list) > _TABLE_AUTO_COLUMNS
     st.session_state._params_loaded = True
 
 
@@ -71,6 +92,10 @@ def _sync_checkboxes_to_visible():
 # ─────────────────────────────────────────────────────────────
 def display_field_selector():
     with st.sidebar.expander("DISPLAY OPTIONS", expanded=True):
+        st.session_state.table_mode = st.checkbox(
+            "Table mode", value=st.session_state.table_mode, key="chk_table_mode",
+            help="One sortable grid with a row per product — for comparing many products at once."
+        )
         if st.button("✅ Default Options"):
             st.session_state.visible_fields = DEFAULT_FIELDS.copy()
             _sync_checkboxes_to_visible()
@@ -86,6 +111,12 @@ def display_field_selector():
                 new_visible.append(field)
         st.session_state.visible_fields = new_visible
 
+    with st.sidebar.expander("DATA", expanded=False):
+        st.session_state.swr = st.checkbox(
+            "Show cached data while refreshing", value=st.session_state.swr, key="chk_swr",
+            help="Stale-while-revalidate: expired fields are shown right away and updated on the next rerun."
+        )
+
     with st.sidebar.expander("DEBUG", expanded=False):
         st.session_state.show_debug = st.checkbox(
             "Show debug panel", value=st.session_state.show_debug, key="chk_debug"
@@ -93,462 +124,166 @@ def display_field_selector():
 
 
 # ─────────────────────────────────────────────────────────────
-# Keyword extractor for review sentiment
+# Diff helper
 # ─────────────────────────────────────────────────────────────
-_STOP = {
-    "i","me","my","we","our","you","your","he","him","his","she","her","it","its",
-    "they","them","their","this","that","these","those","am","is","are","was","were",
-    "be","been","being","have","has","had","do","does","did","a","an","the","and",
-    "but","if","or","as","of","at","by","for","with","about","to","from","in","out",
-    "on","off","so","than","too","very","can","will","just","now","not","no","nor",
-    "also","get","got","one","like","would","use","used","using","really","much",
-    "many","even","still","way","work","works","worked","product","item","bought",
-    "buy","great","good","bad","well","could","should","would","there","here","when",
-    "what","which","who","how","all","both","some","more","most","other","same",
-    "then","than","up","down","into","s","t","re","ve","ll","d","m",
-}
-
-def _keywords(text: str, n: int = 7) -> list:
-    words = re.findall(r"\b[a-z]{3,}\b", text.lower())
-    freq  = Counter(w for w in words if w not in _STOP)
-    return [w for w, _ in freq.most_common(n)]
+_DIFF_COLOR = np.array(["red", "gray", "green"])
+_DIFF_SIGN  = np.array(["-", "±", "+"])
 
-
-# ─────────────────────────────────────────────────────────────
-# Star percentage parser
-# ─────────────────────────────────────────────────────────────
-def _parse_star_percentages(soup: BeautifulSoup) -> dict:
-    result = {}
-    for li in soup.select("#histogramTable li"):
-        a     = li.select_one("a[aria-label]")
-        meter = li.select_one(".a-meter[aria-valuenow]")
-        if not (a and meter):
-            continue
-        label = a.get("aria-label", "")
-        star_m = re.search(r"(\d+)\s+star", label, re.IGNORECASE)
-        pct_v  = meter.get("aria-valuenow")
-        if star_m and pct_v is not None:
-            result[f"{int(star_m.group(1))}_star_percentage"] = int(pct_v)
-    return result
+def _diff_htmls(vals, fmt, higher_is_better=True) -> list:
+    """Each column's diff HTML against every other column, from one pairwise array pass."""
+    v     = np.array([np.nan if x is None else x for x in vals], dtype=float)
+    diff  = v[:, None] - v[None, :]
+    known = ~np.isnan(diff)
+    np.fill_diagonal(known, False)
+    sign  = np.sign(np.where(known, diff, 0)).astype(int)
+    color = _DIFF_COLOR[(sign if higher_is_better else -sign) + 1].tolist()
+    mark  = _DIFF_SIGN[sign + 1].tolist()
+    size  = np.abs(diff).tolist()
+    return ["".join(f"<span style='color:{color[i][j]};font-size:0.82em'> [{j+1}]{mark[i][j]}{fmt(size[i][j])}</span>"
+                    for j in np.flatnonzero(known[i]).tolist())
+            for i in range(len(v))]
 
 
 # ─────────────────────────────────────────────────────────────
-# Price helper
+# Diffs + best value — recomputed only when a column's data changes
 # ─────────────────────────────────────────────────────────────
-def _price_float(price_str: str) -> float | None:
-    try:
-        return float(re.sub(r"[^\d.]", "", str(price_str)))
-    except Exception:
-        return None
+@dataclass(slots=True)
+class _Derived:
+    """A column's standing against the others, kept apart from its ``ProductRecord``."""
+    score:         int | None = None
+    rank:          int | None = None
+    medal:         str = ""
+    price_diff:    str = ""      # HTML
+    rating_diff:   str = ""
+    positive_diff: str = ""
 
 
-# ─────────────────────────────────────────────────────────────
-# Main scraper
-# ─────────────────────────────────────────────────────────────
-@st.cache_data(show_spinner=False)
-def fetch_amazon_data(url: str) -> dict:
-    data: dict = {}
-    try:
-        r    = cf_requests.get(url, impersonate="chrome120", timeout=20,
-                               headers={"Accept-Language": "en-US,en;q=0.9"})
-        soup = BeautifulSoup(r.text, "html.parser")
-
-        # ── Basic fields ──────────────────────────────────────
-        title = soup.select_one("#productTitle")
-        data["name"] = title.get_text(strip=True) if title else "N/A"
-
-        price = soup.select_one(".a-price .a-offscreen")
-        data["pricing"] = price.get_text(strip=True) if price else "N/A"
-
-        rating = soup.select_one("#acrPopover")
-        data["average_rating"] = (
-            rating["title"].split()[0] if rating and rating.get("title") else "N/A"
-        )
-        reviews = soup.select_one("#acrCustomerReviewText")
-        data["total_reviews"] = (
-            int(re.sub(r"[^\d]", "", reviews.get_text())) if reviews else None
-        )
-        data.update(_parse_star_percentages(soup))
+_NOT_RANKED = _Derived()
 
-        # ── Stock images ──────────────────────────────────────
-        matches = re.findall(r'"hiRes":"(https://[^"]+)"', r.text)
-        if matches:
-            data["images"] = list(dict.fromkeys(matches))
-        else:
-            imgs = []
-            for el in soup.select("#altImages img"):
-                src   = el.get("src", "")
-                large = re.sub(r"\._[A-Z0-9_,]+_\.", "._AC_SL1500_.", src)
-                if large.startswith("https"):
-                    imgs.append(large)
-            if not imgs:
-                main = soup.select_one("#landingImage")
-                if main and main.get("src"):
-                    imgs = [main["src"]]
-            data["images"] = imgs
-
-        # ── ASIN ─────────────────────────────────────────────
-        asin_m = re.search(r"/(?:dp|product|gp/product)/([A-Z0-9]{10})", url)
-        asin   = asin_m.group(1) if asin_m else None
-        data["asin"] = asin or ""
-
-        # ── Review images ─────────────────────────────────────
-        product_img_set = set(data.get("images", []))
-
-        def _scrape_review_imgs(html_text, soup_obj):
-            seen, found = set(), []
-            def _add(u):
-                if not u: return
-                u = u.split("?")[0]
-                if "media-amazon.com/images/I/" not in u: return
-                u = re.sub(r"\._[A-Z0-9_,]+_\.", "._SL1000_.", u)
-                if u not in seen: seen.add(u); found.append(u)
-            for el in soup_obj.select("[data-lazyimagesource]"):
-                _add(el.get("data-lazyimagesource", ""))
-            for el in soup_obj.select("[data-mediaid]"):
-                mid = el.get("data-mediaid", "").strip()
-                if mid and re.match(r"^[A-Za-z0-9+/]{8,20}$", mid):
-                    _add(f"https://m.media-amazon.com/images/I/{mid}.jpg")
-            for img in soup_obj.select('img[alt^="Customer Image"]'):
-                src = img.get("src") or img.get("data-src") or ""
-                if "transparent-pixel" in src or "grey-pixel" in src: continue
-                _add(src)
-            for img in soup_obj.select("[data-hook='review-image-tile'] img, [data-hook='review'] img, #cm_cr-review_list img"):
-                if img.find_parent(class_=re.compile(r"a-profile|avatar", re.I)): continue
-                if img.find_parent(attrs={"data-hook": "genome-widget"}): continue
-                src = img.get("src") or img.get("data-src") or ""
-                if "transparent-pixel" in src or "grey-pixel" in src: continue
-                if re.search(r"\._(?:SX|SY|UX|UY)[1-4]\d[_.]", src): continue
-                if re.search(r"_UR\d{1,2},\d{1,2}_", src): continue
-                _add(src)
-            if not found:
-                for _t, large in re.findall(
-                    r'"thumb"\s*:\s*"(https://[^"]+)"[^}]{0,300}?"large"\s*:\s*"(https://[^"]+)"', html_text
-                ):
-                    if not re.search(r"\._(?:SX|SY)[1-4]\d[_.]", large): _add(large)
-            return found
-
-        rev_imgs = _scrape_review_imgs(r.text, soup)
-        if asin:
-            try:
-                rev_r    = cf_requests.get(
-                    f"https://www.amazon.com/product-reviews/{asin}"
-                    f"?filterByStar=all_stars&mediaType=media_reviews_only&pageNumber=1",
-                    impersonate="chrome120", timeout=15,
-                    headers={"Accept-Language": "en-US,en;q=0.9"})
-                rev_soup = BeautifulSoup(rev_r.text, "html.parser")
-                rev_imgs += _scrape_review_imgs(rev_r.text, rev_soup)
-            except Exception:
-                pass
-        data["review_images"] = [u for u in list(dict.fromkeys(rev_imgs)) if u not in product_img_set]
-
-        # ── Customers Say ─────────────────────────────────────
-        customers_say = "N/A"
-        for sel in ("[data-testid='overall-summary']",
-                    "[data-hook='cr-insights-widget-summary']",
-                    ".cr-lighthouse-summary",
-                    "[data-hook='cr-insights-widget-aspects']"):
-            el = soup.select_one(sel)
-            if el:
-                text = re.sub(r"^Customers\s+say\s*", "", el.get_text(strip=True), flags=re.IGNORECASE).strip()
-                if text: customers_say = text; break
-        data["customers_say"] = {"summary": customers_say}
-
-        # ── Seller info ───────────────────────────────────────
-        seller_name = "N/A"
-        for sel in ("#merchant-info a", "#sellerProfileTriggerId",
-                    "#tabular-buybox [tabindex='0']", "#buybox-see-all-buying-choices-announce"):
-            el = soup.select_one(sel)
-            if el:
-                t = el.get_text(strip=True)
-                if t and len(t) < 80:
-                    seller_name = t; break
-        # Check if sold directly by Amazon
-        buybox_txt = (soup.select_one("#tabular-buybox-container") or
-                      soup.select_one("#merchant-info") or
-                      soup.select_one("#desktop_buyBox"))
-        sold_by_amazon = "Amazon" in (buybox_txt.get_text() if buybox_txt else "")
-        data["seller"] = {"name": seller_name, "is_amazon": sold_by_amazon}
-
-        # ── Arrival / delivery date ───────────────────────────
-        arrival = "N/A"
-        for sel in ("#mir-layout-DELIVERY_BLOCK span.a-text-bold",
-                    "#ddmDeliveryMessage .a-text-bold",
-                    "[data-csa-c-delivery-promise-type] .a-text-bold",
-                    "#deliveryBlockMessage .a-text-bold"):
-            el = soup.select_one(sel)
-            if el:
-                arrival = el.get_text(strip=True); break
-        if arrival == "N/A":
-            # Broader fallback — grab first delivery block text
-            for sel in ("#mir-layout-DELIVERY_BLOCK", "#ddmDeliveryMessage"):
-                el = soup.select_one(sel)
-                if el:
-                    t = el.get_text(" ", strip=True)[:120]
-                    if t: arrival = t; break
-        data["arrival_date"] = arrival
-
-        # ── Variants ─────────────────────────────────────────
-        variants: dict = {}
-        for grp in soup.select("#twister .a-form-group, #variation_color_name, #variation_size_name"):
-            label = grp.select_one(".a-form-label, .a-declarative label")
-            opts  = [li.get_text(strip=True) for li in grp.select("li")
-                     if li.get_text(strip=True) and len(li.get_text(strip=True)) < 50]
-            # Fallback: span/option text
-            if not opts:
-                opts = [s.get_text(strip=True) for s in grp.select("span.selection, option")
-                        if s.get_text(strip=True)]
-            if label and opts:
-                variants[label.get_text(strip=True).rstrip(":")] = opts[:20]
-        data["variants"] = variants
-
-        # ── Frequently bought together ────────────────────────
-        fbt = []
-        for item in soup.select("#frequently-bought-together .a-list-item, "
-                                 "#sims-fbt .a-list-item"):
-            name_el  = item.select_one(".a-truncate-full, .a-size-small.a-color-base")
-            price_el = item.select_one(".a-price .a-offscreen")
-            img_el   = item.select_one("img")
-            if name_el:
-                fbt.append({
-                    "name":  name_el.get_text(strip=True)[:80],
-                    "price": price_el.get_text(strip=True) if price_el else "N/A",
-                    "img":   img_el.get("src", "") if img_el else "",
-                })
-        data["frequently_bought_together"] = fbt[:4]
-
-        # ── Brand / availability / features / description / categories ──
-        brand = soup.select_one("#bylineInfo")
-        data["brand"] = brand.get_text(strip=True) if brand else "N/A"
-
-        avail = soup.select_one("#availability span")
-        data["availability"] = avail.get_text(strip=True) if avail else "N/A"
-
-        data["features"] = [
-            li.get_text(strip=True)
-            for li in soup.select("#feature-bullets li span.a-list-item")
-            if li.get_text(strip=True)
-        ]
-
-        desc = soup.select_one("#productDescription")
-        data["description"] = desc.get_text(strip=True) if desc else "N/A"
-
-        crumbs = [c.get_text(strip=True)
-                  for c in soup.select("#wayfinding-breadcrumbs_container li span")
-                  if c.get_text(strip=True) not in ("", "›")]
-        data["categories"] = " > ".join(crumbs) if crumbs else "N/A"
-
-        data["_debug_histogram_html"] = str(soup.select_one("#histogramTable") or "")[:3000]
-
-        # ── Used offers (separate request) ────────────────────
-        used_offers = []
-        if asin:
-            try:
-                used_r    = cf_requests.get(
-                    f"https://www.amazon.com/gp/offer-listing/{asin}/?f_used=true",
-                    impersonate="chrome120", timeout=15,
-                    headers={"Accept-Language": "en-US,en;q=0.9"})
-                used_soup = BeautifulSoup(used_r.text, "html.parser")
-                for offer in used_soup.select(".a-row.olpOffer, [data-asin] .a-section")[:6]:
-                    price_el     = offer.select_one(".olpOfferPrice, .a-price .a-offscreen")
-                    ship_el      = offer.select_one(".olpShippingPrice")
-                    free_ship_el = offer.select_one(".olpFreeShipping, .a-color-success")
-                    cond_el      = offer.select_one(".olpCondition, .a-size-medium.a-color-base")
-                    seller_el    = offer.select_one(".olpSellerName a, .a-profile-name")
-                    if not price_el:
-                        continue
-                    price_str = price_el.get_text(strip=True)
-                    if free_ship_el and "free" in free_ship_el.get_text(strip=True).lower():
-                        ship_str = "FREE"
-                    elif ship_el:
-                        ship_str = ship_el.get_text(strip=True)
-                    else:
-                        ship_str = "FREE"
-                    cond_str   = cond_el.get_text(strip=True)[:40] if cond_el else "Used"
-                    seller_str = seller_el.get_text(strip=True)[:40] if seller_el else ""
-                    used_offers.append({
-                        "price":   price_str,
-                        "ship":    ship_str,
-                        "cond":    cond_str,
-                        "seller":  seller_str,
-                    })
-            except Exception:
-                pass
-        data["used_offers"] = used_offers
-
-        # ── Review sentiment (5★ praise + 1★ complaints) ──────
-        sentiment = {"positive": [], "negative": []}
-        if asin:
-            for star, key in (("five_star", "positive"), ("one_star", "negative")):
-                try:
-                    sr   = cf_requests.get(
-                        f"https://www.amazon.com/product-reviews/{asin}?filterByStar={star}&pageNumber=1",
-                        impersonate="chrome120", timeout=12,
-                        headers={"Accept-Language": "en-US,en;q=0.9"})
-                    ss   = BeautifulSoup(sr.text, "html.parser")
-                    body = " ".join(
-                        el.get_text(" ", strip=True)
-                        for el in ss.select('[data-hook="review-body"]')
-                    )
-                    sentiment[key] = _keywords(body, n=8)
-                except Exception:
-                    pass
-        data["review_sentiment"] = sentiment
-
-    except Exception as exc:
-        data["_error"] = str(exc)
-
-    return data
+# Every record field the derived metrics read
+_DERIVED_INPUTS = ("price", "rating", "pct_4", "pct_5", "total_reviews", "arrival_date")
 
-
-# ─────────────────────────────────────────────────────────────
-# Diff helper
-# ─────────────────────────────────────────────────────────────
-def _diff_html(idx, products, get_val, fmt, higher_is_better=True):
-    cur = get_val(products[idx])
-    if cur is None:
-        return ""
-    html = ""
-    for j, other in enumerate(products):
-        if j == idx: continue
-        other = get_val(other)
-        if other is None: continue
-        diff  = cur - other
-        color = ("green" if diff > 0 else "red" if diff < 0 else "gray") if higher_is_better \
-                else ("green" if diff < 0 else "red" if diff > 0 else "gray")
-        sign  = "+" if diff > 0 else "-" if diff < 0 else "±"
-        html += f"<span style='color:{color};font-size:0.82em'> [{j+1}]{sign}{fmt(abs(diff))}</span>"
-    return html
+def _derived_key(products) -> tuple:
+    return tuple((p.get("url"), (r := p.get("record")) and tuple(getattr(r, f) for f in _DERIVED_INPUTS))
+                 for p in products)
 
 
-# ─────────────────────────────────────────────────────────────
-# Best value scorer
-# ─────────────────────────────────────────────────────────────
-def _compute_best_value(products):
-    """Score each product: price (40%) > review count (30%) > rating (20%) > arrival (10%)."""
-    def norm(vals, higher_better=True):
-        valid = [v for v in vals if v is not None]
-        if len(valid) < 2:
-            return [0.5 if v is not None else None for v in vals]
-        mn, mx = min(valid), max(valid)
-        if mx == mn:
-            return [0.5 if v is not None else None for v in vals]
-        return [((v - mn) / (mx - mn) if higher_better else (mx - v) / (mx - mn))
-                if v is not None else None for v in vals]
-
-    prices   = [_price_float(p.get("json", {}).get("pricing", "")) for p in products]
-    ratings  = [_price_float(p.get("json", {}).get("average_rating", "")) for p in products]
-    rev_cnts = [p.get("json", {}).get("total_reviews") for p in products]
-
-    # Arrival: extract first number (day of month) as a rough proxy for sooner = better
-    def _arrival_days(p):
-        txt = p.get("json", {}).get("arrival_date", "")
-        m   = re.search(r"\b(\d{1,2})\b", txt)
-        return int(m.group(1)) if m else None
-    arrivals = [_arrival_days(p) for p in products]
-
-    p_norm = norm(prices,   higher_better=False)
-    r_norm = norm(ratings,  higher_better=True)
-    c_norm = norm(rev_cnts, higher_better=True)
-    a_norm = norm(arrivals, higher_better=False)
-
-    scores = []
-    for i in range(len(products)):
-        parts = [
-            (p_norm[i], 0.40),
-            (c_norm[i], 0.30),
-            (r_norm[i], 0.20),
-            (a_norm[i], 0.10),
-        ]
-        total_w = sum(w for v, w in parts if v is not None)
-        if total_w == 0:
-            scores.append(None)
-        else:
-            s = sum(v * w for v, w in parts if v is not None) / total_w
-            scores.append(round(s * 100))
-    return scores
-
-
-# ─────────────────────────────────────────────────────────────
-# Diffs + best value — called each render
-# ─────────────────────────────────────────────────────────────
 def update_all_diffs():
     products = st.session_state.product_data
-
-    for p in products:
-        p["pricing_float"] = _price_float(p.get("json", {}).get("pricing", ""))
-    for idx in range(len(products)):
-        products[idx]["price_diff_html"] = _diff_html(
-            idx, products, get_val=lambda p: p.get("pricing_float"),
-            fmt=lambda v: f"${v:.2f}", higher_is_better=False)
-
-    for p in products:
-        p["rating_float"] = _price_float(p.get("json", {}).get("average_rating", ""))
-    for idx in range(len(products)):
-        products[idx]["rating_diff_html"] = _diff_html(
-            idx, products, get_val=lambda p: p.get("rating_float"),
-            fmt=lambda v: f"{v:.1f}", higher_is_better=True)
-
-    for p in products:
-        pj   = p.get("json", {})
-        pct4 = pj.get("4_star_percentage") or 0
-        pct5 = pj.get("5_star_percentage") or 0
-        p["positive_pct"] = (pct4 + pct5) if (pct4 or pct5) else None
-    for idx in range(len(products)):
-        products[idx]["positive_pct_diff_html"] = _diff_html(
-            idx, products, get_val=lambda p: p.get("positive_pct"),
-            fmt=lambda v: f"{int(v)}%", higher_is_better=True)
+    key      = _derived_key(products)
+    if key == st.session_state.derived_key and all("derived" in p for p in products):
+        return     # the values written last time are still on the column dicts
+    st.session_state.derived_key = key
+
+    records = [p.get("record") for p in products]
+    diffs   = {name: _diff_htmls([r and get_val(r) for r in records], fmt, higher) for name, get_val, fmt, higher in (
+        ("price_diff",    lambda r: r.price,        lambda v: f"${v:.2f}",   False),
+        ("rating_diff",   lambda r: r.rating,       lambda v: f"{v:.1f}",    True),
+        ("positive_diff", lambda r: r.positive_pct, lambda v: f"{int(v)}%", True),
+    )}
 
     # Best value
-    scores  = _compute_best_value(products)
+    scores  = _compute_best_value(records)
     medals  = ["🏆", "🥈", "🥉"]
     ranked  = sorted(
         [(i, s) for i, s in enumerate(scores) if s is not None],
         key=lambda x: -x[1]
     )
-    for p in products:
-        p["best_value_score"]  = None
-        p["best_value_medal"]  = ""
-        p["best_value_rank"]   = None
-    for rank, (i, s) in enumerate(ranked):
-        products[i]["best_value_score"] = s
-        products[i]["best_value_medal"] = medals[rank] if rank < 3 else f"#{rank+1}"
-        products[i]["best_value_rank"]  = rank + 1
+    rank_of = {i: rank for rank, (i, _s) in enumerate(ranked)}
+    for i, p in enumerate(products):
+        rank = rank_of.get(i)
+        p["derived"] = _Derived(
+            score=scores[i], rank=None if rank is None else rank + 1,
+            medal="" if rank is None else medals[rank] if rank < 3 else f"#{rank+1}",
+            **{name: html[i] for name, html in diffs.items()})
 
 
 # ─────────────────────────────────────────────────────────────
-# CSV export helper
+# Batch loader — every pending column in parallel, one rerun
 # ─────────────────────────────────────────────────────────────
-def _build_csv(products) -> str:
-    buf     = io.StringIO()
-    writer  = csv.writer(buf)
-    headers = ["Field"] + [f"Product {i+1}" for i in range(len(products))]
-    writer.writerow(headers)
-    fields_map = {
-        "Name":         lambda d: d.get("name", ""),
-        "Price":        lambda d: d.get("pricing", ""),
-        "Rating":       lambda d: d.get("average_rating", ""),
-        "Reviews":      lambda d: str(d.get("total_reviews", "")),
-        "Brand":        lambda d: d.get("brand", ""),
-        "Availability": lambda d: d.get("availability", ""),
-        "Seller":       lambda d: (d.get("seller") or {}).get("name", ""),
-        "Arrival":      lambda d: d.get("arrival_date", ""),
-        "Description":  lambda d: d.get("description", "")[:200],
-        "URL":          lambda d: d.get("url", ""),
-    }
-    for label, fn in fields_map.items():
-        row = [label]
-        for p in products:
-            pdata = p.get("json") or {}
-            pdata["url"] = p.get("url", "")
-            row.append(fn(pdata))
-        writer.writerow(row)
-    return buf.getvalue()
+_MAX_COLUMN_WORKERS = 6
+
+# Display fields that need a section beyond the product page
+_FIELD_SECTIONS = {
+    "ReviewImages":    "media_reviews",
+    "UsedPrices":      "used_offers",
+    "ReviewSentiment": "sentiment",
+}
+
+def _wanted_sections() -> set:
+    return {"page"} | {_FIELD_SECTIONS[f] for f in st.session_state.visible_fields if f in _FIELD_SECTIONS}
+
+
+def _load(url, sections) -> ProductRecord:
+    return ProductRecord.from_data(fetch_amazon_data(url, stale_ok=st.session_state.swr,
+                                                     background=_BACKGROUND_SECTIONS, sections=sections), url)
+
+
+def load_pending_columns():
+    # Only the product page is waited for; the slower sections fill in afterwards.
+    products = st.session_state.product_data
+    pending  = [p for p in products if p.get("url") and "record" not in p]
+    if not pending:
+        return
+    ctx    = get_script_run_ctx()
+    wanted = _wanted_sections()
+    with st.spinner(f"Loading {len(pending)} product{'s' if len(pending) > 1 else ''}…"):
+        with ThreadPoolExecutor(max_workers=min(_MAX_COLUMN_WORKERS, len(pending)),
+                                thread_name_prefix="column",
+                                initializer=lambda: add_script_run_ctx(threading.current_thread(), ctx)) as pool:
+            results = list(pool.map(lambda u: _load(u, wanted), [p["url"] for p in pending]))
+    for p, record in zip(pending, results):
+        p["record"], p["sections"] = record, wanted
+        if _WATCH_ENABLED and record.asin and not record.error:
+            _watcher().watch(record.asin, p["url"])
+    st.rerun()
+
+
+def _landed(product) -> bool:
+    """Has a background section of this column finished, or stored partial results, since it was last loaded?"""
+    record = product.get("record")
+    asin   = _asin_from_url(product.get("url", ""))
+    return bool(record and record.inflight and asin) and (
+        set(record.inflight) != _background_fetcher().inflight(asin)
+        or record.version != _product_cache().version(asin))
+
+
+def merge_background_sections():
+    """Pull in sections that landed, and sections a newly ticked field needs."""
+    wanted = _wanted_sections()
+    for p in st.session_state.product_data:
+        if "record" not in p:
+            continue
+        if _landed(p) or not wanted <= p.get("sections", set()):
+            p["sections"] = wanted | p.get("sections", set())
+            p["record"]   = _load(p["url"], p["sections"])
+
+
+@st.fragment(run_every=1.0)
+def poll_background_sections():
+    if any(_landed(p) for p in st.session_state.product_data):
+        st.rerun(scope="app")
 
 
 # ─────────────────────────────────────────────────────────────
 # Per-product header
 # ─────────────────────────────────────────────────────────────
+_SECTION_LABELS = {
+    "page":          "💲 Price & details",
+    "used_offers":   "♻️ Used offers",
+    "media_reviews": "🖼️ Review images",
+    "sentiment":     "💬 Review sentiment",
+}
+
+def _refresh_column(idx, sections=None):
+    product = st.session_state.product_data[idx]
+    asin    = _asin_from_url(product.get("url", ""))
+    if asin:
+        _product_cache().invalidate(asin, sections)
+    product.pop("record", None)
+    st.rerun()
+
+
 def render_header(idx, product):
     num_cols  = st.session_state.num_columns
     label_col, url_col = st.columns([1, 6])
@@ -566,6 +301,11 @@ def render_header(idx, product):
                 st.session_state.product_data.pop(idx)
                 st.session_state.num_columns -= 1
                 st.rerun()
+            if product.get("url"):
+                st.caption("Refresh only")
+                for section, label in _SECTION_LABELS.items():
+                    if st.button(label, key=f"refresh_{section}_{idx}"):
+                        _refresh_column(idx, [section])
 
     with url_col:
         url = st.text_input("", value=product.get("url", ""),
@@ -574,7 +314,7 @@ def render_header(idx, product):
 
     if url != product.get("url"):
         st.session_state.product_data[idx]["url"] = url
-        st.session_state.product_data[idx].pop("json", None)
+        st.session_state.product_data[idx].pop("record", None)
         st.rerun()
     st.session_state.product_data[idx]["url"] = url
 
@@ -591,117 +331,171 @@ def render_header(idx, product):
                         'border:1px solid #333;opacity:0.4"></div>', unsafe_allow_html=True)
     with btn_r:
         if st.button("🔄", key=f"refresh_{idx}", use_container_width=True, help="Refresh"):
-            st.cache_data.clear()
-            st.session_state.product_data[idx].pop("json", None)
-            st.rerun()
-
-    if url and "json" not in product:
-        with st.spinner("Loading…"):
-            st.session_state.product_data[idx]["json"] = fetch_amazon_data(url)
-            st.rerun()
+            _refresh_column(idx)
 
 
 # ─────────────────────────────────────────────────────────────
 # Gallery (lightbox with prev/next)
 # ─────────────────────────────────────────────────────────────
+# Runs in the page itself (not an iframe): one overlay and one delegated click
+# handler serve every gallery, each of which is plain markdown HTML.
 _LIGHTBOX_JS = """
-function lbOpen(src, allSrcs, startIdx) {
-    var par = window.parent;
-    var doc = par.document;
-    var ov  = doc.getElementById('__lb_ov');
-    if (!ov) {
-        ov = doc.createElement('div');
-        ov.id = '__lb_ov';
+(function () {
+    var imgs = [], idx = 0, ov, img, ctr, prev, next;
+    function mkBtn(html, extra) {
+        var b = document.createElement('button');
+        b.innerHTML = html;
+        b.style.cssText = 'position:fixed;color:#fff;background:rgba(255,255,255,0.13);border:none;border-radius:50%;width:52px;height:52px;font-size:1.5rem;cursor:pointer;display:flex;align-items:center;justify-content:center;transition:background .18s;' + extra;
+        b.onmouseenter = function(){ this.style.background='rgba(255,255,255,0.28)'; };
+        b.onmouseleave = function(){ this.style.background='rgba(255,255,255,0.13)'; };
+        return b;
+    }
+    function build() {
+        ov = document.createElement('div');
         ov.style.cssText = 'display:none;position:fixed;inset:0;background:rgba(0,0,0,0.92);z-index:2147483647;align-items:center;justify-content:center;';
-        ov.addEventListener('click', function(e){ if(e.target===ov) par.__lbClose(); });
-        function mkBtn(id, html, extra) {
-            var b = doc.createElement('button');
-            b.id = id; b.innerHTML = html;
-            b.style.cssText = 'position:fixed;color:#fff;background:rgba(255,255,255,0.13);border:none;border-radius:50%;width:52px;height:52px;font-size:1.5rem;cursor:pointer;display:flex;align-items:center;justify-content:center;transition:background .18s;' + extra;
-            b.onmouseenter = function(){ this.style.background='rgba(255,255,255,0.28)'; };
-            b.onmouseleave = function(){ this.style.background='rgba(255,255,255,0.13)'; };
-            return b;
-        }
-        var prev = mkBtn('__lb_prev','&#10094;','left:16px;top:50%;transform:translateY(-50%);');
-        var next = mkBtn('__lb_next','&#10095;','right:16px;top:50%;transform:translateY(-50%);');
-        var cls  = mkBtn('__lb_cls','&#x2715;','top:14px;right:14px;width:40px;height:40px;font-size:1.1rem;');
-        prev.addEventListener('click', function(e){ e.stopPropagation(); par.__lbNav(-1); });
-        next.addEventListener('click', function(e){ e.stopPropagation(); par.__lbNav(1); });
-        cls.addEventListener('click',  function(e){ e.stopPropagation(); par.__lbClose(); });
-        var img = doc.createElement('img');
-        img.id = '__lb_img';
+        ov.addEventListener('click', function(e){ if (e.target === ov) close(); });
+        prev = mkBtn('&#10094;', 'left:16px;top:50%;transform:translateY(-50%);');
+        next = mkBtn('&#10095;', 'right:16px;top:50%;transform:translateY(-50%);');
+        var cls = mkBtn('&#x2715;', 'top:14px;right:14px;width:40px;height:40px;font-size:1.1rem;');
+        prev.addEventListener('click', function(e){ e.stopPropagation(); nav(-1); });
+        next.addEventListener('click', function(e){ e.stopPropagation(); nav(1); });
+        cls.addEventListener('click',  function(e){ e.stopPropagation(); close(); });
+        img = document.createElement('img');
         img.style.cssText = 'max-width:86vw;max-height:84vh;border-radius:8px;object-fit:contain;box-shadow:0 8px 60px rgba(0,0,0,0.9);cursor:default;user-select:none;';
         img.addEventListener('click', function(e){ e.stopPropagation(); });
-        var ctr = doc.createElement('div');
-        ctr.id = '__lb_ctr';
+        ctr = document.createElement('div');
         ctr.style.cssText = 'position:fixed;bottom:18px;left:50%;transform:translateX(-50%);color:rgba(255,255,255,0.75);font-size:0.85rem;font-family:system-ui,sans-serif;background:rgba(0,0,0,0.55);padding:3px 14px;border-radius:20px;pointer-events:none;white-space:nowrap;';
         ov.appendChild(prev); ov.appendChild(img); ov.appendChild(next); ov.appendChild(cls); ov.appendChild(ctr);
-        doc.body.appendChild(ov);
-        doc.addEventListener('keydown', function(e){
-            if (e.key==='Escape') par.__lbClose();
-            if (e.key==='ArrowLeft')  par.__lbNav && par.__lbNav(-1);
-            if (e.key==='ArrowRight') par.__lbNav && par.__lbNav(1);
-        });
+        document.body.appendChild(ov);
     }
-    par.__lbImgs = (allSrcs && allSrcs.length) ? allSrcs : [src];
-    par.__lbIdx  = (typeof startIdx === 'number') ? startIdx : 0;
-    par.__lbClose = function() { var o=doc.getElementById('__lb_ov'); if(o) o.style.display='none'; };
-    par.__lbNav   = function(dir) {
-        par.__lbIdx = (par.__lbIdx + dir + par.__lbImgs.length) % par.__lbImgs.length;
-        var i=doc.getElementById('__lb_img'), c=doc.getElementById('__lb_ctr');
-        if(i) i.src = par.__lbImgs[par.__lbIdx];
-        if(c) c.textContent = (par.__lbIdx+1)+' / '+par.__lbImgs.length;
-    };
-    var imgEl=doc.getElementById('__lb_img'), ctrEl=doc.getElementById('__lb_ctr');
-    var prvEl=doc.getElementById('__lb_prev'), nxtEl=doc.getElementById('__lb_next');
-    if(imgEl) imgEl.src = src;
-    if(ctrEl) ctrEl.textContent = (par.__lbIdx+1)+' / '+par.__lbImgs.length;
-    var showNav = par.__lbImgs.length > 1;
-    if(prvEl) prvEl.style.display = showNav ? 'flex' : 'none';
-    if(nxtEl) nxtEl.style.display = showNav ? 'flex' : 'none';
-    ov.style.display = 'flex';
-}
+    function show() {
+        img.src = imgs[idx];    // the full-size rendition is only requested here
+        ctr.textContent = (idx + 1) + ' / ' + imgs.length;
+        prev.style.display = next.style.display = imgs.length > 1 ? 'flex' : 'none';
+    }
+    function open(list, start) {
+        if (!ov) build();
+        imgs = list; idx = start; show();
+        ov.style.display = 'flex';
+    }
+    function close() { if (ov) { ov.style.display = 'none'; img.removeAttribute('src'); } }
+    function nav(dir) { idx = (idx + dir + imgs.length) % imgs.length; show(); }
+    document.addEventListener('click', function(e){
+        var t = e.target.closest && e.target.closest('.lb-gallery img[data-full]');
+        if (!t) return;
+        var all = Array.prototype.slice.call(t.closest('.lb-gallery').querySelectorAll('img[data-full]'));
+        open(all.map(function(i){ return i.dataset.full; }), all.indexOf(t));
+    });
+    document.addEventListener('keydown', function(e){
+        if (!ov || ov.style.display === 'none') return;
+        if (e.key === 'Escape')     close();
+        if (e.key === 'ArrowLeft')  nav(-1);
+        if (e.key === 'ArrowRight') nav(1);
+    });
+})();
 """
 
 _GALLERY_CSS = """<style>
-* { box-sizing:border-box; margin:0; padding:0; }
-body { background:transparent; overflow-x:hidden; }
-.gallery { display:flex; overflow-x:auto; gap:8px; padding:4px 2px 10px 2px;
-           scrollbar-width:thin; scrollbar-color:#555 transparent; }
-.gallery::-webkit-scrollbar { height:5px; }
-.gallery::-webkit-scrollbar-thumb { background:#555; border-radius:3px; }
-.gallery img { height:130px; border-radius:6px; flex-shrink:0; cursor:zoom-in;
-               transition:transform .14s ease, box-shadow .14s ease; display:block; }
-.gallery img:hover { transform:scale(1.05); box-shadow:0 4px 18px rgba(0,0,0,.55); }
+.lb-gallery { display:flex; overflow-x:auto; gap:8px; padding:4px 2px 10px 2px;
+              scrollbar-width:thin; scrollbar-color:#555 transparent; }
+.lb-gallery::-webkit-scrollbar { height:5px; }
+.lb-gallery::-webkit-scrollbar-thumb { background:#555; border-radius:3px; }
+.lb-gallery img { height:130px; border-radius:6px; flex-shrink:0; cursor:zoom-in;
+                  transition:transform .14s ease, box-shadow .14s ease; display:block; }
+.lb-gallery img:hover { transform:scale(1.05); box-shadow:0 4px 18px rgba(0,0,0,.55); }
 </style>"""
 
-def _render_gallery(imgs: list, label: str = "Images") -> None:
+def install_lightbox() -> None:
+    """Add the lightbox script to the page once; later reruns find it already there."""
+    st.markdown(_GALLERY_CSS, unsafe_allow_html=True)
+    components.html(
+        "<script>(function(){ var doc = window.parent.document;"
+        " if (doc.getElementById('__lb_script')) return;"
+        " var s = doc.createElement('script'); s.id = '__lb_script';"
+        f" s.textContent = {json.dumps(_LIGHTBOX_JS)}; doc.head.appendChild(s); }})();</script>",
+        height=0)
+
+
+# Amazon serves any rendition of an image from the same name: ``<id>._<size>_.jpg``
+_RENDITION = re.compile(r"\._[^/]*?_?(\.[a-z]+)$", re.I)
+
+def _rendition(url: str, size: str) -> str:
+    return _RENDITION.sub(rf"._{size}_\1", url) if _RENDITION.search(url) else url
+
+def _full_size(url: str) -> str:
+    return url if re.search(r"\._[^/]*SL1[05]00_", url) else _rendition(url, "SL1000")
+
+
+# With static serving on (.streamlit/config.toml), images come from the server's own cache.
+# Root-relative under the base path: the table's image cells don't resolve relative URLs.
+_LOCAL_IMAGES = bool(st.get_option("server.enableStaticServing"))
+_BASE_PATH    = (st.get_option("server.baseUrlPath") or "").strip("/")
+_STATIC_IMG   = f"/{_BASE_PATH}/app/static/img/" if _BASE_PATH else "/app/static/img/"
+
+def _image_srcs(url: str) -> tuple:
+    """``(thumbnail, full size)`` URLs for an Amazon image — local copies once the cache has them."""
+    full  = _full_size(url)
+    files = _image_cache().files(full) if _LOCAL_IMAGES else None
+    if files:
+        return tuple(_STATIC_IMG + name for name in files)
+    return _rendition(url, "SY260"), full
+
+
+def _render_gallery(imgs: tuple, label: str = "Images") -> None:
     if not imgs:
         st.markdown(f"<span style='color:#666;font-size:0.9em'>{label}: <em>not available</em></span>",
                     unsafe_allow_html=True)
         return
-    imgs_json = json.dumps(imgs)
     thumbs = "".join(
-        f'<img src="{u}" alt="" loading="lazy" onclick="lbOpen(this.src,_imgs,{i})">'
-        for i, u in enumerate(imgs)
-    )
-    components.html(
-        _GALLERY_CSS + f'<div class="gallery">{thumbs}</div>'
-        + f"<script>var _imgs={imgs_json};\n{_LIGHTBOX_JS}</script>",
-        height=162, scrolling=False
+        f'<img src="{escape(thumb)}" data-full="{escape(full)}" alt="" loading="lazy" decoding="async">'
+        for thumb, full in map(_image_srcs, imgs)
     )
+    st.markdown(f'<div class="lb-gallery">{thumbs}</div>', unsafe_allow_html=True)
 
 
 # ─────────────────────────────────────────────────────────────
 # Field renderer
 # ─────────────────────────────────────────────────────────────
+_HISTORY_WINDOW = 90 * 24 * 60 * 60     # the PriceHistory chart's time span, seconds
+
+# Scraped keys behind each displayed field
+_FIELD_KEYS = {
+    "BestValue":                ("pricing", "average_rating", "total_reviews", "arrival_date"),
+    "Title":                    ("name",),
+    "Price":                    ("pricing", "arrival_date"),
+    "UsedPrices":               ("used_offers",),
+    "Rating":                   ("average_rating", "total_reviews", "4_star_percentage", "5_star_percentage"),
+    "Customers Say":            ("customers_say",),
+    "ReviewSentiment":          ("review_sentiment",),
+    "SellerInfo":               ("seller",),
+    "Variants":                 ("variants",),
+    "FrequentlyBoughtTogether": ("frequently_bought_together",),
+    "ImageGallery":             ("images",),
+    "ReviewImages":             ("review_images",),
+}
+
+def _field_pending(field, record) -> bool:
+    if not record.pending:
+        return False
+    keys = {k for section in record.pending for k in _SECTION_KEYS[section]}
+    return not keys.isdisjoint(_FIELD_KEYS.get(field, (field.lower(),)))
+
+
+def render_stale_marker(field, product):
+    stale = getattr(product.get("record"), "stale", ())
+    if stale and not set(_FIELD_KEYS.get(field, (field.lower(),))).isdisjoint(stale):
+        st.caption("⟳ cached — refreshing")
+
+
 def render_field_cell(field, product):
-    url          = product.get("url", "")
-    product_data = product.get("json")
+    url     = product.get("url", "")
+    record  = product.get("record")
+    derived = product.get("derived") or _NOT_RANKED
 
     if not url:          st.empty(); return
-    if product_data is None: st.caption("⏳ Loading…"); return
-    if "_error" in product_data: st.warning(f"⚠️ {product_data['_error']}"); return
+    if record is None:   st.caption("⏳ Loading…"); return
+    if record.error:     st.warning(f"⚠️ {record.error}"); return
+    if _field_pending(field, record): st.caption("⏳ Loading…"); return
 
     def _na(label):
         st.markdown(f"<span style='color:#666;font-size:0.9em'>{label}: <em>not available</em></span>",
@@ -709,9 +503,7 @@ def render_field_cell(field, product):
 
     # ── BestValue ─────────────────────────────────────────────
     if field == "BestValue":
-        score = product.get("best_value_score")
-        medal = product.get("best_value_medal", "")
-        rank  = product.get("best_value_rank")
+        score, medal, rank = derived.score, derived.medal, derived.rank
         if score is None:
             _na("Best Value")
             return
@@ -730,7 +522,7 @@ def render_field_cell(field, product):
 
     # ── Title ─────────────────────────────────────────────────
     elif field == "Title":
-        v = str(product_data.get("name") or "")
+        v = record.name
         if not v or v == "N/A": _na("Title")
         else:
             st.markdown(f"<div style='font-size:14pt;font-weight:bold'>"
@@ -738,9 +530,9 @@ def render_field_cell(field, product):
 
     # ── Price ─────────────────────────────────────────────────
     elif field == "Price":
-        price = product_data.get("pricing", "")
-        diff  = product.get("price_diff_html", "")
-        arr   = product_data.get("arrival_date", "")
+        price = record.pricing
+        diff  = derived.price_diff
+        arr   = record.arrival_date
         if not price or price == "N/A": _na("Price")
         else:
             html = f"💰 <strong>{price}</strong> &nbsp;{diff}"
@@ -750,7 +542,7 @@ def render_field_cell(field, product):
 
     # ── UsedPrices ────────────────────────────────────────────
     elif field == "UsedPrices":
-        offers = product_data.get("used_offers", [])
+        offers = record.used_offers
         if not offers:
             _na("Used prices")
             return
@@ -786,29 +578,32 @@ def render_field_cell(field, product):
 
     # ── PriceHistory ──────────────────────────────────────────
     elif field == "PriceHistory":
-        asin = product_data.get("asin", "")
+        asin = record.asin
         if not asin:
             _na("Price history")
             return
-        chart_url = f"https://charts.camelcamelcamel.com/us/{asin}/amazon-new-used.png?forceNew=1"
-        ccc_url   = f"https://camelcamelcamel.com/product/{asin}"
-        st.markdown(
-            f'<a href="{ccc_url}" target="_blank">'
-            f'<img src="{chart_url}" style="width:100%;border-radius:6px;cursor:pointer" '
-            f'alt="Price history chart" title="View on CamelCamelCamel"/></a>',
-            unsafe_allow_html=True
-        )
+        hist = _price_history().range(asin, time.time() - _HISTORY_WINDOW)
+        seen = [v for v in hist["new"] if v is not None]
+        if not seen:
+            st.caption("Price history: nothing recorded yet — it builds up as this product is fetched.")
+            return
+        st.caption(f"Low **${min(seen):.2f}** · high **${max(seen):.2f}** · {len(hist['at'])} checks since "
+                   f"{time.strftime('%b %d', time.localtime(hist['at'][0]))}")
+        if len(hist["at"]) > 1:
+            st.line_chart({"time": [datetime.fromtimestamp(t) for t in hist["at"]],
+                           "New": hist["new"], "Used": hist["used"]},
+                          x="time", y=["New", "Used"], height=180)
 
     # ── Rating ────────────────────────────────────────────────
     elif field == "Rating":
-        rating    = product_data.get("average_rating", "")
-        raw_count = product_data.get("total_reviews")
+        rating    = record.average_rating
+        raw_count = record.total_reviews
         count_str = (f"{(raw_count//100)*100}+" if isinstance(raw_count, int) and raw_count >= 100
                      else str(raw_count) if isinstance(raw_count, int) else None)
-        pct_4 = int(product_data.get("4_star_percentage") or 0)
-        pct_5 = int(product_data.get("5_star_percentage") or 0)
-        r_diff   = product.get("rating_diff_html", "")
-        pos_diff = product.get("positive_pct_diff_html", "")
+        pct_4 = int(record.pct_4 or 0)
+        pct_5 = int(record.pct_5 or 0)
+        r_diff   = derived.rating_diff
+        pos_diff = derived.positive_diff
         if not rating or rating == "N/A": _na("Rating")
         else:
             lines = f"⭐ <strong>{rating}</strong>"
@@ -825,13 +620,13 @@ def render_field_cell(field, product):
 
     # ── Customers Say ─────────────────────────────────────────
     elif field == "Customers Say":
-        summary = (product_data.get("customers_say") or {}).get("summary", "")
+        summary = record.customers_say
         if not summary or summary == "N/A": _na("Customers say")
         else: st.markdown(summary)
 
     # ── ReviewSentiment ───────────────────────────────────────
     elif field == "ReviewSentiment":
-        sent = product_data.get("review_sentiment", {})
+        sent = record.review_sentiment
         pos  = sent.get("positive", [])
         neg  = sent.get("negative", [])
         if not pos and not neg: _na("Review sentiment"); return
@@ -850,13 +645,16 @@ def render_field_cell(field, product):
                 for w in neg
             )
             html += f"<div><span style='font-size:0.75em;color:#aaa'>👎 COMPLAINTS ABOUT</span><br>{tags}</div>"
+        counts = sent.get("reviews")
+        if counts:
+            html += (f"<div style='font-size:0.7em;color:#777;margin-top:4px'>from "
+                     f"{counts.get('positive', 0)} 5★ and {counts.get('negative', 0)} 1★ reviews</div>")
         st.markdown(html, unsafe_allow_html=True)
 
     # ── SellerInfo ────────────────────────────────────────────
     elif field == "SellerInfo":
-        seller = product_data.get("seller") or {}
-        name   = seller.get("name", "N/A")
-        is_amz = seller.get("is_amazon", False)
+        name   = record.seller
+        is_amz = record.sold_by_amazon
         if name == "N/A" and not is_amz: _na("Seller"); return
         badge = ("<span style='background:#ff9900;color:#000;border-radius:4px;"
                  "padding:1px 6px;font-size:0.78em;font-weight:bold'>amazon</span>"
@@ -868,7 +666,7 @@ def render_field_cell(field, product):
 
     # ── Variants ─────────────────────────────────────────────
     elif field == "Variants":
-        variants = product_data.get("variants") or {}
+        variants = record.variants
         if not variants: _na("Variants"); return
         html = ""
         for vtype, opts in variants.items():
@@ -885,13 +683,14 @@ def render_field_cell(field, product):
 
     # ── FrequentlyBoughtTogether ──────────────────────────────
     elif field == "FrequentlyBoughtTogether":
-        fbt = product_data.get("frequently_bought_together") or []
+        fbt = record.frequently_bought_together
         if not fbt: _na("Frequently bought together"); return
         cols = st.columns(len(fbt))
         for col, item in zip(cols, fbt):
             with col:
                 if item.get("img"):
-                    st.image(item["img"], use_container_width=True)
+                    st.markdown(f'<img src="{escape(_image_srcs(item["img"])[0])}" alt="" loading="lazy"'
+                                f' style="width:100%;border-radius:4px">', unsafe_allow_html=True)
                 st.markdown(
                     f"<div style='font-size:0.78em;line-height:1.3'>{item['name']}</div>"
                     f"<div style='font-size:0.85em;color:#f90;font-weight:bold'>{item['price']}</div>",
@@ -900,16 +699,16 @@ def render_field_cell(field, product):
 
     # ── ImageGallery ──────────────────────────────────────────
     elif field == "ImageGallery":
-        _render_gallery(product_data.get("images", []), "Product images")
+        _render_gallery(record.images, "Product images")
 
     # ── ReviewImages ──────────────────────────────────────────
     elif field == "ReviewImages":
-        _render_gallery(product_data.get("review_images", []), "Customer review images")
+        _render_gallery(record.review_images, "Customer review images")
 
     # ── Generic fallback ──────────────────────────────────────
     else:
-        value = product_data.get(field.lower(), "")
-        if isinstance(value, list):
+        value = getattr(record, field.lower(), "")
+        if isinstance(value, (list, tuple)):
             if value:
                 for item in value: st.markdown(f"• {item}")
             else: _na(field)
@@ -917,10 +716,111 @@ def render_field_cell(field, product):
         else: st.write(value)
 
 
+# ─────────────────────────────────────────────────────────────
+# Table mode — one sortable, virtualised grid instead of a column per product
+# ─────────────────────────────────────────────────────────────
+def _used_from(record):
+    prices = [_price_float(o.get("price", "")) for o in record.used_offers]
+    return min((v for v in prices if v is not None), default=None)
+
+# Grid columns behind each display field: (header, value from (record, derived), column config)
+_cc = st.column_config
+_TABLE_COLUMNS = {
+    "BestValue":       [("Rank",  lambda r, d: d.rank,  _cc.NumberColumn(format="%d", width="small")),
+                        ("Score", lambda r, d: d.score, _cc.ProgressColumn(format="%d", min_value=0, max_value=100))],
+    "ImageGallery":    [("Image", lambda r, d: _image_srcs(r.images[0])[0] if r.images else None, _cc.ImageColumn(width="small"))],
+    "Title":           [("Product", lambda r, d: r.name, _cc.TextColumn(width="large"))],
+    "Price":           [("Price",   lambda r, d: r.price,        _cc.NumberColumn(format="$%.2f")),
+                        ("Arrival", lambda r, d: r.arrival_date, _cc.TextColumn())],
+    "UsedPrices":      [("Used from", lambda r, d: _used_from(r), _cc.NumberColumn(format="$%.2f"))],
+    "Rating":          [("Rating",   lambda r, d: r.rating,        _cc.NumberColumn(format="%.1f ⭐")),
+                        ("Reviews",  lambda r, d: r.total_reviews, _cc.NumberColumn(format="%d")),
+                        ("4–5★",     lambda r, d: r.positive_pct,  _cc.NumberColumn(format="%d%%"))],
+    "ReviewSentiment": [("Praised for",      lambda r, d: r.review_sentiment.get("positive"), _cc.ListColumn()),
+                        ("Complaints about", lambda r, d: r.review_sentiment.get("negative"), _cc.ListColumn())],
+    "SellerInfo":      [("Seller", lambda r, d: r.seller, _cc.TextColumn())],
+    "Brand":           [("Brand", lambda r, d: r.brand, _cc.TextColumn())],
+    "Availability":    [("Availability", lambda r, d: r.availability, _cc.TextColumn())],
+    "Categories":      [("Categories", lambda r, d: r.categories, _cc.TextColumn())],
+    "Description":     [("Description", lambda r, d: r.description[:200] or None, _cc.TextColumn())],
+}
+
+
+def _table_status(product) -> str:
+    record = product.get("record")
+    if record is None:   return "⏳ loading"
+    if record.error:     return f"⚠️ {record.error}"
+    if record.pending:   return "⏳ " + ", ".join(record.pending)
+    if record.stale:     return "⟳ refreshing"
+    return "✓"
+
+
+def render_url_list():
+    """Table mode's URL editor: one text area instead of a header per product."""
+    products = st.session_state.product_data
+    current  = [p["url"] for p in products if p.get("url")]
+    text     = st.text_area("Product URLs — one per line", value="\n".join(current), height=120)
+    urls     = [u.strip() for u in text.splitlines() if u.strip()]
+    if urls != current:
+        by_url = {}
+        for p in products:
+            by_url.setdefault(p.get("url"), []).append(p)
+        st.session_state.product_data = [(by_url.get(u) or [{"url": u}]).pop(0) for u in urls]
+        st.session_state.num_columns  = max(1, len(urls))
+        st.rerun()
+
+
+def render_table(products):
+    columns = [c for f in ALL_FIELDS if f in st.session_state.visible_fields for c in _TABLE_COLUMNS.get(f, ())]
+    rows    = []
+    for i, p in enumerate(products):
+        if not p.get("url"):
+            continue
+        record = p.get("record")
+        ok     = record is not None and not record.error
+        row    = {"#": i + 1, "Status": _table_status(p)}
+        row.update((name, get(record, p.get("derived") or _NOT_RANKED) if ok else None) for name, get, _cfg in columns)
+        row["Link"] = p["url"]
+        rows.append(row)
+    if not rows:
+        st.info("Paste product URLs above to compare them.")
+        return
+    st.dataframe(
+        rows, hide_index=True, use_container_width=True,
+        height=min(38 + 35 * len(rows), 800),
+        column_config={"#": _cc.NumberColumn(width="small"),
+                       "Link": _cc.LinkColumn(display_text="🛒", width="small"),
+                       **{name: cfg for name, _get, cfg in columns}})
+
+
+# ─────────────────────────────────────────────────────────────
+# Debug timings — the column's fetch trace plus this run's render times
+# ─────────────────────────────────────────────────────────────
+def render_timings(product):
+    asin  = getattr(product.get("record"), "asin", None)
+    trace = metrics.product_trace(asin) if asin else []
+    if trace:
+        st.write("**Fetch trace:**")
+        st.dataframe([{
+            "time":    time.strftime("%H:%M:%S", time.localtime(e["at"])),
+            "section": e["section"],
+            "stage":   e["kind"],
+            "what":    e["what"],
+            "ms":      None if e["seconds"] is None else round(e["seconds"] * 1000, 1),
+            "KB":      round(e["bytes"] / 1024, 1) if "bytes" in e else None,
+        } for e in trace], hide_index=True, use_container_width=True)
+    render = product.get("render") or {}
+    if render:
+        st.write(f"**Render:** {sum(render.values()) * 1000:.1f} ms total")
+        st.dataframe([{"field": f, "ms": round(dt * 1000, 2)} for f, dt in render.items()],
+                     hide_index=True, use_container_width=True)
+
+
 # ─────────────────────────────────────────────────────────────
 # Main
 # ─────────────────────────────────────────────────────────────
 display_field_selector()
+install_lightbox()
 
 # ── Top toolbar: Add column | Share link | Export CSV ─────────
 tb_add, tb_share, tb_csv = st.columns([2, 2, 2])
@@ -940,8 +840,8 @@ with tb_share:
             st.warning("No URLs loaded yet.")
 
 with tb_csv:
-    all_loaded = all("json" in p for p in st.session_state.product_data if p.get("url"))
-    csv_data   = _build_csv(st.session_state.product_data) if all_loaded else ""
+    all_loaded = all("record" in p for p in st.session_state.product_data if p.get("url"))
+    csv_data   = _build_csv([p["record"] for p in st.session_state.product_data if "record" in p]) if all_loaded else ""
     st.download_button(
         "📥 Export CSV",
         data=csv_data,
@@ -954,25 +854,46 @@ with tb_csv:
 while len(st.session_state.product_data) < st.session_state.num_columns:
     st.session_state.product_data.append({"url": ""})
 
+load_pending_columns()
+merge_background_sections()
 update_all_diffs()
 
 num_cols = st.session_state.num_columns
 products = st.session_state.product_data
 
 st.markdown("<div class='field-divider'></div>", unsafe_allow_html=True)
-header_cols = st.columns(num_cols)
-for i in range(num_cols):
-    with header_cols[i]:
-        render_header(i, products[i])
-
-for field in ALL_FIELDS:
-    if field not in st.session_state.visible_fields:
-        continue
-    st.markdown("<div class='field-divider'></div>", unsafe_allow_html=True)
-    row = st.columns(num_cols)
+if st.session_state.table_mode:
+    render_url_list()
+    t0 = time.perf_counter()
+    render_table(products)
+    metrics.observe("render_seconds", time.perf_counter() - t0, field="table")
+else:
+    header_cols = st.columns(num_cols)
     for i in range(num_cols):
-        with row[i]:
-            render_field_cell(field, products[i])
+        with header_cols[i]:
+            render_header(i, products[i])
+
+    timed = st.session_state.show_debug     # per-field render times are kept for the debug panel only
+    for p in products:
+        if timed: p["render"] = {}
+        else:     p.pop("render", None)
+    for field in ALL_FIELDS:
+        if field not in st.session_state.visible_fields:
+            continue
+        st.markdown("<div class='field-divider'></div>", unsafe_allow_html=True)
+        row = st.columns(num_cols)
+        for i in range(num_cols):
+            with row[i]:
+                t0 = time.perf_counter()
+                render_field_cell(field, products[i])
+                render_stale_marker(field, products[i])
+                dt = time.perf_counter() - t0
+                if timed: products[i]["render"][field] = dt
+                metrics.observe("render_seconds", dt, field=field)
+
+# Rerun as background sections land, for as long as any are in flight
+if any(getattr(p.get("record"), "inflight", ()) for p in products):
+    poll_background_sections()
 
 # ─────────────────────────────────────────────────────────────
 # Debug panel
@@ -980,14 +901,38 @@ for field in ALL_FIELDS:
 if st.session_state.show_debug:
     st.divider()
     st.subheader("🔍 Debug")
-    debug_cols = st.columns(num_cols)
-    for i in range(num_cols):
+    pool_stats = _http_pool().stats()
+    st.caption(f"HTTP pool: {pool_stats['requests']} requests · "
+               f"{pool_stats['new_connections']} new connections · "
+               f"{pool_stats['reused_connections']} reused · "
+               f"{pool_stats['retries']} retries · {pool_stats['throttled']} throttled · "
+               f"{pool_stats['blocked']} blocked · {pool_stats['failed']} failed")
+    flight_stats = _single_flight().stats()
+    st.caption(f"Section fetches: {flight_stats['fetches']} · "
+               f"{flight_stats['coalesced']} joined one already in flight")
+    if _WATCH_ENABLED:
+        watch_stats = _watcher().stats()
+        st.caption(f"Watcher: {watch_stats['watched']} products watched · {watch_stats.get('due', 0)} sections due · "
+                   f"{watch_stats.get('refreshed', 0)} refreshed · {watch_stats.get('failed', 0)} failed")
+    if _LOCAL_IMAGES:
+        image_stats = _image_cache().stats()
+        st.caption(f"Image cache: {image_stats['images']} images · {image_stats['bytes'] / 2**20:.1f} MB · "
+                   f"{image_stats['fetching']} downloading")
+    shared = {id(r.content): r.content for p in products if (r := p.get("record"))}
+    st.caption(f"Session memory: {metrics.deep_size(st.session_state.to_dict(), (ProductContent,)) / 1024:.0f} KB "
+               f"of its own · {metrics.deep_size(list(shared.values())) / 1024:.0f} KB of images, offers and "
+               f"descriptions shared with other sessions ({_content_table().stats()['products']} products held)")
+    debug_cols = st.columns(num_cols) if not st.session_state.table_mode else []
+    for i in range(len(debug_cols)):
         with debug_cols[i]:
-            pdata = products[i].get("json", {})
+            record = products[i].get("record")
             st.markdown(f"**Column {i + 1}**")
-            if not pdata: st.write("No data yet."); continue
-            for k in ["name","pricing","average_rating","total_reviews",
-                      "5_star_percentage","4_star_percentage","asin","seller","arrival_date"]:
-                st.write(f"**{k}:** `{pdata.get(k, 'not found')}`")
+            if record is None: st.write("No data yet."); continue
+            for k in ["name","pricing","price","average_rating","rating","total_reviews",
+                      "pct_5","pct_4","asin","seller","arrival_date"]:
+                st.write(f"**{k}:** `{getattr(record, k)}`")
+            # Read from the cache on demand; records don't carry debug payloads
             st.write("**histogram HTML:**")
-            st.code(pdata.get("_debug_histogram_html", "not captured"), language="html")
+            st.code((record.asin and _product_cache().value(record.asin, "page", "_debug_histogram_html"))
+                    or "not captured", language="html")
+            render_timings(products[i])
@@ -0,0 +1,244 @@
+"""End-to-end benchmarks against the local stand-in server — no network needed.
+
+    fetch    cold and warm ``fetch_amazon_data`` per fixture product, plus a
+             headless batch of every product
+    memory   tracemalloc peak (Python heap) for one cold product and a
+             20-product batch, parsing in-process so parse memory is counted
+    columns  the Streamlit page with 2, 6 and 20 columns: first paint (the
+             script pass that loads the product pages and draws them, reruns
+             held back), time until every section has landed, a warm rerun,
+             and the session's own product state (shared content not counted)
+    failures the stand-in answering every request with a 503, then with a
+             robot-check page, then a 404 for a URL it has no route for: the
+             pool must retry the first two, give up with the right error,
+             and cache nothing; runs on a pool of its own, after any image
+             downloads the columns scenario left running
+
+The stand-in serves the synthetic pages ``make_fixtures.py`` generates, not
+captured Amazon traffic.  Each product's name and price are checked against
+the values its fixture was generated with, so a scraper regression fails the
+run as well as slowing it.
+
+    python benchmarks/bench_e2e.py [--latency 0.2] [--jitter 0.05] [--only fetch,memory,columns,failures]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+import metrics  # noqa: E402
+from make_fixtures import PRODUCTS  # noqa: E402
+from standin import StandIn  # noqa: E402
+
+SCENARIOS = ("fetch", "memory", "columns", "failures")
+COLUMNS   = (2, 6, 20)
+
+
+def _asins(n: int) -> list:
+    """``n`` distinct ASINs: the fixture ones first, then made-up ones the stand-in maps onto them."""
+    known = [p[0] for p in PRODUCTS]
+    return (known + [f"BENCH{i:05d}" for i in range(max(0, n - len(known)))])[:n]
+
+
+def _ms(seconds: float) -> str:
+    return f"{seconds * 1000:>9.1f} ms"
+
+
+def _check(asin: str, data: dict, errors: list) -> None:
+    expected = {p[0]: p for p in PRODUCTS}.get(asin)
+    if "_error" in data:
+        errors.append(f"{asin}: {data['_error']}")
+    elif expected and (data.get("name"), data.get("pricing")) != (expected[1], expected[2]):
+        errors.append(f"{asin}: got {data.get('name')!r} {data.get('pricing')!r}")
+
+
+def _record_data(record) -> dict:
+    """The fields ``_check`` reads, from a session's ``ProductRecord``."""
+    if record is None or record.error:
+        return {"_error": record.error if record else "not loaded"}
+    return {"name": record.name, "pricing": record.pricing}
+
+
+def bench_fetch(engine, base: str, errors: list) -> None:
+    cache, cold, warm = engine._product_cache(), [], []
+    for asin in _asins(len(PRODUCTS)):
+        cache.invalidate(asin)
+        t0   = time.perf_counter()
+        data = engine.fetch_amazon_data(f"{base}/dp/{asin}")
+        cold.append(time.perf_counter() - t0)
+        _check(asin, data, errors)
+        t0 = time.perf_counter()
+        engine.fetch_amazon_data(f"{base}/dp/{asin}")
+        warm.append(time.perf_counter() - t0)
+
+    for asin in _asins(len(PRODUCTS)):
+        cache.invalidate(asin)
+    t0 = time.perf_counter()
+    for _url, data in engine.compare_many([f"{base}/dp/{a}" for a in _asins(len(PRODUCTS))], concurrency=8):
+        _check(data.get("asin"), data, errors)
+    batch = time.perf_counter() - t0
+
+    print(f"\nfetch ({len(cold)} products, all sections)")
+    print(f"  cold   mean {_ms(statistics.mean(cold))}   p50 {_ms(statistics.median(cold))}   max {_ms(max(cold))}")
+    print(f"  warm   mean {_ms(statistics.mean(warm))}   p50 {_ms(statistics.median(warm))}   max {_ms(max(warm))}")
+    print(f"  batch  {len(cold)} products, 8 at a time: {_ms(batch)}")
+
+
+def bench_memory(engine, base: str, errors: list) -> None:
+    cache = engine._product_cache()
+    for asin in _asins(20):
+        cache.invalidate(asin)
+    # tracemalloc can't see the parse workers; parse here, as before the pool existed
+    workers, engine._PARSE_WORKERS = engine._PARSE_WORKERS, 0
+    tracemalloc.start()
+    try:
+        _check(PRODUCTS[0][0], engine.fetch_amazon_data(f"{base}/dp/{PRODUCTS[0][0]}"), errors)
+        _current, one = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        for _url, data in engine.compare_many([f"{base}/dp/{a}" for a in _asins(20)[1:]], concurrency=8):
+            _check(data.get("asin"), data, errors)
+        _current, batch = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+        engine._PARSE_WORKERS = workers
+    print("\nmemory (tracemalloc peak, Python heap only, parsing in-process)")
+    print(f"  one cold product      {one / 2**20:>8.1f} MB")
+    print(f"  19-product batch      {batch / 2**20:>8.1f} MB")
+
+
+def bench_columns(engine, base: str, errors: list, timeout: float) -> None:
+    import streamlit
+    from streamlit.testing.v1 import AppTest
+
+    print("\ncolumns (whole Streamlit page)")
+    print(f"  {'columns':<9}{'first paint':>15}{'all landed':>15}{'warm rerun':>15}{'session':>12}")
+    cache = engine._product_cache()
+    for n in COLUMNS:
+        asins = _asins(n)
+        for asin in asins:
+            cache.invalidate(asin)
+        at = AppTest.from_file(str(ROOT / "app.py"), default_timeout=timeout)
+        at.query_params["urls"] = "|".join(f"{base}/dp/{a}" for a in asins)
+        # AppTest.run() follows every st.rerun, the poll fragment's included, until the
+        # sections land; hold them back so the first run is one load-and-paint pass
+        t0, rerun, streamlit.rerun = time.perf_counter(), streamlit.rerun, lambda *_a, **_k: None
+        try:
+            at.run()
+        finally:
+            streamlit.rerun = rerun
+        first = time.perf_counter() - t0
+        deadline = t0 + timeout
+        while any(getattr(p.get("record"), "inflight", ()) for p in at.session_state.product_data):
+            if time.perf_counter() > deadline:
+                errors.append(f"{n} columns: sections still in flight after {timeout:.0f} s")
+                break
+            time.sleep(0.05)
+            at.run()
+        landed = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        at.run()
+        warm = time.perf_counter() - t0
+        if at.exception:
+            errors.append(f"{n} columns: {at.exception[0].message}")
+        for asin, p in zip(asins, at.session_state.product_data):
+            _check(asin, _record_data(p.get("record")), errors)
+        own = metrics.deep_size(at.session_state.product_data, (engine.ProductContent,))
+        print(f"  {n:<9}{_ms(first):>15}{_ms(landed):>15}{_ms(warm):>15}{own / 1024:>9.0f} KB")
+
+
+def bench_failures(engine, standin, errors: list, drain_images: bool = False) -> None:
+    if drain_images:
+        # The columns scenario leaves app.py's image downloads running; let them finish
+        images, deadline = engine._image_cache(), time.monotonic() + 300
+        while images.stats()["fetching"] and time.monotonic() < deadline:
+            time.sleep(0.5)
+    # A pool of its own, so its counters and host bucket see only these requests
+    pool, cache = engine._HttpPool(engine._POOL_SIZE), engine._product_cache()
+    shared, engine._http_pool = engine._http_pool, lambda: pool
+    try:
+        _fail_each(engine, standin, pool, cache, errors)
+    finally:
+        engine._http_pool = shared
+
+
+def _fail_each(engine, standin, pool, cache, errors: list) -> None:
+    attempts = engine._MAX_ATTEMPTS
+    print("\nfailures (every request fails; page section only)")
+    for label, path, fail, captcha, expect, counts in (
+            ("503",     "/dp/BFAIL00503",             1.0, False, "HTTP 503",    {"retries": attempts - 1, "throttled": attempts}),
+            ("captcha", "/dp/BFAILCAPTC",             1.0, True,  "robot check", {"retries": attempts - 1, "blocked": attempts}),
+            ("404",     "/Some-Title/dp/BFAIL00404/", 0.0, False, "HTTP 404",    {"retries": 0})):
+        asin = path.rstrip("/").rsplit("/", 1)[1]
+        cache.invalidate(asin)
+        version, before = cache.version(asin), pool.stats()
+        standin.fail_rate, standin.captcha = fail, captcha
+        t0 = time.perf_counter()
+        try:
+            data = engine.fetch_amazon_data(f"{standin.base_url}{path}?ref=x", sections=["page"])
+        finally:
+            standin.fail_rate, standin.captcha = 0.0, False
+        dt, after = time.perf_counter() - t0, pool.stats()
+        expected = {**counts, "failed": 1}
+        delta    = {k: after.get(k, 0) - before.get(k, 0) for k in expected}
+        print(f"  {label:<9}{_ms(dt)}   {delta}")
+        if expect not in data.get("_error", ""):
+            errors.append(f"{label}: expected an error mentioning {expect!r}, got {data.get('_error')!r}")
+        if delta != expected:
+            errors.append(f"{label}: pool counters moved by {delta}")
+        if cache.load(asin) or cache.version(asin) != version:
+            errors.append(f"{label}: a failed fetch reached the product cache")
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--latency", type=float, default=0.2, help="stand-in response delay, seconds (default 0.2)")
+    ap.add_argument("--jitter", type=float, default=0.05, help="± seconds of jitter (default 0.05)")
+    ap.add_argument("--only", default=",".join(SCENARIOS), help="comma-separated scenarios (default all)")
+    ap.add_argument("--timeout", type=float, default=120, help="per-page limit for the columns scenario")
+    args = ap.parse_args(argv)
+    only = [s for s in args.only.split(",") if s]
+    if set(only) - set(SCENARIOS):
+        ap.error(f"scenarios are {', '.join(SCENARIOS)}")
+
+    standin = StandIn(latency=args.latency, jitter=args.jitter).start()
+    cache_dir = tempfile.TemporaryDirectory(prefix="bench-e2e-")
+    # The engine reads both at import, and app.py imports it from the same process
+    os.environ["AMAZON_BASE_URL"]    = standin.base_url
+    os.environ["PRODUCT_CACHE_PATH"] = os.path.join(cache_dir.name, "products.sqlite3")
+    import engine
+
+    print(f"stand-in {standin.base_url}: latency {args.latency * 1000:.0f} ± {args.jitter * 1000:.0f} ms, "
+          f"{len(PRODUCTS)} fixture products")
+    errors: list = []
+    try:
+        if "fetch" in only:
+            bench_fetch(engine, standin.base_url, errors)
+        if "memory" in only:
+            bench_memory(engine, standin.base_url, errors)
+        if "columns" in only:
+            bench_columns(engine, standin.base_url, errors, args.timeout)
+        if "failures" in only:
+            bench_failures(engine, standin, errors, drain_images="columns" in only)
+    finally:
+        standin.stop()
+    print(f"\nstand-in hits: {dict(sorted(standin.hits.items()))}")
+    if errors:
+        print("\nFailures:")
+        for e in errors:
+            print(f"  {e}")
+        return 1
+    print("\nEvery product matched its fixture name and price.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,331 @@
+"""Extraction-time micro-benchmark: field extraction on an already-built tree.
+
+Parsing is done once per page, outside the timed region, so the numbers are
+the cost of turning a soup into the scraper's dict.  Each page is extracted
+twice on the same tree: by the selector cascade the parsers used before the
+compiled specs (kept below as the baseline) and by the current parsers.
+Both outputs are checked against ``fixtures/expected.json.gz``, the result
+of the baseline on every fixture page (``--record`` rewrites it, from the
+baseline only).  For review listings the extracted part is the review
+bodies; counting keywords in them is not extraction and changed on purpose.
+
+    python benchmarks/bench_extract.py [--repeat 5] [--full-tree] [--record]
+"""
+
+import argparse
+import gzip
+import json
+import re
+import statistics
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+import engine  # noqa: E402
+from make_fixtures import FIXTURES, PRODUCTS, load_fixture  # noqa: E402
+
+EXPECTED = FIXTURES / "expected.json.gz"
+
+
+# ─────────────────────────────────────────────────────────────
+# Baseline: the per-field select_one cascades the parsers used before
+# ─────────────────────────────────────────────────────────────
+def _legacy_parse_star_percentages(soup) -> dict:
+    result = {}
+    for li in soup.select("#histogramTable li"):
+        a     = li.select_one("a[aria-label]")
+        meter = li.select_one(".a-meter[aria-valuenow]")
+        if not (a and meter):
+            continue
+        label = a.get("aria-label", "")
+        star_m = re.search(r"(\d+)\s+star", label, re.IGNORECASE)
+        pct_v  = meter.get("aria-valuenow")
+        if star_m and pct_v is not None:
+            result[f"{int(star_m.group(1))}_star_percentage"] = int(pct_v)
+    return result
+
+
+def _legacy_scrape_review_imgs(html_text: str, soup_obj) -> list:
+    seen, found = set(), []
+    def _add(u):
+        if not u: return
+        u = u.split("?")[0]
+        if "media-amazon.com/images/I/" not in u: return
+        u = re.sub(r"\._[A-Z0-9_,]+_\.", "._SL1000_.", u)
+        if u not in seen: seen.add(u); found.append(u)
+    for el in soup_obj.select("[data-lazyimagesource]"):
+        _add(el.get("data-lazyimagesource", ""))
+    for el in soup_obj.select("[data-mediaid]"):
+        mid = el.get("data-mediaid", "").strip()
+        if mid and re.match(r"^[A-Za-z0-9+/]{8,20}$", mid):
+            _add(f"https://m.media-amazon.com/images/I/{mid}.jpg")
+    for img in soup_obj.select('img[alt^="Customer Image"]'):
+        src = img.get("src") or img.get("data-src") or ""
+        if "transparent-pixel" in src or "grey-pixel" in src: continue
+        _add(src)
+    for img in soup_obj.select("[data-hook='review-image-tile'] img, [data-hook='review'] img, #cm_cr-review_list img"):
+        if img.find_parent(class_=re.compile(r"a-profile|avatar", re.I)): continue
+        if img.find_parent(attrs={"data-hook": "genome-widget"}): continue
+        src = img.get("src") or img.get("data-src") or ""
+        if "transparent-pixel" in src or "grey-pixel" in src: continue
+        if re.search(r"\._(?:SX|SY|UX|UY)[1-4]\d[_.]", src): continue
+        if re.search(r"_UR\d{1,2},\d{1,2}_", src): continue
+        _add(src)
+    if not found:
+        for _t, large in re.findall(
+            r'"thumb"\s*:\s*"(https://[^"]+)"[^}]{0,300}?"large"\s*:\s*"(https://[^"]+)"', html_text
+        ):
+            if not re.search(r"\._(?:SX|SY)[1-4]\d[_.]", large): _add(large)
+    return found
+
+
+def _legacy_parse_product_page(html_text: str) -> dict:
+    data: dict = {}
+    soup = engine._soup(html_text, engine._PRODUCT_REGIONS)
+
+    # ── Basic fields ──────────────────────────────────────
+    title = soup.select_one("#productTitle")
+    data["name"] = title.get_text(strip=True) if title else "N/A"
+
+    price = soup.select_one(".a-price .a-offscreen")
+    data["pricing"] = price.get_text(strip=True) if price else "N/A"
+
+    rating = soup.select_one("#acrPopover")
+    data["average_rating"] = (
+        rating["title"].split()[0] if rating and rating.get("title") else "N/A"
+    )
+    reviews = soup.select_one("#acrCustomerReviewText")
+    data["total_reviews"] = (
+        int(re.sub(r"[^\d]", "", reviews.get_text())) if reviews else None
+    )
+    data.update(_legacy_parse_star_percentages(soup))
+
+    # ── Stock images ──────────────────────────────────────
+    matches = re.findall(r'"hiRes":"(https://[^"]+)"', html_text)
+    if matches:
+        data["images"] = list(dict.fromkeys(matches))
+    else:
+        imgs = []
+        for el in soup.select("#altImages img"):
+            src   = el.get("src", "")
+            large = re.sub(r"\._[A-Z0-9_,]+_\.", "._AC_SL1500_.", src)
+            if large.startswith("https"):
+                imgs.append(large)
+        if not imgs:
+            main = soup.select_one("#landingImage")
+            if main and main.get("src"):
+                imgs = [main["src"]]
+        data["images"] = imgs
+
+    # ── Customers Say ─────────────────────────────────────
+    customers_say = "N/A"
+    for sel in ("[data-testid='overall-summary']",
+                "[data-hook='cr-insights-widget-summary']",
+                ".cr-lighthouse-summary",
+                "[data-hook='cr-insights-widget-aspects']"):
+        el = soup.select_one(sel)
+        if el:
+            text = re.sub(r"^Customers\s+say\s*", "", el.get_text(strip=True), flags=re.IGNORECASE).strip()
+            if text: customers_say = text; break
+    data["customers_say"] = {"summary": customers_say}
+
+    # ── Seller info ───────────────────────────────────────
+    seller_name = "N/A"
+    for sel in ("#merchant-info a", "#sellerProfileTriggerId",
+                "#tabular-buybox [tabindex='0']", "#buybox-see-all-buying-choices-announce"):
+        el = soup.select_one(sel)
+        if el:
+            t = el.get_text(strip=True)
+            if t and len(t) < 80:
+                seller_name = t; break
+    # Check if sold directly by Amazon
+    buybox_txt = (soup.select_one("#tabular-buybox-container") or
+                  soup.select_one("#merchant-info") or
+                  soup.select_one("#desktop_buyBox"))
+    sold_by_amazon = "Amazon" in (buybox_txt.get_text() if buybox_txt else "")
+    data["seller"] = {"name": seller_name, "is_amazon": sold_by_amazon}
+
+    # ── Arrival / delivery date ───────────────────────────
+    arrival = "N/A"
+    for sel in ("#mir-layout-DELIVERY_BLOCK span.a-text-bold",
+                "#ddmDeliveryMessage .a-text-bold",
+                "[data-csa-c-delivery-promise-type] .a-text-bold",
+                "#deliveryBlockMessage .a-text-bold"):
+        el = soup.select_one(sel)
+        if el:
+            arrival = el.get_text(strip=True); break
+    if arrival == "N/A":
+        # Broader fallback — grab first delivery block text
+        for sel in ("#mir-layout-DELIVERY_BLOCK", "#ddmDeliveryMessage"):
+            el = soup.select_one(sel)
+            if el:
+                t = el.get_text(" ", strip=True)[:120]
+                if t: arrival = t; break
+    data["arrival_date"] = arrival
+
+    # ── Variants ─────────────────────────────────────────
+    variants: dict = {}
+    for grp in soup.select("#twister .a-form-group, #variation_color_name, #variation_size_name"):
+        label = grp.select_one(".a-form-label, .a-declarative label")
+        opts  = [li.get_text(strip=True) for li in grp.select("li")
+                 if li.get_text(strip=True) and len(li.get_text(strip=True)) < 50]
+        # Fallback: span/option text
+        if not opts:
+            opts = [s.get_text(strip=True) for s in grp.select("span.selection, option")
+                    if s.get_text(strip=True)]
+        if label and opts:
+            variants[label.get_text(strip=True).rstrip(":")] = opts[:20]
+    data["variants"] = variants
+
+    # ── Frequently bought together ────────────────────────
+    fbt = []
+    for item in soup.select("#frequently-bought-together .a-list-item, "
+                             "#sims-fbt .a-list-item"):
+        name_el  = item.select_one(".a-truncate-full, .a-size-small.a-color-base")
+        price_el = item.select_one(".a-price .a-offscreen")
+        img_el   = item.select_one("img")
+        if name_el:
+            fbt.append({
+                "name":  name_el.get_text(strip=True)[:80],
+                "price": price_el.get_text(strip=True) if price_el else "N/A",
+                "img":   img_el.get("src", "") if img_el else "",
+            })
+    data["frequently_bought_together"] = fbt[:4]
+
+    # ── Brand / availability / features / description / categories ──
+    brand = soup.select_one("#bylineInfo")
+    data["brand"] = brand.get_text(strip=True) if brand else "N/A"
+
+    avail = soup.select_one("#availability span")
+    data["availability"] = avail.get_text(strip=True) if avail else "N/A"
+
+    data["features"] = [
+        li.get_text(strip=True)
+        for li in soup.select("#feature-bullets li span.a-list-item")
+        if li.get_text(strip=True)
+    ]
+
+    desc = soup.select_one("#productDescription")
+    data["description"] = desc.get_text(strip=True) if desc else "N/A"
+
+    crumbs = [c.get_text(strip=True)
+              for c in soup.select("#wayfinding-breadcrumbs_container li span")
+              if c.get_text(strip=True) not in ("", "›")]
+    data["categories"] = " > ".join(crumbs) if crumbs else "N/A"
+
+    data["_debug_histogram_html"] = str(soup.select_one("#histogramTable") or "")[:3000]
+
+    # Review images embedded in the product page; merged with the media-reviews page later
+    data["_page_review_images"] = _legacy_scrape_review_imgs(html_text, soup)
+    return data
+
+
+def _legacy_parse_media_review_page(html_text: str) -> list:
+    return _legacy_scrape_review_imgs(html_text, engine._soup(html_text, engine._MEDIA_REVIEW_REGIONS))
+
+
+def _legacy_review_bodies(html_text: str) -> list:
+    ss = engine._soup(html_text, engine._REVIEW_BODY_REGIONS)
+    return [el.get_text(" ", strip=True) for el in ss.select('[data-hook="review-body"]')]
+
+
+def _legacy_parse_used_offers(html_text: str) -> list:
+    used_soup   = engine._soup(html_text, engine._OFFER_REGIONS)
+    used_offers = []
+    for offer in used_soup.select(".a-row.olpOffer, [data-asin] .a-section")[:6]:
+        price_el     = offer.select_one(".olpOfferPrice, .a-price .a-offscreen")
+        ship_el      = offer.select_one(".olpShippingPrice")
+        free_ship_el = offer.select_one(".olpFreeShipping, .a-color-success")
+        cond_el      = offer.select_one(".olpCondition, .a-size-medium.a-color-base")
+        seller_el    = offer.select_one(".olpSellerName a, .a-profile-name")
+        if not price_el:
+            continue
+        price_str = price_el.get_text(strip=True)
+        if free_ship_el and "free" in free_ship_el.get_text(strip=True).lower():
+            ship_str = "FREE"
+        elif ship_el:
+            ship_str = ship_el.get_text(strip=True)
+        else:
+            ship_str = "FREE"
+        cond_str   = cond_el.get_text(strip=True)[:40] if cond_el else "Used"
+        seller_str = seller_el.get_text(strip=True)[:40] if seller_el else ""
+        used_offers.append({
+            "price":   price_str,
+            "ship":    ship_str,
+            "cond":    cond_str,
+            "seller":  seller_str,
+        })
+    return used_offers
+
+
+
+# ─────────────────────────────────────────────────────────────
+# Benchmark
+# ─────────────────────────────────────────────────────────────
+PAGES = {   # kind: (legacy parser, current parser, regions)
+    "product":   (_legacy_parse_product_page, engine._parse_product_page, engine._PRODUCT_REGIONS),
+    "media":     (_legacy_parse_media_review_page, engine._parse_media_review_page, engine._MEDIA_REVIEW_REGIONS),
+    "offers":    (_legacy_parse_used_offers, engine._parse_used_offers, engine._OFFER_REGIONS),
+    "five_star": (_legacy_review_bodies, engine._review_bodies, engine._REVIEW_BODY_REGIONS),
+}
+VERSIONS = ("legacy", "spec")
+
+
+def _extract(parse, html, soup):
+    """Run ``parse`` with ``_soup`` handing back the pre-built tree."""
+    real, engine._soup = engine._soup, lambda *_a, **_k: soup
+    try:
+        t0  = time.perf_counter()
+        out = parse(html)
+        return time.perf_counter() - t0, out
+    finally:
+        engine._soup = real
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--full-tree", action="store_true", help="extract from the whole page, not the strained regions")
+    ap.add_argument("--record", action="store_true", help="rewrite the expected output from the baseline")
+    args = ap.parse_args(argv)
+
+    expected = {} if args.record else json.loads(gzip.decompress(EXPECTED.read_bytes()))
+    timings  = {v: {kind: [] for kind in PAGES} for v in VERSIONS}
+    outputs, mismatches = {}, []
+    for asin, *_ in PRODUCTS:
+        for kind, (*parsers, regions) in PAGES.items():
+            html = load_fixture(asin, kind)
+            soup = engine._soup(html, None if args.full_tree else regions)
+            key  = f"{asin}.{kind}"
+            for version, parse in zip(VERSIONS, parsers):
+                runs = [_extract(parse, html, soup) for _ in range(args.repeat)]
+                timings[version][kind].append(min(dt for dt, _ in runs))
+                out  = json.loads(json.dumps(runs[0][1]))
+                if version == "legacy":
+                    outputs[key] = out
+                if not args.record and out != expected.get(key):
+                    mismatches.append(f"{key} ({version})")
+
+    print(f"{'page':<10}" + "".join(f"{v:>14}" for v in VERSIONS) + f"{'speedup':>10}")
+    per_item = {v: sum(sum(t) for t in timings[v].values()) / len(PRODUCTS) for v in VERSIONS}
+    rows = [(kind, {v: statistics.mean(timings[v][kind]) for v in VERSIONS}) for kind in PAGES]
+    for label, t in rows + [("per item", per_item)]:
+        print(f"{label:<10}" + "".join(f"{t[v] * 1000:>11.2f} ms" for v in VERSIONS)
+              + f"{t['legacy'] / t['spec']:>9.1f}x")
+    if args.record:
+        EXPECTED.write_bytes(gzip.compress(json.dumps(outputs, sort_keys=True).encode(), mtime=0))
+        print(f"\nRecorded the baseline's output for {len(outputs)} pages.")
+        return 0
+    if mismatches:
+        print("\nOutput differs from the recorded result:", ", ".join(mismatches))
+        return 1
+    print(f"\nLegacy and spec output identical to the baseline's recorded result ({len(outputs)} fixture pages).")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
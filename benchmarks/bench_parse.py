@@ -0,0 +1,79 @@
+"""Parse-time micro-benchmark: html.parser vs lxml, full tree vs region-strained.
+
+Every configuration is also checked for identical extracted output against
+the original html.parser/full-tree result on the saved fixture pages.
+
+    python benchmarks/bench_parse.py [--repeat 5]
+"""
+
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+import engine  # noqa: E402
+from make_fixtures import PRODUCTS, load_fixture  # noqa: E402
+
+
+def _review_keywords(html: str) -> list:
+    """One listing page's keywords, as the sentiment section counts them."""
+    return engine._page_keywords(html).top(engine._SENTIMENT_KEYWORDS)
+
+
+PARSERS = {
+    "product":   engine._parse_product_page,
+    "media":     engine._parse_media_review_page,
+    "offers":    engine._parse_used_offers,
+    "five_star": _review_keywords,
+    "one_star":  _review_keywords,
+}
+CONFIGS = [("html.parser", False), ("html.parser", True), ("lxml", False), ("lxml", True)]
+
+
+def _run(kind, html, parser, strained):
+    engine._HTML_PARSER, engine._PARSE_ONLY = parser, strained
+    t0  = time.perf_counter()
+    out = PARSERS[kind](html)
+    return time.perf_counter() - t0, out
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args(argv)
+
+    pages = [(asin, kind, load_fixture(asin, kind)) for asin, *_ in PRODUCTS for kind in PARSERS]
+    timings = {cfg: {kind: [] for kind in PARSERS} for cfg in CONFIGS}
+    mismatches = []
+    for asin, kind, html in pages:
+        _, reference = _run(kind, html, "html.parser", False)
+        for cfg in CONFIGS:
+            best = []
+            for _ in range(args.repeat):
+                dt, out = _run(kind, html, *cfg)
+                best.append(dt)
+            timings[cfg][kind].append(min(best))
+            if out != reference:
+                mismatches.append((asin, kind, cfg))
+
+    print(f"{'page':<10}" + "".join(f"{p + (' +strain' if s else ''):>22}" for p, s in CONFIGS))
+    for kind in PARSERS:
+        print(f"{kind:<10}" + "".join(f"{statistics.mean(timings[cfg][kind]) * 1000:>19.1f} ms" for cfg in CONFIGS))
+    total = {cfg: sum(sum(v) for v in timings[cfg].values()) / len(PRODUCTS) for cfg in CONFIGS}
+    print(f"{'per item':<10}" + "".join(f"{total[cfg] * 1000:>19.1f} ms" for cfg in CONFIGS))
+    if mismatches:
+        print("\nOutput differs from html.parser/full tree:")
+        for asin, kind, (parser, strained) in mismatches:
+            print(f"  {asin} {kind}: {parser}{' +strain' if strained else ''}")
+        return 1
+    print(f"\nOutput identical across all configurations ({len(pages)} fixture pages).")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,262 @@
+"""Generate the offline Amazon page fixtures used by the benchmarks.
+
+The pages are synthetic but follow the markup the scraper reads on live
+Amazon pages (ids, data-hooks, class names), buried in the same kind of
+bulk — inline scripts, navigation, carousels, review widgets — that makes
+real product pages 1–2 MB.  Output is deterministic for a given seed.
+
+    python benchmarks/make_fixtures.py            # writes benchmarks/fixtures/
+"""
+
+import gzip
+import json
+import random
+from pathlib import Path
+
+FIXTURES = Path(__file__).with_name("fixtures")
+
+# asin, title, price, rating, reviews, seller, layout knobs
+PRODUCTS = [
+    ("B0BSHF7WHW", "Anker USB C Charger 735, Nano II 65W 3-Port Fast Compact Foldable GaN Charger",
+     "$39.99", 4.7, 21873, "Amazon.com", dict(hires=True, variants=True, fbt=True, delivery="mir")),
+    ("B09V3KXJPB", "Logitech MX Master 3S Wireless Performance Mouse with Ultra-fast Scrolling",
+     "$99.99", 4.6, 14210, "Amazon.com", dict(hires=True, variants=True, fbt=False, delivery="ddm")),
+    ("B07FZ8S74R", "Echo Dot (3rd Gen) Smart speaker with Alexa - Charcoal",
+     "$22.49", 4.7, 998771, "Amazon.com", dict(hires=False, variants=True, fbt=True, delivery="csa")),
+    ("B08L5TNJHG", "Generic Silicone Case Compatible with Wireless Earbuds, Shockproof Cover",
+     "$8.97", 4.2, 612, "TechSmart Direct", dict(hires=False, variants=False, fbt=True, delivery="fallback")),
+    ("B0CHWRXH8B", "Apple AirPods Pro (2nd Generation) Wireless Ear Buds with USB-C Charging Case",
+     "$189.99", 4.7, 75231, "Amazon.com", dict(hires=True, variants=False, fbt=True, delivery="mir")),
+    ("B07XJ8C8F5", "Kindle Paperwhite (8 GB) - 6.8\" display and adjustable warm light",
+     "$139.99", 4.6, 103552, "Amazon.com", dict(hires=True, variants=True, fbt=False, delivery="csa")),
+    ("B01DFKC2SO", "Instant Pot Duo 7-in-1 Electric Pressure Cooker, 6 Quart",
+     "$79.95", 4.7, 152338, "Amazon.com", dict(hires=False, variants=True, fbt=True, delivery="ddm")),
+    ("B0B7BP6CJN", "SanDisk 1TB Extreme Portable SSD - Up to 1050MB/s - USB-C",
+     "$89.99", 4.6, 48012, "SanDisk Official", dict(hires=True, variants=True, fbt=True, delivery="mir")),
+    ("B09JQMJHXY", "Stanley Quencher H2.0 FlowState Stainless Steel Vacuum Insulated Tumbler 40 oz",
+     "$45.00", 4.8, 89220, "Stanley Direct", dict(hires=False, variants=True, fbt=False, delivery="fallback")),
+    ("B0C1H26C46", "Replacement Remote Control for Smart TVs, No Setup Required",
+     "$6.49", 3.9, 211, "Remote Depot US", dict(hires=False, variants=False, fbt=False, delivery="csa")),
+    ("B08KTZ8249", "Hanes Men's EcoSmart Fleece Sweatshirt, Crewneck Pullover",
+     "$12.00", 4.5, 140887, "Amazon.com", dict(hires=True, variants=True, fbt=False, delivery="ddm")),
+    ("B0BZYCJK89", "Owala FreeSip Insulated Stainless Steel Water Bottle with Straw, 24 oz",
+     "$27.99", 4.8, 62518, "Amazon.com", dict(hires=True, variants=True, fbt=True, delivery="csa")),
+]
+
+_WORDS = ("battery sound quality cable charger fast compact sturdy cheap flimsy screen setup "
+          "warranty heavy light comfortable grip scroll button plastic metal charging port "
+          "speaker bass volume connection bluetooth wifi app software update returned refund "
+          "stopped broke died noisy quiet bright dim color fit size perfect small large "
+          "price value shipping packaging instructions easy difficult replacement support").split()
+
+
+def _sentence(rng, n):
+    return " ".join(rng.choice(_WORDS) for _ in range(n)).capitalize() + "."
+
+
+def _img(rng, size="_AC_US40_"):
+    code = "".join(rng.choice("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789") for _ in range(11))
+    return f"https://m.media-amazon.com/images/I/{code}L.{size}.jpg"
+
+
+def _bulk_script(rng, kb):
+    """Inline JS/JSON blob of roughly ``kb`` kilobytes, like Amazon's page-state scripts."""
+    blob = {f"k{i}": [rng.random() for _ in range(8)] for i in range(kb * 6)}
+    return f"<script type=\"text/javascript\">P.when('A').register('state', {json.dumps(blob)});</script>"
+
+
+def _nav(rng, links):
+    items = "".join(
+        f'<li class="nav-li"><a class="nav-link" href="/b?node={rng.randint(10**6, 10**8)}">'
+        f'<span class="nav-text">{rng.choice(_WORDS).title()} {rng.choice(_WORDS)}</span></a></li>'
+        for _ in range(links))
+    return f'<header id="navbar"><div class="nav-main"><ul class="nav-ul">{items}</ul></div></header>'
+
+
+def _carousel(rng, cards, cid):
+    li = "".join(
+        f'<li class="a-carousel-card"><div class="p13n-sc-uncoverable-faceout">'
+        f'<img alt="" src="{_img(rng, "_AC_UL160_SR160,160_")}" class="p13n-product-image">'
+        f'<div class="p13n-sc-truncate">{_sentence(rng, 9)}</div>'
+        f'<i class="a-icon a-icon-star-small"><span class="a-icon-alt">4.{rng.randint(0, 9)} out of 5 stars</span></i>'
+        f'<span class="a-price"><span class="a-offscreen">${rng.randint(5, 300)}.{rng.randint(10, 99)}</span>'
+        f'<span aria-hidden="true">$<span class="a-price-whole">{rng.randint(5, 300)}</span></span></span>'
+        f'</div></li>'
+        for _ in range(cards))
+    return (f'<div id="{cid}" class="a-carousel-container"><div class="a-row a-carousel-header-row">'
+            f'<h2 class="a-carousel-heading">{_sentence(rng, 4)}</h2></div>'
+            f'<ol class="a-carousel">{li}</ol></div>')
+
+
+def _review(rng, with_image):
+    imgs = ""
+    if with_image:
+        imgs = (f'<div class="review-image-tile-section"><img alt="Customer image" data-hook="review-image-tile" '
+                f'src="{_img(rng, "_SY88")}" class="review-image-tile"></div>')
+    return (f'<div data-hook="review" class="a-section review aok-relative">'
+            f'<div data-hook="genome-widget" class="a-profile-avatar-wrapper"><a class="a-profile">'
+            f'<div class="a-profile-avatar"><img src="{_img(rng, "_SX48_")}" class="avatar"></div>'
+            f'<span class="a-profile-name">{rng.choice(_WORDS).title()}</span></a></div>'
+            f'<i data-hook="review-star-rating" class="a-icon a-icon-star a-star-{rng.randint(1, 5)}">'
+            f'<span class="a-icon-alt">{rng.randint(1, 5)}.0 out of 5 stars</span></i>'
+            f'<span data-hook="review-title">{_sentence(rng, 5)}</span>'
+            f'<span data-hook="review-body" class="a-size-base review-text">'
+            f'<span>{" ".join(_sentence(rng, rng.randint(8, 30)) for _ in range(rng.randint(1, 6)))}</span></span>'
+            f'{imgs}</div>')
+
+
+def product_page(rng, asin, title, price, rating, reviews, seller, knobs):
+    hist = [rng.randint(55, 80)]
+    hist.append(rng.randint(8, 100 - hist[0] - 6))
+    rest = 100 - sum(hist)
+    hist += [rest // 3, rest // 3, rest - 2 * (rest // 3)]
+    histogram = "".join(
+        f'<li><span class="a-list-item"><a class="a-link-normal" aria-label="{s} stars represent {p}% of rating" '
+        f'href="/product-reviews/{asin}?filterByStar={s}_star"><div class="a-section a-spacing-none">'
+        f'<span class="a-size-base">{s} star</span></div>'
+        f'<div class="a-meter" role="progressbar" aria-valuenow="{p}" aria-valuemin="0" aria-valuemax="100">'
+        f'<div class="a-meter-bar" style="width: {p}%;"></div></div>'
+        f'<div class="a-section"><span class="a-size-base">{p}%</span></div></a></span></li>'
+        for s, p in zip((5, 4, 3, 2, 1), hist))
+    gallery = [_img(rng, "_AC_US40_") for _ in range(7)]
+    if knobs["hires"]:
+        state = json.dumps({"colorImages": {"initial": [
+            {"hiRes": u.replace("_AC_US40_", "_AC_SL1500_"), "thumb": u, "large": u.replace("_AC_US40_", "_AC_")}
+            for u in gallery]}}, separators=(",", ":"))
+        image_script = f"<script type=\"text/javascript\">var data = {state};</script>"
+    else:
+        image_script = ""
+    alt_images = "".join(f'<li class="a-spacing-small item"><span class="a-button-text"><img alt="" src="{u}"></span></li>'
+                         for u in gallery)
+    variants = ""
+    if knobs["variants"]:
+        colors = "".join(f'<li class="swatch-list-item-text"><span class="a-list-item">{c}</span></li>'
+                         for c in ("Black", "White", "Blue", "Sage Green", "Coral Red"))
+        sizes  = "".join(f'<option value="{i}">{s}</option>' for i, s in enumerate(("Small", "Medium", "Large")))
+        variants = (f'<div id="twister" class="a-section">'
+                    f'<div id="variation_color_name" class="a-section a-spacing-small">'
+                    f'<div class="a-row"><label class="a-form-label">Color: </label><span class="selection">Black</span></div>'
+                    f'<ul class="a-unordered-list a-nostyle a-button-list">{colors}</ul></div>'
+                    f'<div class="a-form-group"><div class="a-row"><label class="a-form-label">Size:</label></div>'
+                    f'<select name="size">{sizes}</select></div></div>')
+    fbt = ""
+    if knobs["fbt"]:
+        items = "".join(
+            f'<li><span class="a-list-item"><img src="{_img(rng, "_AC_UL116_SR116,116_")}">'
+            f'<span class="a-truncate-full">{_sentence(rng, 8)}</span>'
+            f'<span class="a-price"><span class="a-offscreen">${rng.randint(5, 60)}.99</span></span></span></li>'
+            for _ in range(3))
+        fbt = f'<div id="sims-fbt"><ul class="a-unordered-list">{items}</ul></div>'
+    delivery = {
+        "mir": '<div id="mir-layout-DELIVERY_BLOCK"><div class="a-spacing-base">FREE delivery '
+               '<span class="a-text-bold">Tuesday, March 12</span>. Order within 5 hrs 2 mins</div></div>',
+        "ddm": '<div id="ddmDeliveryMessage">Arrives: <span class="a-text-bold">Thursday, March 14</span></div>',
+        "csa": '<div data-csa-c-delivery-promise-type="FREE">Get it <span class="a-text-bold">Wed, Mar 13</span></div>',
+        "fallback": '<div id="mir-layout-DELIVERY_BLOCK"><span>Usually ships within 2 to 3 days</span></div>',
+    }[knobs["delivery"]]
+    amazon = seller == "Amazon.com"
+    buybox = (f'<div id="tabular-buybox-container"><div id="tabular-buybox">'
+              f'<div class="tabular-buybox-text"><span>Ships from</span></div>'
+              f'<div class="tabular-buybox-text"><span tabindex="0">{"Amazon" if amazon else seller}</span></div>'
+              f'</div></div>'
+              f'<div id="merchant-info">Ships from and sold by <a id="sellerProfileTriggerId" href="/gp/help/seller/">{seller}</a>.</div>')
+    bullets = "".join(f'<li><span class="a-list-item"> {_sentence(rng, rng.randint(12, 30))} </span></li>' for _ in range(5))
+    crumbs = "".join(f'<li><span class="a-list-item"><a class="a-link-normal">{c}</a></span></li>'
+                     f'<li class="a-breadcrumb-divider"><span class="a-list-item">›</span></li>'
+                     for c in ("Electronics", "Computers & Accessories", rng.choice(_WORDS).title()))
+    reviews_html = "".join(_review(rng, i % 3 == 0) for i in range(12))
+    return f"""<!doctype html><html lang="en-us"><head><meta charset="utf-8"><title>Amazon.com: {title}</title>
+{_bulk_script(rng, 120)}{image_script}{_bulk_script(rng, 80)}</head>
+<body class="a-m-us a-aui_72554-c">
+{_nav(rng, 900)}
+<div id="dp" class="electronics en_US"><div id="dp-container" class="a-container">
+<div id="wayfinding-breadcrumbs_container"><ul class="a-unordered-list a-horizontal">{crumbs}</ul></div>
+<div id="leftCol"><div id="altImages"><ul class="a-unordered-list">{alt_images}</ul></div>
+<div id="imgTagWrapperId"><img id="landingImage" alt="{title}" src="{gallery[0].replace('_AC_US40_', '_AC_SX679_')}"></div></div>
+<div id="centerCol"><div id="title_feature_div"><h1 id="title"><span id="productTitle" class="a-size-large"> {title} </span></h1></div>
+<div id="bylineInfo_feature_div"><a id="bylineInfo" class="a-link-normal" href="/stores/">Visit the {title.split()[0]} Store</a></div>
+<div id="averageCustomerReviews"><span id="acrPopover" class="reviewCountTextLinkedHistogram" title="{rating} out of 5 stars">
+<i class="a-icon a-icon-star"><span class="a-icon-alt">{rating} out of 5 stars</span></i></span>
+<a id="acrCustomerReviewLink"><span id="acrCustomerReviewText" class="a-size-base">{reviews:,} ratings</span></a></div>
+<div id="corePriceDisplay_desktop_feature_div"><span class="a-price aok-align-center"><span class="a-offscreen">{price}</span>
+<span aria-hidden="true"><span class="a-price-symbol">$</span><span class="a-price-whole">{price[1:].split('.')[0]}</span></span></span></div>
+{variants}
+<div id="feature-bullets" class="a-section"><ul class="a-unordered-list a-vertical">{bullets}</ul></div>
+</div>
+<div id="rightCol"><div id="desktop_buyBox"><div id="availability"><span class="a-size-medium a-color-success"> In Stock </span></div>
+{delivery}{buybox}</div></div>
+{fbt}
+{_carousel(rng, 40, "sp_detail")}
+<div id="productDescription" class="a-section"><p><span>{" ".join(_sentence(rng, 20) for _ in range(6))}</span></p></div>
+{_carousel(rng, 40, "sp_detail2")}
+<div id="reviewsMedley"><div class="a-section"><ul id="histogramTable" class="histogram">{histogram}</ul></div>
+<div data-hook="cr-insights-widget-summary"><p>Customers say</p><p>{" ".join(_sentence(rng, 14) for _ in range(3))}</p></div>
+<div id="cm-cr-dp-review-list">{reviews_html}</div></div>
+{_carousel(rng, 60, "rhf")}
+</div></div>
+<div id="navFooter">{_nav(rng, 400)}</div>
+{_bulk_script(rng, 60)}
+</body></html>"""
+
+
+def media_reviews_page(rng, asin):
+    tiles = "".join(_review(rng, True) for _ in range(10))
+    media = "".join(f'<div class="cr-lightbox-image-thumbnail" data-mediaid="{_img(rng).split("/")[-1][:11]}"></div>'
+                    for _ in range(6))
+    lazy = "".join(f'<div data-lazyimagesource="{_img(rng, "_SY256_")}"></div>' for _ in range(4))
+    return (f"<!doctype html><html><head>{_bulk_script(rng, 40)}</head><body>{_nav(rng, 400)}"
+            f'<div id="cm_cr-review_list" class="a-section">{tiles}</div>{media}{lazy}'
+            f"<div id=\"navFooter\">{_nav(rng, 200)}</div></body></html>")
+
+
+def offers_page(rng, asin):
+    offers = "".join(
+        f'<div class="a-row a-spacing-mini olpOffer" role="row">'
+        f'<div class="a-column"><span class="a-size-large a-color-price olpOfferPrice a-text-bold"> ${rng.randint(10, 80)}.{rng.randint(10, 99)} </span>'
+        + (f'<span class="olpShippingInfo"><span class="a-color-secondary"><span class="olpShippingPrice">${rng.randint(3, 9)}.99</span></span></span>'
+           if i % 2 else '<span class="olpShippingInfo"><b class="olpFreeShipping">FREE Shipping</b></span>')
+        + f'</div><div class="a-column"><span class="a-size-medium olpCondition a-text-bold"> Used - {rng.choice(("Very Good", "Good", "Acceptable", "Like New"))} </span></div>'
+          f'<div class="a-column"><h3 class="olpSellerName"><span class="a-size-medium"><a href="/seller">{rng.choice(_WORDS).title()} Resale</a></span></h3></div></div>'
+        for i in range(8))
+    return (f"<!doctype html><html><head>{_bulk_script(rng, 30)}</head><body>{_nav(rng, 400)}"
+            f'<div id="olpOfferList"><div class="a-section">{offers}</div></div>'
+            f"<div id=\"navFooter\">{_nav(rng, 200)}</div></body></html>")
+
+
+def star_reviews_page(rng, asin):
+    reviews = "".join(_review(rng, False) for _ in range(10))
+    return (f"<!doctype html><html><head>{_bulk_script(rng, 40)}</head><body>{_nav(rng, 400)}"
+            f'<div id="cm_cr-review_list" class="a-section">{reviews}</div>'
+            f"<div id=\"navFooter\">{_nav(rng, 200)}</div></body></html>")
+
+
+PAGE_BUILDERS = {
+    "media":     media_reviews_page,
+    "offers":    offers_page,
+    "five_star": star_reviews_page,
+    "one_star":  star_reviews_page,
+}
+
+
+def write_fixtures(seed: int = 1234) -> list:
+    FIXTURES.mkdir(exist_ok=True)
+    written = []
+    for n, (asin, title, price, rating, reviews, seller, knobs) in enumerate(PRODUCTS):
+        pages = {"product": product_page(random.Random(f"{seed}-{n}-product"),
+                                         asin, title, price, rating, reviews, seller, knobs)}
+        for kind, build in PAGE_BUILDERS.items():
+            pages[kind] = build(random.Random(f"{seed}-{n}-{kind}"), asin)
+        for kind, html in pages.items():
+            path = FIXTURES / f"{asin}.{kind}.html.gz"
+            path.write_bytes(gzip.compress(html.encode("utf-8"), mtime=0))
+            written.append(path)
+    return written
+
+
+def load_fixture(asin: str, kind: str) -> str:
+    return gzip.decompress((FIXTURES / f"{asin}.{kind}.html.gz").read_bytes()).decode("utf-8")
+
+
+if __name__ == "__main__":
+    for p in write_fixtures():
+        print(f"{p.relative_to(FIXTURES.parent.parent)}  {p.stat().st_size // 1024} KB gz")
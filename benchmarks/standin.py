@@ -0,0 +1,165 @@
+"""Local stand-in for www.amazon.com serving the synthetic fixture pages.
+
+Routes mirror the ones the scraper requests (``/dp/<ASIN>``, the two kinds
+of ``/product-reviews/<ASIN>`` listing, ``/gp/offer-listing/<ASIN>/``).  An
+ASIN without fixtures is served a fixture product picked by hash, so any
+number of distinct columns can be benchmarked; review listing pages after
+the first are picked the same way.  Every response waits
+``latency`` ± ``jitter`` seconds first; pages go out gzip-encoded, as the
+real site sends them.
+
+A share of requests (``fail_rate``) can be answered the way a throttling
+host answers instead: an HTTP ``status`` (503 or 429) with an empty body,
+or with ``captcha`` a 200 robot-check page.  All three can be changed
+while the server runs.
+
+    python benchmarks/standin.py --port 8080 --latency 0.2 --jitter 0.05
+    python benchmarks/standin.py --fail-rate 0.3 --status 429
+    python benchmarks/standin.py --fail-rate 0.1 --captcha
+    AMAZON_BASE_URL=http://127.0.0.1:8080 streamlit run app.py
+"""
+
+import argparse
+import gzip
+import hashlib
+import http.server
+import random
+import re
+import sys
+import threading
+import time
+from urllib.parse import parse_qs, urlsplit
+
+from make_fixtures import FIXTURES, PRODUCTS
+
+_ASINS = [p[0] for p in PRODUCTS]
+_CAPTCHA_PAGE = gzip.compress(
+    b"<html><head><title>Robot Check</title></head><body>"
+    b"<form action='/errors/validateCaptcha'><p>Type the characters you see in this image:</p>"
+    b"<img src='/captcha/abc.jpg'><input name='field-keywords'></form></body></html>", mtime=0)
+
+
+def _route(path: str):
+    """``(asin, fixture kind)`` for a scraper URL, or ``None``."""
+    parts = urlsplit(path)
+    query = parse_qs(parts.query)
+    if m := re.match(r"/dp/([A-Z0-9]{10})", parts.path):
+        return m.group(1), "product"
+    if m := re.match(r"/gp/offer-listing/([A-Z0-9]{10})", parts.path):
+        return m.group(1), "offers"
+    if m := re.match(r"/product-reviews/([A-Z0-9]{10})", parts.path):
+        if query.get("mediaType") == ["media_reviews_only"]:
+            return m.group(1), "media"
+        star = query.get("filterByStar", [""])[0]
+        page = query.get("pageNumber", ["1"])[0]
+        if star in ("five_star", "one_star"):
+            # Later pages borrow another product's listing, so they add new reviews
+            return (m.group(1) if page == "1" else f"{m.group(1)}/{page}"), star
+    return None
+
+
+def _fixture_asin(asin: str) -> str:
+    if asin in _ASINS:
+        return asin
+    return _ASINS[int(hashlib.sha1(asin.encode()).hexdigest(), 16) % len(_ASINS)]
+
+
+class StandIn:
+    """Threaded HTTP server on ``127.0.0.1``; ``hits`` counts requests per fixture kind (and failure served)."""
+
+    def __init__(self, port: int = 0, latency: float = 0.0, jitter: float = 0.0, seed: int = 0,
+                 fail_rate: float = 0.0, status: int = 503, captcha: bool = False):
+        self.latency, self.jitter = latency, jitter
+        self.fail_rate, self.status, self.captcha = fail_rate, status, captcha
+        self.hits: dict = {}
+        self._rng  = random.Random(seed)
+        self._lock = threading.Lock()
+        self._pages: dict = {}
+        standin = self
+
+        class _Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                standin._serve(self)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = http.server.ThreadingHTTPServer(("127.0.0.1", port), _Handler)
+        self.server.daemon_threads = True
+        self.base_url = f"http://127.0.0.1:{self.server.server_port}"
+
+    def _page(self, asin: str, kind: str) -> bytes:
+        key = (_fixture_asin(asin), kind)
+        if key not in self._pages:
+            self._pages[key] = (FIXTURES / f"{key[0]}.{kind}.html.gz").read_bytes()
+        return self._pages[key]
+
+    def _delay(self) -> float:
+        with self._lock:
+            return max(0.0, self.latency + self._rng.uniform(-self.jitter, self.jitter))
+
+    def _failure(self):
+        """``None``, or the kind of failure to serve for this request."""
+        with self._lock:
+            if self._rng.random() >= self.fail_rate:
+                return None
+            kind = "captcha" if self.captcha else str(self.status)
+            self.hits[kind] = self.hits.get(kind, 0) + 1
+            return kind
+
+    def _serve(self, handler) -> None:
+        route = _route(handler.path)
+        time.sleep(self._delay())
+        if route is None:
+            handler.send_error(404)
+            return
+        failure = self._failure()
+        if failure and failure != "captcha":
+            handler.send_response(int(failure))
+            handler.send_header("Retry-After", "0")
+            handler.send_header("Content-Length", "0")
+            handler.end_headers()
+            return
+        with self._lock:
+            if not failure:
+                self.hits[route[1]] = self.hits.get(route[1], 0) + 1
+        body = _CAPTCHA_PAGE if failure else self._page(*route)
+        handler.send_response(200)
+        handler.send_header("Content-Type", "text/html;charset=UTF-8")
+        handler.send_header("Content-Encoding", "gzip")
+        handler.send_header("Content-Length", str(len(body)))
+        handler.end_headers()
+        handler.wfile.write(body)
+
+    def start(self) -> "StandIn":
+        threading.Thread(target=self.server.serve_forever, name="standin", daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--port", type=int, default=8080)
+    ap.add_argument("--latency", type=float, default=0.2, help="seconds before each response (default 0.2)")
+    ap.add_argument("--jitter", type=float, default=0.05, help="± seconds of uniform jitter (default 0.05)")
+    ap.add_argument("--fail-rate", type=float, default=0.0, help="share of requests answered with a failure (default 0)")
+    ap.add_argument("--status", type=int, choices=(503, 429), default=503, help="status of a failed request (default 503)")
+    ap.add_argument("--captcha", action="store_true", help="fail with a 200 robot-check page instead of a status")
+    args = ap.parse_args(argv)
+    standin = StandIn(args.port, args.latency, args.jitter, fail_rate=args.fail_rate,
+                      status=args.status, captcha=args.captcha)
+    print(f"Serving {len(_ASINS)} fixture products on {standin.base_url}")
+    try:
+        standin.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
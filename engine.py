@@ -0,0 +1,2228 @@
+# Scraping, caching and scoring engine behind app.py — importable without Streamlit.
+#
+#   python engine.py urls.txt --concurrency 8 --format jsonl > results.jsonl
+#
+# The input file holds one product URL or bare ASIN per line; results are
+# streamed as each product completes, so in completion order, not input order.  --record / --replay capture every HTTP
+# exchange to an archive and serve it back later with no network (use a fresh
+# PRODUCT_CACHE_PATH so the replay is not answered from the cache).  --watch
+# adds the products to the watchlist and keeps their prices fresh in the cache.
+
+import argparse
+import asyncio
+import atexit
+import base64
+import bisect
+import contextvars
+import csv
+import functools
+import gzip
+import hashlib
+import io
+import json
+import math
+import multiprocessing
+import os
+import random
+import re
+import sqlite3
+import struct
+import sys
+import threading
+import time
+import types
+import weakref
+from array import array
+from collections import Counter, OrderedDict, deque
+from collections.abc import Mapping
+from concurrent.futures import (FIRST_COMPLETED, Future, ProcessPoolExecutor, ThreadPoolExecutor, as_completed,
+                                wait)
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+
+import soupsieve
+from bs4 import BeautifulSoup, SoupStrainer, Tag
+from curl_cffi import CurlHttpVersion, CurlInfo
+from curl_cffi.requests import AsyncSession
+
+import metrics
+
+
+def _process_singleton(factory):
+    """Create the wrapped factory's object once per process, on first use."""
+    lock, made = threading.Lock(), []
+
+    @functools.wraps(factory)
+    def get():
+        if not made:
+            with lock:
+                if not made:
+                    made.append(factory())
+        return made[0]
+    return get
+
+
+# ─────────────────────────────────────────────────────────────
+# Keyword extractor for review sentiment
+# ─────────────────────────────────────────────────────────────
+_STOP = {
+    "i","me","my","we","our","you","your","he","him","his","she","her","it","its",
+    "they","them","their","this","that","these","those","am","is","are","was","were",
+    "be","been","being","have","has","had","do","does","did","a","an","the","and",
+    "but","if","or","as","of","at","by","for","with","about","to","from","in","out",
+    "on","off","so","than","too","very","can","will","just","now","not","no","nor",
+    "also","get","got","one","like","would","use","used","using","really","much",
+    "many","even","still","way","work","works","worked","product","item","bought",
+    "buy","great","good","bad","well","could","should","would","there","here","when",
+    "what","which","who","how","all","both","some","more","most","other","same",
+    "then","than","up","down","into","s","t","re","ve","ll","d","m",
+}
+
+_WORD          = re.compile(r"\b[a-z]{3,}\b")
+_KEYWORD_TERMS = 4000     # distinct terms kept per counter before pruning
+
+# Weighted stoplist: generic review words that say little about one product
+# next to another, and the hand-picked factor their counts are scaled by when
+# ranking (unlisted words count in full).  Fixed, so a product's keywords
+# depend on its own reviews only, not on what else this process has fetched.
+_GENERIC_REVIEW_WORDS = {
+    "price": 0.3, "quality": 0.3, "easy": 0.35, "love": 0.35, "recommend": 0.35, "time": 0.35,
+    "nice": 0.4, "perfect": 0.4, "value": 0.4, "money": 0.4, "worth": 0.4, "happy": 0.4,
+    "cheap": 0.4, "returned": 0.4, "return": 0.4, "broke": 0.4, "amazon": 0.4, "purchase": 0.4,
+    "excellent": 0.4, "disappointed": 0.4, "waste": 0.5, "stopped": 0.5, "fine": 0.5, "fast": 0.5,
+    "arrived": 0.5, "ordered": 0.5, "days": 0.5, "months": 0.5, "first": 0.5, "better": 0.5,
+    "best": 0.5, "little": 0.5, "replacement": 0.55, "warranty": 0.55, "packaging": 0.55,
+    "instructions": 0.55, "shipping": 0.55, "died": 0.55, "setup": 0.55, "size": 0.55,
+}
+
+
+def _prune(counts: Counter, cap: int) -> None:
+    """Keep the ``cap // 2`` most frequent entries once ``counts`` outgrows ``cap``.
+
+    Amortised O(1) per insert; a pruned term that turns up again starts
+    from zero, so rare terms are undercounted, never the frequent ones.
+    """
+    if len(counts) > cap:
+        keep = sorted(counts.items(), key=lambda tc: (-tc[1], tc[0]))[:cap // 2]
+        counts.clear()
+        counts.update(dict(keep))
+
+
+class _KeywordStats:
+    """Streaming keyword counts over review bodies, in bounded memory.
+
+    Feed one review at a time with ``add``; ``top`` can be read at any
+    point, so a partly fetched corpus already gives usable keywords.
+    Bigrams are adjacent non-stop words with only whitespace between them.
+    """
+
+    def __init__(self, bigrams: bool = True, cap: int = _KEYWORD_TERMS):
+        self.bigrams, self.cap = bigrams, cap
+        self.counts  = Counter()    # term -> occurrences
+        self.reviews = 0
+
+    def add(self, text: str) -> None:
+        text, prev = text.lower(), None
+        for m in _WORD.finditer(text):
+            w = m.group()
+            if w in _STOP:
+                prev = None
+                continue
+            if self.bigrams and prev is not None and text[prev.end():m.start()].isspace():
+                self.counts[f"{prev.group()} {w}"] += 1
+            self.counts[w] += 1
+            prev = m
+        self.reviews += 1
+        _prune(self.counts, self.cap)
+
+    def merge(self, other: "_KeywordStats") -> None:
+        """Fold in counts gathered elsewhere (another page, another process)."""
+        self.counts.update(other.counts)
+        self.reviews += other.reviews
+        _prune(self.counts, self.cap)
+
+    def top(self, n: int, weights: dict | None = None) -> list:
+        """The ``n`` strongest terms; a bigram must recur and hides the words it is made of.
+
+        ``weights`` scales the counts of the terms it lists (a weighted
+        stoplist such as ``_GENERIC_REVIEW_WORDS``).  Ties go alphabetically,
+        so the order pages arrived in never shows.
+        """
+        weights = weights or {}
+        ranked  = sorted(self.counts.items(), key=lambda tc: (-tc[1] * weights.get(tc[0], 1.0), tc[0]))
+        out, covered = [], set()
+        for term, count in ranked:
+            if " " in term:
+                if count < 2:
+                    continue
+                covered.update(term.split())
+            elif term in covered:
+                continue
+            out.append(term)
+            if len(out) == n:
+                break
+        return out
+
+
+# ─────────────────────────────────────────────────────────────
+# Star percentage parser
+# ─────────────────────────────────────────────────────────────
+def _star_percentages(rows: list) -> dict:
+    """``rows``: one ``{"label", "pct"}`` per histogram row, as extracted below."""
+    result = {}
+    for row in rows:
+        label, pct_v = row["label"], row["pct"]
+        if label is None or pct_v is None:
+            continue
+        star_m = re.search(r"(\d+)\s+star", label, re.IGNORECASE)
+        if star_m:
+            result[f"{int(star_m.group(1))}_star_percentage"] = int(pct_v)
+    return result
+
+
+# ─────────────────────────────────────────────────────────────
+# Price helper
+# ─────────────────────────────────────────────────────────────
+def _price_float(price_str: str) -> float | None:
+    try:
+        return float(re.sub(r"[^\d.]", "", str(price_str)))
+    except Exception:
+        return None
+
+
+# ─────────────────────────────────────────────────────────────
+# HTTP connection pool — shared keep-alive session, per-host rate limit, retries
+# ─────────────────────────────────────────────────────────────
+_HEADERS     = {"Accept-Language": "en-US,en;q=0.9"}
+_AMAZON_BASE = os.environ.get("AMAZON_BASE_URL", "https://www.amazon.com").rstrip("/")
+_POOL_SIZE   = int(os.environ.get("SCRAPER_POOL_SIZE", "16"))
+_HOST_RATE   = float(os.environ.get("SCRAPER_RATE", "8"))    # requests/second per host, at most
+_HOST_BURST  = float(os.environ.get("SCRAPER_BURST", "16"))
+
+_MAX_ATTEMPTS  = 4
+_BACKOFF_BASE  = 1.0    # seconds; doubled per attempt, full jitter
+_BACKOFF_CAP   = 30.0
+_THROTTLE_CODES = {429, 503}
+_RETRY_CODES    = _THROTTLE_CODES | {500, 502, 504}
+# Robot-check / CAPTCHA interstitials come back as 200s
+_BLOCK_MARKERS = ("/errors/validateCaptcha", "Type the characters you see in this image",
+                  "api-services-support@amazon.com", "<title>Robot Check</title>")
+
+
+class ThrottledError(Exception):
+    """The host kept answering 503/429 (or another 5xx) after every retry."""
+
+
+class BlockedError(Exception):
+    """The host served a robot-check / CAPTCHA page instead of the one asked for."""
+
+
+class HttpStatusError(Exception):
+    """The host answered with a non-2xx status retrying won't change (a 404 "dog page", say)."""
+
+
+def _is_block_page(r) -> bool:
+    if "captcha" in r.url.lower():
+        return True
+    if (r.headers.get("Content-Type") or "").startswith("image/"):
+        return False
+    head = r.text[:20000]
+    return any(m in head for m in _BLOCK_MARKERS)
+
+
+# Who a request is for; a host's tokens go to the most urgent waiter first
+_PRIORITIES = ("interactive", "background", "watch")
+_PRIORITY   = contextvars.ContextVar("request_priority", default=0)
+
+
+@contextmanager
+def _priority(name: str):
+    """Requests made in this block (on this thread) wait behind more urgent ones."""
+    token = _PRIORITY.set(_PRIORITIES.index(name))
+    try:
+        yield
+    finally:
+        _PRIORITY.reset(token)
+
+
+class _HostBucket:
+    """Token bucket whose rate halves on every throttle and creeps back on success.
+
+    Only touched from the pool's event loop, so it needs no lock.
+    """
+
+    def __init__(self, rate: float, burst: float):
+        self.max_rate = rate
+        self.rate     = rate
+        self.burst    = burst
+        self.tokens   = burst
+        self.stamp    = time.monotonic()
+        self.waiting  = [0] * len(_PRIORITIES)
+
+    async def take(self, priority: int = 0) -> None:
+        """Wait for a token; none goes to ``priority`` while a more urgent request is waiting."""
+        self.waiting[priority] += 1
+        try:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.stamp) * self.rate)
+                self.stamp  = now
+                if self.tokens >= 1 and not any(self.waiting[:priority]):
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep(max(1 - self.tokens, 0.1) / self.rate)
+        finally:
+            self.waiting[priority] -= 1
+
+    def throttled(self) -> None:
+        self.rate   = max(self.max_rate / 16, self.rate / 2)
+        self.tokens = min(self.tokens, 0)
+
+    def succeeded(self) -> None:
+        self.rate = min(self.max_rate, self.rate + self.max_rate / 16)
+
+
+# ── Record / replay ──────────────────────────────────────
+# SCRAPER_RECORD=<file.jsonl.gz> appends every response (or network error)
+# to a gzip'd JSON-lines archive; SCRAPER_REPLAY=<file> serves them back with
+# no network at all, after the recorded delay if SCRAPER_REPLAY_LATENCY=1.
+# Image downloads are left out unless SCRAPER_RECORD_IMAGES=1.
+_RECORD_PATH    = os.environ.get("SCRAPER_RECORD") or None
+_RECORD_IMAGES  = os.environ.get("SCRAPER_RECORD_IMAGES", "0") != "0"
+_REPLAY_PATH    = os.environ.get("SCRAPER_REPLAY") or None
+_REPLAY_LATENCY = os.environ.get("SCRAPER_REPLAY_LATENCY", "0") != "0"
+_TEXT_TYPES     = ("text/", "json", "xml", "javascript")
+
+
+class ReplayMissError(Exception):
+    """Replay mode was asked for a URL the archive has no response for."""
+
+
+def _archive_key(url: str) -> str:
+    """Path and query only, so an archive replays under any ``AMAZON_BASE_URL``."""
+    return "/" + url.split("://", 1)[-1].split("/", 1)[-1] if "://" in url else url
+
+
+def _is_text(headers) -> bool:
+    ctype = (headers.get("Content-Type") or "text/html").lower()
+    return any(t in ctype for t in _TEXT_TYPES)
+
+
+class _Recorder:
+    """Appends one JSON line per exchange; called from the pool's event loop only.
+
+    Text bodies are stored as text, anything else base64-encoded.
+    """
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._file = gzip.open(path, "at", encoding="utf-8")
+        atexit.register(self._file.close)
+
+    def write(self, url: str, elapsed: float, r=None, error: Exception | None = None) -> None:
+        entry = {"url": url, "at": time.time(), "elapsed": round(elapsed, 6)}
+        if error is not None:
+            entry["error"] = f"{type(error).__name__}: {error}"
+        else:
+            ctype = r.headers.get("Content-Type") or ""
+            if ctype.startswith("image/") and not _RECORD_IMAGES:
+                return
+            entry.update(status=r.status_code, final_url=r.url, headers=dict(r.headers))
+            if _is_text(r.headers):
+                entry["body"] = r.text
+            else:
+                entry["body_b64"] = base64.b64encode(r.content).decode("ascii")
+        self._file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self._file.flush()
+
+
+class _Headers(dict):
+    def get(self, key, default=None):
+        return super().get(key.lower(), default)
+
+
+class _Replayed:
+    """Just enough of a curl_cffi response for the scraper."""
+
+    infos = {}
+
+    def __init__(self, entry: dict):
+        self.status_code = entry["status"]
+        self.url         = entry["final_url"]
+        self.headers     = _Headers((k.lower(), v) for k, v in entry["headers"].items())
+        if "body_b64" in entry:
+            self.content = base64.b64decode(entry["body_b64"])
+            self.text    = self.content.decode("utf-8", "replace")
+        else:
+            self.text    = entry["body"]
+            self.content = self.text.encode("utf-8")
+
+
+class _Replayer:
+    """Recorded exchanges per URL, served in recording order; the last one repeats."""
+
+    def __init__(self, path: str, latency: bool):
+        self.latency = latency
+        self._entries: dict = {}
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    self._entries.setdefault(_archive_key(entry["url"]), deque()).append(entry)
+
+    async def get(self, url: str):
+        queue = self._entries.get(_archive_key(url))
+        if not queue:
+            raise ReplayMissError(f"no recorded response for {url}")
+        entry = queue.popleft() if len(queue) > 1 else queue[0]
+        if self.latency:
+            await asyncio.sleep(entry["elapsed"])
+        if "error" in entry:
+            raise ConnectionError(entry["error"])
+        return _Replayed(entry)
+
+
+class _HttpPool:
+    """Process-wide curl_cffi ``AsyncSession`` driven from a dedicated event-loop thread.
+
+    Every scraper request goes through the same curl multi handle, so TCP/TLS
+    connections are kept alive and reused across fetches and sessions, and
+    HTTP/2 streams are multiplexed when the server negotiates it.  ``size``
+    caps the number of simultaneous transfers.  Reuse is read from curl's
+    per-transfer connect count: 0 means an open connection carried it.
+
+    Requests are paced by a token bucket per host that slows down whenever
+    the host throttles.  5xx/429 responses, network errors and block pages
+    are retried with jittered exponential backoff; when the attempts run out
+    ``ThrottledError``/``BlockedError`` is raised.  Any other non-2xx status
+    raises ``HttpStatusError`` at once, so nothing bogus reaches the parsers
+    or the cache.
+
+    With ``record`` every exchange is also appended to that archive; with
+    ``replay`` responses come from an archive instead of the network.
+    """
+
+    def __init__(self, size: int, rate: float = _HOST_RATE, burst: float = _HOST_BURST,
+                 record: str | None = None, replay: str | None = None, replay_latency: bool = False):
+        self._loop = asyncio.new_event_loop()
+        threading.Thread(target=self._loop.run_forever, name="http-pool", daemon=True).start()
+        self._session  = self._run(self._open(size))
+        self._recorder = _Recorder(record) if record else None
+        self._replayer = _Replayer(replay, replay_latency) if replay else None
+        self._rate, self._burst = rate, burst
+        self._buckets: dict = {}
+        self._lock    = threading.Lock()
+        self._stats   = {"requests": 0, "new_connections": 0, "reused_connections": 0,
+                         "retries": 0, "throttled": 0, "blocked": 0, "failed": 0}
+
+    async def _open(self, size):
+        return AsyncSession(impersonate="chrome120", headers=_HEADERS, max_clients=size,
+                            http_version=CurlHttpVersion.V2TLS, curl_infos=[CurlInfo.NUM_CONNECTS])
+
+    def _run(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    def _bump(self, key: str) -> None:
+        with self._lock:
+            self._stats[key] += 1
+
+    def _count(self, r) -> None:
+        connects = r.infos.get(CurlInfo.NUM_CONNECTS)    # None on replay: no connection at all
+        with self._lock:
+            self._stats["requests"] += 1
+            if connects is not None:
+                self._stats["new_connections" if connects else "reused_connections"] += 1
+
+    async def _request(self, url: str, timeout: float):
+        if self._replayer:
+            return await self._replayer.get(url)
+        t0 = time.perf_counter()
+        try:
+            r = await self._session.get(url, timeout=timeout)
+        except Exception as exc:
+            if self._recorder:
+                self._recorder.write(url, time.perf_counter() - t0, error=exc)
+            raise
+        if self._recorder:
+            self._recorder.write(url, time.perf_counter() - t0, r)
+        return r
+
+    def _bucket(self, url: str) -> _HostBucket:
+        host = url.split("/", 3)[2] if "://" in url else ""
+        if host not in self._buckets:
+            self._buckets[host] = _HostBucket(self._rate, self._burst)
+        return self._buckets[host]
+
+    async def _fetch(self, url: str, timeout: float, priority: int = 0):
+        bucket = self._bucket(url)
+        for attempt in range(_MAX_ATTEMPTS):
+            if attempt:
+                self._bump("retries")
+                await asyncio.sleep(delay)
+            await bucket.take(priority)
+            delay = random.uniform(0, min(_BACKOFF_CAP, _BACKOFF_BASE * 2 ** attempt))
+            section, t0 = metrics.current_section(), time.perf_counter()
+            try:
+                r = await self._request(url, timeout)
+            except ReplayMissError:
+                raise
+            except Exception as exc:
+                error = exc
+                metrics.inc("http_requests_total", section=section, status="error")
+                metrics.event("http", f"GET failed ({type(exc).__name__})", time.perf_counter() - t0, url=url)
+                continue
+            dt, size = time.perf_counter() - t0, len(r.content)
+            metrics.observe("http_request_seconds", dt, section=section)
+            metrics.inc("http_requests_total", section=section, status=str(r.status_code))
+            metrics.inc("http_response_bytes_total", size, section=section)
+            metrics.event("http", f"GET {r.status_code}", dt, bytes=size, url=url)
+            self._count(r)
+            if r.status_code in _RETRY_CODES:
+                if r.status_code in _THROTTLE_CODES:
+                    self._bump("throttled")
+                    bucket.throttled()
+                    retry_after = r.headers.get("Retry-After", "")
+                    if retry_after.isdigit():
+                        delay = min(_BACKOFF_CAP, max(delay, float(retry_after)))
+                error = ThrottledError(f"HTTP {r.status_code} from {url}")
+            elif _is_block_page(r):
+                self._bump("blocked")
+                bucket.throttled()
+                error = BlockedError(f"robot check served for {url}")
+            elif not 200 <= r.status_code < 300:
+                bucket.succeeded()      # the host is answering fine, just not with this page
+                self._bump("failed")
+                raise HttpStatusError(f"HTTP {r.status_code} from {url}")
+            else:
+                bucket.succeeded()
+                return r
+        self._bump("failed")
+        raise error
+
+    def get(self, url: str, timeout: float):
+        return self.submit(url, timeout).result()
+
+    def submit(self, url: str, timeout: float) -> Future:
+        """Start fetching ``url``; the returned future lets the caller use each page as it lands."""
+        ctx, priority = metrics.current(), _PRIORITY.get()
+        async def _one():
+            metrics.adopt(ctx)   # requests are timed into the caller's product trace
+            return await self._fetch(url, timeout, priority)
+        return asyncio.run_coroutine_threadsafe(_one(), self._loop)
+
+    def get_many(self, urls: list, timeout: float) -> list:
+        """Fetch ``urls`` concurrently; a failed request comes back as its exception."""
+        ctx, priority = metrics.current(), _PRIORITY.get()
+        async def _gather():
+            metrics.adopt(ctx)
+            return await asyncio.gather(*(self._fetch(u, timeout, priority) for u in urls),
+                                        return_exceptions=True)
+        return self._run(_gather())
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._stats)
+
+
+@_process_singleton
+def _http_pool() -> _HttpPool:
+    pool = _HttpPool(_POOL_SIZE, rate=_HOST_RATE, burst=_HOST_BURST,
+                     record=_RECORD_PATH, replay=_REPLAY_PATH, replay_latency=_REPLAY_LATENCY)
+    metrics.register_collector(lambda: {f"http_pool_{k}": v for k, v in pool.stats().items()})
+    return pool
+
+
+def _get(url: str, timeout: float):
+    return _http_pool().get(url, timeout)
+
+
+# ─────────────────────────────────────────────────────────────
+# HTML parsing — lxml when installed, restricted to the regions we read
+# ─────────────────────────────────────────────────────────────
+try:
+    import lxml  # noqa: F401
+    _HTML_PARSER = "lxml"
+except ImportError:
+    _HTML_PARSER = "html.parser"
+_HTML_PARSER = os.environ.get("SCRAPER_HTML_PARSER", _HTML_PARSER)
+_PARSE_ONLY  = os.environ.get("SCRAPER_PARSE_ONLY", "1") != "0"
+
+
+class _RegionStrainer(SoupStrainer):
+    """Only build the subtrees rooted at an element with one of ``ids``, ``classes``
+    or ``attrs``; everything else on the page (scripts, nav, carousels) is skipped.
+
+    Matching elements keep their whole subtree and document order, so the
+    selectors run afterwards see exactly what they would in the full tree.
+    """
+
+    def __init__(self, ids=(), classes=(), attrs=(), customer_imgs=False):
+        super().__init__()
+        self.ids, self.classes = frozenset(ids), frozenset(classes)
+        self.attrs, self.customer_imgs = tuple(attrs), customer_imgs
+
+    def allow_tag_creation(self, nsprefix, name, attrs) -> bool:
+        if not attrs:
+            return False
+        if attrs.get("id") in self.ids:
+            return True
+        cls = attrs.get("class")
+        if cls and not self.classes.isdisjoint(cls.split() if isinstance(cls, str) else cls):
+            return True
+        if any(a in attrs for a in self.attrs):
+            return True
+        return self.customer_imgs and name == "img" and attrs.get("alt", "").startswith("Customer Image")
+
+
+_REVIEW_IMG_ATTRS = ("data-hook", "data-lazyimagesource", "data-mediaid")
+
+_PRODUCT_REGIONS = _RegionStrainer(
+    ids=("productTitle", "acrPopover", "acrCustomerReviewText", "histogramTable", "altImages",
+         "landingImage", "merchant-info", "sellerProfileTriggerId", "tabular-buybox",
+         "tabular-buybox-container", "buybox-see-all-buying-choices-announce", "desktop_buyBox",
+         "mir-layout-DELIVERY_BLOCK", "ddmDeliveryMessage", "deliveryBlockMessage", "twister",
+         "variation_color_name", "variation_size_name", "frequently-bought-together", "sims-fbt",
+         "bylineInfo", "availability", "feature-bullets", "productDescription",
+         "wayfinding-breadcrumbs_container", "cm_cr-review_list"),
+    classes=("a-price", "cr-lighthouse-summary"),
+    attrs=_REVIEW_IMG_ATTRS + ("data-testid", "data-csa-c-delivery-promise-type"),
+    customer_imgs=True,
+)
+_MEDIA_REVIEW_REGIONS = _RegionStrainer(ids=("cm_cr-review_list",), attrs=_REVIEW_IMG_ATTRS,
+                                        customer_imgs=True)
+_OFFER_REGIONS        = _RegionStrainer(classes=("olpOffer",), attrs=("data-asin",))
+_REVIEW_BODY_REGIONS  = SoupStrainer(attrs={"data-hook": "review-body"})
+
+
+def _soup(html_text: str, regions: SoupStrainer | None = None, page: str = "other") -> BeautifulSoup:
+    with metrics.timed("parse_seconds", "parse", page, page=page):
+        return BeautifulSoup(html_text, _HTML_PARSER, parse_only=regions if _PARSE_ONLY else None)
+
+
+# ─────────────────────────────────────────────────────────────
+# Declarative extraction — field → ordered selectors → post-processor,
+# compiled once and resolved in a single walk of the tree
+# ─────────────────────────────────────────────────────────────
+def _text(el) -> str:
+    return el.get_text(strip=True)
+
+
+class _First:
+    """The first element (document order) matching each selector, tried in order.
+
+    ``post`` turns an element into the field value; ``None`` means "no good,
+    try the next selector".  ``default`` is used when none of them give one.
+    """
+
+    def __init__(self, *selectors, post=_text, default="N/A"):
+        self.selectors, self.post, self.default = selectors, post, default
+
+
+class _Every:
+    """Every element matching ``selector``, in document order, handed to ``post`` as a list.
+
+    With ``fields`` each match is itself extracted with that sub-spec (scoped
+    to the element's descendants, like ``el.select``) and ``post`` gets the
+    list of resulting dicts.
+    """
+
+    def __init__(self, selector, post=list, fields=None):
+        self.selectors, self.post = (selector,), post
+        self.fields = _Plan(fields) if fields else None
+
+
+def _compound_key(sel) -> tuple:
+    """Something a tag must carry to match compound ``sel``: its id, a class,
+    an attribute name or the tag name, in that order of preference."""
+    if sel.ids:
+        return ("id", sel.ids[0].lower())
+    if sel.classes:
+        return ("class", sel.classes[0].lower())
+    if sel.attributes:
+        return ("attr", sel.attributes[0].attribute.lower())
+    if sel.tag and sel.tag.name != "*":
+        return ("name", sel.tag.name.lower())
+    return ("*", None)
+
+
+def _index_entries(compiled) -> list:
+    """``(key, ancestor keys)`` per comma alternative: the rightmost compound's key,
+    plus the keys of every compound that must be an ancestor (`` `` and ``>``)."""
+    entries = []
+    for sel in compiled.selectors:
+        required, rel = set(), sel.relation
+        while rel:
+            if rel[0].rel_type in (" ", ">"):
+                required.add(_compound_key(rel[0]))
+            rel = rel[0].relation
+        required.discard(("*", None))
+        entries.append((_compound_key(sel), frozenset(required)))
+    return entries
+
+
+def _tag_keys(tag) -> list:
+    keys = [("*", None), ("name", tag.name)]
+    for attr, value in tag.attrs.items():
+        keys.append(("attr", attr))
+        if attr == "id":
+            keys.append(("id", value.lower()))
+        elif attr == "class":
+            keys.extend(("class", c.lower()) for c in (value.split() if isinstance(value, str) else value))
+    return keys
+
+
+class _Plan:
+    """A compiled spec: every selector compiled once, indexed by ``_index_entries``.
+
+    Named (top-level) plans are timed: the walk per page, and each field's
+    post-processing.
+    """
+
+    def __init__(self, spec: dict, name: str | None = None):
+        self.spec   = spec
+        self.name   = name
+        self.rules: list = []   # (compiled selector, first-only, sub-plan)
+        self.fields: dict = {}  # field -> rule ids, in selector order
+        self.index: dict = {}   # index key -> (rule id, required ancestor keys)
+        for field, rule in spec.items():
+            self.fields[field] = []
+            for sel in rule.selectors:
+                rid      = len(self.rules)
+                compiled = soupsieve.compile(sel)
+                self.rules.append((compiled, isinstance(rule, _First), getattr(rule, "fields", None)))
+                self.fields[field].append(rid)
+                for key, required in _index_entries(compiled):
+                    self.index.setdefault(key, []).append((rid, required))
+
+
+class _Scope:
+    """Matches collected for one plan under one root element."""
+    __slots__ = ("plan", "first", "every")
+
+    def __init__(self, plan: _Plan):
+        self.plan, self.first, self.every = plan, {}, {}
+
+    def visit(self, tag, keys, ancestors: dict, active: list) -> None:
+        index, rules = self.plan.index, self.plan.rules
+        seen = set()
+        for key in keys:
+            for rid, required in index.get(key, ()):
+                if rid in seen or required and not all(ancestors.get(k) for k in required):
+                    continue
+                seen.add(rid)
+                compiled, first_only, sub = rules[rid]
+                if first_only and rid in self.first or not compiled.match(tag):
+                    continue
+                if first_only:
+                    self.first[rid] = tag
+                elif sub:
+                    scope = _Scope(sub)
+                    self.every.setdefault(rid, []).append(scope)
+                    active.append(scope)
+                else:
+                    self.every.setdefault(rid, []).append(tag)
+
+    def resolve(self) -> dict:
+        out, name = {}, self.plan.name
+        for field, rule in self.plan.spec.items():
+            rids = self.plan.fields[field]
+            t0   = time.perf_counter()
+            if isinstance(rule, _First):
+                out[field] = rule.default
+                for rid in rids:
+                    el = self.first.get(rid)
+                    if el is not None and (value := rule.post(el)) is not None:
+                        out[field] = value
+                        break
+            else:
+                found = self.every.get(rids[0], [])
+                out[field] = rule.post([s.resolve() for s in found] if rule.fields else found)
+            if name:
+                metrics.observe("extract_field_seconds", time.perf_counter() - t0, page=name, field=field)
+        return out
+
+
+def _extract(plan: _Plan, root) -> dict:
+    """Resolve every field of ``plan`` over ``root``'s descendants in one traversal.
+
+    A tag is only tested against the selectors its id, classes, attributes
+    or name could satisfy, and whose ancestor compounds have a plausible
+    match among the open ancestors (keys counted in ``ancestors``).
+    ``_Every(..., fields=...)`` matches open a nested scope that sees the
+    descendants of the matched element.
+    """
+    t0        = time.perf_counter()
+    top       = _Scope(plan)
+    active    = [top]
+    ancestors: dict = {}
+    stack     = [(iter(root.contents), 1, ())]   # (children, scopes to keep on leaving, parent keys)
+    while stack:
+        children, keep, _keys = stack[-1]
+        for node in children:
+            if isinstance(node, Tag):
+                mark = len(active)
+                keys = _tag_keys(node)
+                for scope in active[:mark]:
+                    scope.visit(node, keys, ancestors, active)
+                if node.contents:
+                    for k in keys:
+                        ancestors[k] = ancestors.get(k, 0) + 1
+                    stack.append((iter(node.contents), mark, keys))
+                else:
+                    del active[mark:]
+                break
+        else:
+            stack.pop()
+            del active[keep:]
+            for k in _keys:
+                ancestors[k] -= 1
+    if not plan.name:
+        return top.resolve()
+    walked = time.perf_counter()
+    metrics.observe("extract_walk_seconds", walked - t0, page=plan.name)
+    out = top.resolve()
+    done = time.perf_counter()
+    metrics.observe("extract_seconds", done - t0, page=plan.name)
+    metrics.event("extract", f"{plan.name} (walk {(walked - t0) * 1000:.1f} ms)", done - t0)
+    return out
+
+
+# ─────────────────────────────────────────────────────────────
+# Review image scraper (product page + media-reviews page)
+# ─────────────────────────────────────────────────────────────
+_REVIEW_IMG_FIELDS = {
+    "lazy":      _Every("[data-lazyimagesource]"),
+    "media_ids": _Every("[data-mediaid]"),
+    "customer":  _Every('img[alt^="Customer Image"]'),
+    "tiles":     _Every("[data-hook='review-image-tile'] img, [data-hook='review'] img, #cm_cr-review_list img"),
+}
+
+
+def _scrape_review_imgs(html_text: str, got: dict) -> list:
+    """Review image URLs from the ``_REVIEW_IMG_FIELDS`` matches in ``got``."""
+    seen, found = set(), []
+    def _add(u):
+        if not u: return
+        u = u.split("?")[0]
+        if "media-amazon.com/images/I/" not in u: return
+        u = re.sub(r"\._[A-Z0-9_,]+_\.", "._SL1000_.", u)
+        if u not in seen: seen.add(u); found.append(u)
+    for el in got["lazy"]:
+        _add(el.get("data-lazyimagesource", ""))
+    for el in got["media_ids"]:
+        mid = el.get("data-mediaid", "").strip()
+        if mid and re.match(r"^[A-Za-z0-9+/]{8,20}$", mid):
+            _add(f"https://m.media-amazon.com/images/I/{mid}.jpg")
+    for img in got["customer"]:
+        src = img.get("src") or img.get("data-src") or ""
+        if "transparent-pixel" in src or "grey-pixel" in src: continue
+        _add(src)
+    for img in got["tiles"]:
+        if img.find_parent(class_=re.compile(r"a-profile|avatar", re.I)): continue
+        if img.find_parent(attrs={"data-hook": "genome-widget"}): continue
+        src = img.get("src") or img.get("data-src") or ""
+        if "transparent-pixel" in src or "grey-pixel" in src: continue
+        if re.search(r"\._(?:SX|SY|UX|UY)[1-4]\d[_.]", src): continue
+        if re.search(r"_UR\d{1,2},\d{1,2}_", src): continue
+        _add(src)
+    if not found:
+        for _t, large in re.findall(
+            r'"thumb"\s*:\s*"(https://[^"]+)"[^}]{0,300}?"large"\s*:\s*"(https://[^"]+)"', html_text
+        ):
+            if not re.search(r"\._(?:SX|SY)[1-4]\d[_.]", large): _add(large)
+    return found
+
+
+# ─────────────────────────────────────────────────────────────
+# Product page parser
+# ─────────────────────────────────────────────────────────────
+def _customers_say(el) -> str | None:
+    return re.sub(r"^Customers\s+say\s*", "", _text(el), flags=re.IGNORECASE).strip() or None
+
+
+def _short_text(el) -> str | None:
+    t = _text(el)
+    return t if t and len(t) < 80 else None
+
+
+def _alt_images(imgs: list) -> list:
+    large = (re.sub(r"\._[A-Z0-9_,]+_\.", "._AC_SL1500_.", el.get("src", "")) for el in imgs)
+    return [u for u in large if u.startswith("https")]
+
+
+def _variants(groups: list) -> dict:
+    variants: dict = {}
+    for g in groups:
+        opts = g["opts"] or g["alt_opts"]   # fallback: span/option text
+        if g["label"] is not None and opts:
+            variants[g["label"].rstrip(":")] = opts[:20]
+    return variants
+
+
+def _texts(els: list, keep=bool) -> list:
+    """Stripped text of each element, computed once, filtered by ``keep``."""
+    return [t for t in map(_text, els) if keep(t)]
+
+
+_PRODUCT_PLAN = _Plan({
+    "name":           _First("#productTitle"),
+    "pricing":        _First(".a-price .a-offscreen"),
+    "average_rating": _First("#acrPopover", post=lambda el: el["title"].split()[0] if el.get("title") else None),
+    "total_reviews":  _First("#acrCustomerReviewText", default=None,
+                             post=lambda el: int(re.sub(r"[^\d]", "", el.get_text()))),
+    "stars":          _Every("#histogramTable li", post=_star_percentages, fields={
+        "label": _First("a[aria-label]", post=lambda el: el.get("aria-label", ""), default=None),
+        "pct":   _First(".a-meter[aria-valuenow]", post=lambda el: el.get("aria-valuenow"), default=None),
+    }),
+    "alt_images":     _Every("#altImages img", post=_alt_images),
+    "landing_image":  _First("#landingImage", post=lambda el: [el["src"]] if el.get("src") else None, default=[]),
+    "customers_say":  _First("[data-testid='overall-summary']", "[data-hook='cr-insights-widget-summary']",
+                             ".cr-lighthouse-summary", "[data-hook='cr-insights-widget-aspects']",
+                             post=_customers_say),
+    "seller_name":    _First("#merchant-info a", "#sellerProfileTriggerId", "#tabular-buybox [tabindex='0']",
+                             "#buybox-see-all-buying-choices-announce", post=_short_text),
+    # Sold directly by Amazon? — whichever buy box container exists first
+    "sold_by_amazon": _First("#tabular-buybox-container", "#merchant-info", "#desktop_buyBox",
+                             post=lambda el: "Amazon" in el.get_text(), default=False),
+    "arrival":        _First("#mir-layout-DELIVERY_BLOCK span.a-text-bold", "#ddmDeliveryMessage .a-text-bold",
+                             "[data-csa-c-delivery-promise-type] .a-text-bold",
+                             "#deliveryBlockMessage .a-text-bold"),
+    # Broader fallback — first delivery block text
+    "arrival_block":  _First("#mir-layout-DELIVERY_BLOCK", "#ddmDeliveryMessage",
+                             post=lambda el: el.get_text(" ", strip=True)[:120] or None),
+    "variants":       _Every("#twister .a-form-group, #variation_color_name, #variation_size_name",
+                             post=_variants, fields={
+        "label":    _First(".a-form-label, .a-declarative label", default=None),
+        "opts":     _Every("li", post=lambda els: _texts(els, lambda t: t and len(t) < 50)),
+        "alt_opts": _Every("span.selection, option", post=_texts),
+    }),
+    "fbt":            _Every("#frequently-bought-together .a-list-item, #sims-fbt .a-list-item",
+                             post=lambda items: [i for i in items if i["name"] is not None][:4], fields={
+        "name":  _First(".a-truncate-full, .a-size-small.a-color-base", post=lambda el: _text(el)[:80], default=None),
+        "price": _First(".a-price .a-offscreen"),
+        "img":   _First("img", post=lambda el: el.get("src", ""), default=""),
+    }),
+    "brand":          _First("#bylineInfo"),
+    "availability":   _First("#availability span"),
+    "features":       _Every("#feature-bullets li span.a-list-item", post=_texts),
+    "description":    _First("#productDescription"),
+    "categories":     _Every("#wayfinding-breadcrumbs_container li span",
+                             post=lambda els: " > ".join(_texts(els, lambda t: t not in ("", "›"))) or "N/A"),
+    "histogram_html": _First("#histogramTable", post=lambda el: str(el)[:3000], default=""),
+    **_REVIEW_IMG_FIELDS,
+}, "product")
+
+
+def _parse_product_page(html_text: str) -> dict:
+    """Everything read from the main product page (the ``page`` section)."""
+    got  = _extract(_PRODUCT_PLAN, _soup(html_text, _PRODUCT_REGIONS, "product"))
+    data = {k: got[k] for k in ("name", "pricing", "average_rating", "total_reviews")}
+    data.update(got["stars"])
+
+    # Stock images: the hi-res gallery script, else the thumbnail strip, else the main image
+    matches = re.findall(r'"hiRes":"(https://[^"]+)"', html_text)
+    data["images"] = list(dict.fromkeys(matches)) if matches else got["alt_images"] or got["landing_image"]
+
+    data["customers_say"] = {"summary": got["customers_say"]}
+    data["seller"]        = {"name": got["seller_name"], "is_amazon": got["sold_by_amazon"]}
+    data["arrival_date"]  = got["arrival"] if got["arrival"] != "N/A" else got["arrival_block"]
+    data["variants"]      = got["variants"]
+    data["frequently_bought_together"] = got["fbt"]
+    for k in ("brand", "availability", "features", "description", "categories"):
+        data[k] = got[k]
+    data["_debug_histogram_html"] = got["histogram_html"]
+
+    # Review images embedded in the product page; merged with the media-reviews page later
+    data["_page_review_images"] = _scrape_review_imgs(html_text, got)
+    return data
+
+
+# ─────────────────────────────────────────────────────────────
+# ASIN-derived sub-requests (run concurrently with the main page)
+# ─────────────────────────────────────────────────────────────
+_MEDIA_REVIEW_PLAN = _Plan(_REVIEW_IMG_FIELDS, "media_reviews")
+
+
+def _parse_media_review_page(html_text: str) -> list:
+    soup = _soup(html_text, _MEDIA_REVIEW_REGIONS, "media_reviews")
+    return _scrape_review_imgs(html_text, _extract(_MEDIA_REVIEW_PLAN, soup))
+
+
+def _offer(o: dict) -> dict:
+    free = o["free_ship"] is not None and "free" in o["free_ship"].lower()
+    return {
+        "price":  o["price"],
+        "ship":   "FREE" if free or o["ship"] is None else o["ship"],
+        "cond":   o["cond"],
+        "seller": o["seller"],
+    }
+
+
+_OFFER_PLAN = _Plan({
+    "offers": _Every(".a-row.olpOffer, [data-asin] .a-section",
+                     post=lambda offers: [_offer(o) for o in offers[:6] if o["price"] is not None], fields={
+        "price":     _First(".olpOfferPrice, .a-price .a-offscreen", default=None),
+        "ship":      _First(".olpShippingPrice", default=None),
+        "free_ship": _First(".olpFreeShipping, .a-color-success", default=None),
+        "cond":      _First(".olpCondition, .a-size-medium.a-color-base", post=lambda el: _text(el)[:40], default="Used"),
+        "seller":    _First(".olpSellerName a, .a-profile-name", post=lambda el: _text(el)[:40], default=""),
+    }),
+}, "used_offers")
+
+
+def _parse_used_offers(html_text: str) -> list:
+    return _extract(_OFFER_PLAN, _soup(html_text, _OFFER_REGIONS, "used_offers"))["offers"]
+
+
+def _review_bodies(html_text: str) -> list:
+    ss = _soup(html_text, _REVIEW_BODY_REGIONS, "reviews")
+    with metrics.timed("extract_seconds", "extract", "reviews", page="reviews"):
+        return [el.get_text(" ", strip=True) for el in ss.select('[data-hook="review-body"]')]
+
+
+def _page_keywords(html_text: str) -> _KeywordStats:
+    stats = _KeywordStats()
+    for body in _review_bodies(html_text):
+        stats.add(body)
+    return stats
+
+
+# ─────────────────────────────────────────────────────────────
+# Parse pool — soup building and extraction in worker processes, off the GIL
+# ─────────────────────────────────────────────────────────────
+# 0 parses on the calling thread — the default on one core, where a worker only adds pickling and IPC
+_PARSE_WORKERS = int(os.environ.get("SCRAPER_PARSE_WORKERS",
+                                    str(min(4, os.cpu_count() or 1) if (os.cpu_count() or 1) > 1 else 0)))
+
+
+def _parse_captured(parse, html_text: str) -> tuple:
+    """Worker side: the parser's compact result plus the metrics it recorded."""
+    with metrics.capture() as records:
+        return parse(html_text), records
+
+
+class _ParsePool:
+    """Runs page parsers in spawned worker processes.
+
+    Only the HTML goes out and only the extracted dict (and its timings,
+    replayed into the caller's trace) comes back.  A crashed worker
+    replaces the pool and that one page is parsed on the calling thread.
+    """
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self._lock   = threading.Lock()
+        self._pool   = self._new()
+
+    def _new(self) -> ProcessPoolExecutor:
+        # spawn, not fork: the parent runs threads (HTTP loop, Streamlit) whose locks fork would copy
+        return ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+
+    def run(self, parse, html_text: str):
+        with self._lock:
+            pool = self._pool
+        t0 = time.perf_counter()
+        try:
+            result, records = pool.submit(_parse_captured, parse, html_text).result()
+        except BrokenProcessPool:
+            with self._lock:
+                if self._pool is pool:
+                    self._pool = self._new()
+            metrics.inc("parse_pool_restarts_total")
+            return parse(html_text)
+        metrics.replay(records)
+        metrics.observe("parse_pool_seconds", time.perf_counter() - t0, page=parse.__name__)
+        return result
+
+
+@_process_singleton
+def _parse_pool() -> _ParsePool:
+    return _ParsePool(_PARSE_WORKERS)
+
+
+def _parse(parse, html_text: str):
+    """``parse(html_text)``, in the worker pool unless ``_PARSE_WORKERS`` is 0."""
+    return _parse_pool().run(parse, html_text) if _PARSE_WORKERS > 0 else parse(html_text)
+
+
+# ─────────────────────────────────────────────────────────────
+# Sections — one per request; each is fetched, cached and refreshed on its own
+# ─────────────────────────────────────────────────────────────
+_SENTIMENT_STARS    = (("five_star", "positive"), ("one_star", "negative"))
+_SENTIMENT_PAGES    = max(1, int(os.environ.get("SCRAPER_SENTIMENT_PAGES", "3")))
+_SENTIMENT_KEYWORDS = 8
+
+
+def _fetch_page(url: str, asin: str | None) -> dict:
+    return _parse(_parse_product_page, _get(url, timeout=20).text)
+
+
+def _fetch_media_reviews(url: str, asin: str) -> dict:
+    r = _get(f"{_AMAZON_BASE}/product-reviews/{asin}"
+             f"?filterByStar=all_stars&mediaType=media_reviews_only&pageNumber=1", timeout=15)
+    return {"_media_review_images": _parse(_parse_media_review_page, r.text)}
+
+
+def _fetch_used_offers(url: str, asin: str) -> dict:
+    r = _get(f"{_AMAZON_BASE}/gp/offer-listing/{asin}/?f_used=true", timeout=15)
+    return {"used_offers": _parse(_parse_used_offers, r.text)}
+
+
+def _sentiment_fields(stats: dict) -> dict:
+    return {"review_sentiment": {
+        **{key: stats[key].top(_SENTIMENT_KEYWORDS, _GENERIC_REVIEW_WORDS) for _star, key in _SENTIMENT_STARS},
+        "reviews": {key: stats[key].reviews for _star, key in _SENTIMENT_STARS},
+    }}
+
+
+def _fetch_sentiment(url: str, asin: str) -> dict:
+    """5★ praise + 1★ complaints over ``_SENTIMENT_PAGES`` listing pages of each.
+
+    Every page is requested at once and counted as it arrives.  On a first
+    fetch the keywords so far are cached after each page, already expired,
+    so the UI shows them (marked as refreshing) before the last page lands.
+    """
+    cache = _product_cache()
+    partial = "sentiment" not in cache.load(asin)
+    stats   = {key: _KeywordStats() for _star, key in _SENTIMENT_STARS}
+    futures = {_http_pool().submit(
+                   f"{_AMAZON_BASE}/product-reviews/{asin}?filterByStar={star}&pageNumber={n}", timeout=12): key
+               for star, key in _SENTIMENT_STARS for n in range(1, _SENTIMENT_PAGES + 1)}
+    errors, left = [], len(futures)
+    for fut in as_completed(futures):
+        left -= 1
+        try:
+            stats[futures[fut]].merge(_parse(_page_keywords, fut.result().text))
+        except Exception as e:
+            errors.append(e)
+            continue
+        if partial and left:
+            cache.store(asin, "sentiment", _sentiment_fields(stats), fetched_at=0)
+    if len(errors) == len(futures):
+        raise errors[0]
+    return _sentiment_fields(stats)
+
+
+_SECTION_FETCHERS = {
+    "page":          _fetch_page,
+    "media_reviews": _fetch_media_reviews,
+    "used_offers":   _fetch_used_offers,
+    "sentiment":     _fetch_sentiment,
+}
+
+
+# ─────────────────────────────────────────────────────────────
+# Product cache — SQLite, keyed on ASIN, per-field TTL
+# ─────────────────────────────────────────────────────────────
+_CACHE_PATH = os.environ.get("PRODUCT_CACHE_PATH",
+                             os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "products.sqlite3"))
+
+_MINUTE, _HOUR, _DAY = 60, 60 * 60, 24 * 60 * 60
+_FIELD_TTL = {
+    # Volatile: what a shopper would see change between two visits
+    "pricing": 15 * _MINUTE, "availability": 15 * _MINUTE, "arrival_date": 15 * _MINUTE,
+    "used_offers": 15 * _MINUTE, "seller": _HOUR,
+    # Review-driven: drifts slowly
+    "average_rating": 12 * _HOUR, "total_reviews": 12 * _HOUR, "customers_say": _DAY,
+    "review_sentiment": _DAY, "_page_review_images": _DAY, "_media_review_images": _DAY,
+}
+_DEFAULT_TTL = 7 * _DAY   # title, images, features, description, brand, categories, …
+
+
+def _field_ttl(field: str) -> float:
+    if field.endswith("_star_percentage"):
+        return _FIELD_TTL["average_rating"]
+    return _FIELD_TTL.get(field, _DEFAULT_TTL)
+
+
+def _asin_from_url(url: str) -> str | None:
+    asin_m = re.search(r"/(?:dp|product|gp/product)/([A-Z0-9]{10})", url)
+    return asin_m.group(1) if asin_m else None
+
+
+class _ProductCache:
+    """Scraped sections stored per (ASIN, section, field).
+
+    A section counts as fresh while every one of its fields is inside its
+    TTL; storing a section replaces all of its previous rows.
+    """
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db   = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        self._writes = Counter()    # asin -> stores by this process, so readers can spot new data
+        with self._lock:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS product_fields ("
+                " asin TEXT NOT NULL, section TEXT NOT NULL, field TEXT NOT NULL,"
+                " value TEXT NOT NULL, fetched_at REAL NOT NULL,"
+                " PRIMARY KEY (asin, section, field))")
+
+    def load(self, asin: str) -> dict:
+        """``{section: (fields, stale_fields)}`` for everything cached under ``asin``."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT section, field, value, fetched_at FROM product_fields WHERE asin = ?",
+                (asin,)).fetchall()
+        now, sections = time.time(), {}
+        for section, field, value, fetched_at in rows:
+            fields, stale = sections.setdefault(section, ({}, set()))
+            fields[field] = json.loads(value)
+            if now - fetched_at >= _field_ttl(field):
+                stale.add(field)
+        return sections
+
+    def store(self, asin: str, section: str, fields: dict, fetched_at: float | None = None) -> None:
+        """Replace ``section``; pass ``fetched_at=0`` for partial results that should read as stale."""
+        now = time.time() if fetched_at is None else fetched_at
+        rows = [(asin, section, f, json.dumps(v), now) for f, v in fields.items()]
+        with self._lock, self._db:      # commits, or rolls back so the shared connection stays usable
+            self._db.execute("BEGIN")
+            self._db.execute("DELETE FROM product_fields WHERE asin = ? AND section = ?", (asin, section))
+            self._db.executemany("INSERT INTO product_fields VALUES (?, ?, ?, ?, ?)", rows)
+            self._writes[asin] += 1
+
+    def fetched_at(self, asins: list) -> dict:
+        """``{(asin, section): when its oldest field was fetched}`` for the given products."""
+        with self._lock:
+            return {(a, s): t for a, s, t in self._db.execute(
+                "SELECT asin, section, MIN(fetched_at) FROM product_fields"
+                f" WHERE asin IN ({','.join('?' * len(asins))}) GROUP BY asin, section", asins)}
+
+    def value(self, asin: str, section: str, key: str):
+        """One cached field, or ``None``."""
+        with self._lock:
+            row = self._db.execute("SELECT value FROM product_fields WHERE asin = ? AND section = ? AND field = ?",
+                                   (asin, section, key)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def version(self, asin: str) -> int:
+        with self._lock:
+            return self._writes[asin]
+
+    def invalidate(self, asin: str, sections=None) -> None:
+        """Drop one product (or just some of its sections); every other entry stays warm."""
+        with self._lock:
+            if sections is None:
+                self._db.execute("DELETE FROM product_fields WHERE asin = ?", (asin,))
+            else:
+                self._db.executemany("DELETE FROM product_fields WHERE asin = ? AND section = ?",
+                                     [(asin, s) for s in sections])
+
+
+@_process_singleton
+def _product_cache() -> _ProductCache:
+    return _ProductCache(_CACHE_PATH)
+
+
+# ─────────────────────────────────────────────────────────────
+# Price history — per-ASIN append-only files of fixed-width records, read as column arrays
+# ─────────────────────────────────────────────────────────────
+_HISTORY_DIR     = os.path.join(os.path.dirname(_CACHE_PATH), "history")
+_HISTORY_RECORD  = struct.Struct("<dffB")   # fetched at, new price, lowest used price, availability
+_HISTORY_SERIES  = 256                      # series held in memory
+_HISTORY_MIN_GAP = _HOUR                    # an unchanged row is written at most this often
+_AVAILABILITY    = ("unknown", "in stock", "low stock", "unavailable")
+
+
+def _availability_code(text: str) -> int:
+    t = (text or "").lower()
+    if "unavailable" in t or "out of stock" in t:
+        return 3
+    if "only" in t and "left" in t:
+        return 2
+    return 1 if "in stock" in t else 0
+
+
+class _Series:
+    __slots__ = ("at", "new", "used", "avail")
+
+    def __init__(self):
+        self.at, self.new, self.used, self.avail = array("d"), array("f"), array("f"), array("B")
+
+    def append(self, at, new, used, avail) -> None:
+        self.at.append(at); self.new.append(new); self.used.append(used); self.avail.append(avail)
+
+
+class _PriceHistory:
+    """Price, lowest used price and availability over time, one ``<asin>.bin`` per product.
+
+    Rows are only ever appended, in time order, so a series is read once
+    into column arrays and a time range is two bisections.  A row equal to
+    the previous one is skipped unless ``_HISTORY_MIN_GAP`` has passed.
+    """
+
+    def __init__(self, root: str, keep: int = _HISTORY_SERIES):
+        os.makedirs(root, exist_ok=True)
+        self.root, self.keep = root, keep
+        self._lock   = threading.Lock()
+        self._series = OrderedDict()    # asin -> _Series, least recently used first
+
+    def _load(self, asin: str) -> _Series:
+        series = self._series.get(asin)
+        if series is not None:
+            self._series.move_to_end(asin)
+            return series
+        series = self._series[asin] = _Series()
+        try:
+            with open(os.path.join(self.root, f"{asin}.bin"), "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            data = b""
+        whole = len(data) - len(data) % _HISTORY_RECORD.size    # a torn last write is ignored
+        for row in _HISTORY_RECORD.iter_unpack(data[:whole]):
+            series.append(*row)
+        if len(self._series) > self.keep:
+            self._series.popitem(last=False)
+        return series
+
+    def append(self, asin: str, new: float | None, used: float | None, availability: str,
+               at: float | None = None) -> bool:
+        nan  = float("nan")
+        row  = _HISTORY_RECORD.pack(0, nan if new is None else new, nan if used is None else used,
+                                    _availability_code(availability))
+        with self._lock:
+            series = self._load(asin)
+            at     = max(time.time() if at is None else at, series.at[-1] if series.at else 0)
+            if series.at:
+                last = _HISTORY_RECORD.pack(0, series.new[-1], series.used[-1], series.avail[-1])
+                if last == row and at - series.at[-1] < _HISTORY_MIN_GAP:
+                    return False
+            values = _HISTORY_RECORD.unpack(row)[1:]      # as stored: float32 prices
+            with open(os.path.join(self.root, f"{asin}.bin"), "ab") as f:
+                f.write(_HISTORY_RECORD.pack(at, *values))
+            series.append(at, *values)
+        return True
+
+    def range(self, asin: str, start: float = 0, end: float = float("inf")) -> dict:
+        """Rows with ``start <= at <= end`` as columns; a missing price is ``None``."""
+        with self._lock:
+            s = self._load(asin)
+            i, j = bisect.bisect_left(s.at, start), bisect.bisect_right(s.at, end)
+            cols = s.at[i:j], s.new[i:j], s.used[i:j], s.avail[i:j]
+        price = lambda v: None if math.isnan(v) else round(v, 2)
+        return {"at":           cols[0].tolist(),
+                "new":          [price(v) for v in cols[1]],
+                "used":         [price(v) for v in cols[2]],
+                "availability": [_AVAILABILITY[v] for v in cols[3]]}
+
+
+@_process_singleton
+def _price_history() -> _PriceHistory:
+    return _PriceHistory(_HISTORY_DIR)
+
+
+def _record_price(asin: str) -> None:
+    """Append the product's current cached price, lowest used price and availability."""
+    cached = _product_cache().load(asin)
+    if "page" not in cached:
+        return      # the used offers landed first; the page fetch records both
+    page   = cached["page"][0]
+    offers = cached.get("used_offers", ({}, set()))[0].get("used_offers") or []
+    used   = [v for v in (_price_float(o.get("price", "")) for o in offers) if v is not None]
+    _price_history().append(asin, _price_float(page.get("pricing", "")), min(used, default=None),
+                            page.get("availability", ""))
+
+
+# ─────────────────────────────────────────────────────────────
+# Image cache — fetched once server-side, content-addressed on disk, LRU in a byte budget
+# ─────────────────────────────────────────────────────────────
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+# Served by Streamlit's static file serving as app/static/img/<name>
+IMAGE_DIR     = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static", "img")
+_IMAGE_BUDGET = int(float(os.environ.get("IMAGE_CACHE_MB", "512")) * 2**20)
+_THUMB_HEIGHT = 260      # 2× the 130 px the galleries draw
+_IMAGE_EXTS   = {"image/jpeg": ".jpg", "image/png": ".png", "image/webp": ".webp", "image/gif": ".gif"}
+
+
+class _ImageCache:
+    """Remote images stored under the hash of their bytes, each with a downscaled thumbnail.
+
+    ``files`` answers from memory and queues anything missing for a
+    background download, so rendering never waits on an image.  URLs that
+    serve the same bytes share one file.  Past ``budget`` bytes the least
+    recently shown images are deleted; the index lives in SQLite so it
+    survives restarts.
+    """
+
+    def __init__(self, root: str, index_path: str, budget: int, workers: int = 4):
+        os.makedirs(root, exist_ok=True)
+        os.makedirs(os.path.dirname(index_path), exist_ok=True)
+        self.root, self.budget = root, budget
+        self._db   = sqlite3.connect(index_path, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="images")
+        self._inflight: set  = set()
+        self._failed:   dict = {}
+        self._used:     dict = {}                       # url -> last shown, not yet written
+        self._lru  = OrderedDict()                      # url -> (digest, ext, bytes), oldest first
+        self._refs = Counter()                          # digest -> URLs using it
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS images ("
+            " url TEXT PRIMARY KEY, digest TEXT NOT NULL, ext TEXT NOT NULL,"
+            " bytes INTEGER NOT NULL, used REAL NOT NULL)")
+        for url, digest, ext, nbytes in self._db.execute(
+                "SELECT url, digest, ext, bytes FROM images ORDER BY used"):
+            if os.path.exists(os.path.join(root, digest + ext)):
+                self._lru[url] = (digest, ext, nbytes)
+                self._refs[digest] += 1
+        self._bytes = sum({d: n for d, _e, n in self._lru.values()}.values())
+
+    def files(self, url: str) -> tuple | None:
+        """``(thumbnail, original)`` file names under ``root``, or ``None`` while it is fetched."""
+        now = time.time()
+        with self._lock:
+            entry = self._lru.get(url)
+            if entry is not None:
+                self._lru.move_to_end(url)
+                self._used[url] = now
+                return self._names(*entry[:2])
+            if url in self._inflight or now - self._failed.get(url, 0) < _BACKGROUND_RETRY_AFTER:
+                return None
+            self._inflight.add(url)
+        self._pool.submit(self._fetch, url)
+        return None
+
+    def _names(self, digest: str, ext: str) -> tuple:
+        thumb = f"{digest}.t{ext}"
+        return (thumb if os.path.exists(os.path.join(self.root, thumb)) else digest + ext), digest + ext
+
+    def _write(self, name: str, data: bytes) -> int:
+        path = os.path.join(self.root, name)
+        if not os.path.exists(path):
+            tmp = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        return len(data)
+
+    def _thumbnail(self, data: bytes) -> bytes | None:
+        if Image is None:
+            return None
+        with Image.open(io.BytesIO(data)) as im:
+            if im.height <= _THUMB_HEIGHT:
+                return None
+            fmt = im.format
+            im.thumbnail((_THUMB_HEIGHT * 4, _THUMB_HEIGHT))
+            out = io.BytesIO()
+            im.save(out, format=fmt, quality=82, optimize=True)
+            return out.getvalue()
+
+    def _fetch(self, url: str) -> None:
+        try:
+            r = _http_pool().get(url, timeout=20)
+            if r.status_code != 200:
+                raise RuntimeError(f"HTTP {r.status_code} for {url}")
+            ctype  = (r.headers.get("Content-Type") or "").split(";")[0].strip()
+            ext    = _IMAGE_EXTS.get(ctype) or os.path.splitext(url.split("?")[0])[1][:5] or ".img"
+            digest = hashlib.sha256(r.content).hexdigest()[:32]
+            nbytes = self._write(digest + ext, r.content)
+            thumb  = self._thumbnail(r.content)
+            if thumb is not None:
+                nbytes += self._write(f"{digest}.t{ext}", thumb)
+        except Exception:
+            with self._lock:
+                self._inflight.discard(url)
+                self._failed[url] = time.time()
+            metrics.inc("image_cache_total", result="failed")
+            return
+        metrics.inc("image_cache_total", result="stored")
+        with self._lock:
+            self._inflight.discard(url)
+            self._lru[url] = (digest, ext, nbytes)
+            self._used[url] = time.time()
+            self._refs[digest] += 1
+            if self._refs[digest] == 1:
+                self._bytes += nbytes
+            evicted = self._evict()
+            used, self._used = self._used, {}
+            with self._db:      # commits, or rolls back so the connection stays usable
+                self._db.execute("BEGIN")
+                self._db.execute("INSERT OR REPLACE INTO images VALUES (?, ?, ?, ?, ?)",
+                                 (url, digest, ext, nbytes, used[url]))
+                self._db.executemany("UPDATE images SET used = ? WHERE url = ?",
+                                     [(t, u) for u, t in used.items() if u != url])
+                self._db.executemany("DELETE FROM images WHERE url = ?", [(u,) for u in evicted])
+
+    def _evict(self) -> list:
+        """Drop least recently shown URLs until under budget; a file goes with its last URL."""
+        evicted = []
+        while self._bytes > self.budget and len(self._lru) > 1:
+            url, (digest, ext, nbytes) = self._lru.popitem(last=False)
+            self._used.pop(url, None)
+            evicted.append(url)
+            self._refs[digest] -= 1
+            if self._refs[digest] == 0:
+                del self._refs[digest]
+                self._bytes -= nbytes
+                for name in (digest + ext, f"{digest}.t{ext}"):
+                    try:
+                        os.remove(os.path.join(self.root, name))
+                    except FileNotFoundError:
+                        pass
+            metrics.inc("image_cache_total", result="evicted")
+        return evicted
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"images": len(self._lru), "bytes": self._bytes, "fetching": len(self._inflight)}
+
+
+@_process_singleton
+def _image_cache() -> _ImageCache:
+    cache = _ImageCache(IMAGE_DIR, os.path.join(os.path.dirname(_CACHE_PATH), "images.sqlite3"), _IMAGE_BUDGET)
+    metrics.register_collector(lambda: {f"image_cache_{k}": v for k, v in cache.stats().items()})
+    return cache
+
+
+# ─────────────────────────────────────────────────────────────
+# Single-flight — concurrent fetches of the same section share one request
+# ─────────────────────────────────────────────────────────────
+class _SingleFlight:
+    """Run ``fn`` once per key at a time; callers arriving meanwhile get its result.
+
+    The first caller for a key does the work on its own thread; later ones
+    block on the same ``Future`` and see the same value or exception.
+    """
+
+    def __init__(self):
+        self._lock    = threading.Lock()
+        self._flights: dict = {}
+        self._stats   = {"fetches": 0, "coalesced": 0}
+
+    def do(self, key, fn, *args):
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = Future()
+            self._stats["fetches" if leader else "coalesced"] += 1
+        if not leader:
+            return flight.result()
+        try:
+            flight.set_result(fn(*args))
+        except BaseException as exc:
+            flight.set_exception(exc)
+        finally:
+            with self._lock:
+                del self._flights[key]
+        return flight.result()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._stats)
+
+
+@_process_singleton
+def _single_flight() -> _SingleFlight:
+    flights = _SingleFlight()
+    metrics.register_collector(lambda: {f"section_{k}": v for k, v in flights.stats().items()})
+    return flights
+
+
+def _fetch_and_store(url: str, asin: str | None, section: str) -> dict:
+    with metrics.trace(asin, section), metrics.timed("section_seconds", "section", "fetched", section=section):
+        fields = _SECTION_FETCHERS[section](url, asin)
+        if asin:
+            _product_cache().store(asin, section, fields)
+            if section in ("page", "used_offers"):
+                _record_price(asin)
+        return fields
+
+
+def _fetch_section(url: str, asin: str | None, section: str) -> dict:
+    """Fetch one section and cache it, joining any identical fetch already running."""
+    return _single_flight().do((asin or url, section), _fetch_and_store, url, asin, section)
+
+
+# ─────────────────────────────────────────────────────────────
+# Main scraper
+# ─────────────────────────────────────────────────────────────
+def _assemble(asin: str | None, sections: dict) -> dict:
+    """Flatten cached/fetched sections into the dict the renderers read."""
+    data = {k: v for k, v in sections.get("page", {}).items() if k != "_page_review_images"}
+    data["asin"] = asin or ""
+
+    product_img_set = set(data.get("images", []))
+    rev_imgs = (sections.get("page", {}).get("_page_review_images", [])
+                + sections.get("media_reviews", {}).get("_media_review_images", []))
+    data["review_images"] = [u for u in list(dict.fromkeys(rev_imgs)) if u not in product_img_set]
+
+    data["used_offers"]      = sections.get("used_offers", {}).get("used_offers", [])
+    data["review_sentiment"] = sections.get("sentiment", {}).get(
+        "review_sentiment", {key: [] for _star, key in _SENTIMENT_STARS})
+    return data
+
+
+def _fetch_sections(url: str, asin: str | None, todo: list, sections: dict) -> str | None:
+    """Fetch ``todo`` concurrently into ``sections``, caching each as soon as it lands.
+
+    Returns the error text when the product page itself could not be fetched.
+    """
+    # The sub-requests only need the ASIN, which is already in the URL,
+    # so they are fired alongside the main page instead of after it.
+    pool    = ThreadPoolExecutor(max_workers=len(todo), thread_name_prefix="fetch")
+    futures = {pool.submit(_fetch_section, url, asin, s): s for s in todo}
+    try:
+        for future in as_completed(futures):
+            section = futures[future]
+            try:
+                sections[section] = future.result()
+            except Exception as exc:
+                if section == "page":
+                    return str(exc)
+                continue   # optional section: keep the stale copy, if any
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+    return None
+
+
+# ─────────────────────────────────────────────────────────────
+# Background sections (progressive loading + stale-while-revalidate)
+# ─────────────────────────────────────────────────────────────
+# Output keys each section feeds; used to mark what is still loading or refreshing
+_SECTION_KEYS = {
+    "page":          ("name", "pricing", "average_rating", "total_reviews", "images", "customers_say",
+                      "seller", "arrival_date", "variants", "frequently_bought_together", "brand",
+                      "availability", "features", "description", "categories", "review_images"),
+    "media_reviews": ("review_images",),
+    "used_offers":   ("used_offers",),
+    "sentiment":     ("review_sentiment",),
+}
+_INTERNAL_KEYS = {"_page_review_images": "review_images", "_media_review_images": "review_images"}
+# The slow extras; the page section alone is enough for a first render
+_BACKGROUND_SECTIONS = ("media_reviews", "used_offers", "sentiment")
+_BACKGROUND_RETRY_AFTER = 60   # seconds before a failed background section is tried again
+
+
+def _stale_keys(cached: dict, sections: list) -> set:
+    return {_INTERNAL_KEYS.get(f, f) for s in sections for f in cached[s][1]}
+
+
+class _BackgroundFetcher:
+    """Sections fetched off the script thread, at most one in flight per (ASIN, section).
+
+    Each section is its own task, so it lands in the cache as soon as its
+    own request finishes rather than with the slowest of the batch.
+    """
+
+    def __init__(self, workers: int = 8):
+        self._pool     = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="background")
+        self._lock     = threading.Lock()
+        self._inflight: set  = set()
+        self._failed:   dict = {}
+
+    def submit(self, url: str, asin: str, sections) -> set:
+        """Start whichever of ``sections`` are not already running; returns those in flight."""
+        now = time.time()
+        with self._lock:
+            new = [s for s in sections if (asin, s) not in self._inflight
+                   and now - self._failed.get((asin, s), 0) >= _BACKGROUND_RETRY_AFTER]
+            self._inflight.update((asin, s) for s in new)
+        for section in new:
+            self._pool.submit(self._run, url, asin, section)
+        return self.inflight(asin)
+
+    def _run(self, url, asin, section):
+        try:
+            with _priority("background"):
+                _fetch_section(url, asin, section)
+            failed = False
+        except Exception:
+            failed = True
+        with self._lock:
+            self._inflight.discard((asin, section))
+            if failed:
+                self._failed[(asin, section)] = time.time()
+            else:
+                self._failed.pop((asin, section), None)
+
+    def inflight(self, asin: str) -> set:
+        with self._lock:
+            return {s for a, s in self._inflight if a == asin}
+
+
+@_process_singleton
+def _background_fetcher() -> _BackgroundFetcher:
+    return _BackgroundFetcher()
+
+
+# ─────────────────────────────────────────────────────────────
+# Watcher — keeps often-compared products fresh before anyone asks
+# ─────────────────────────────────────────────────────────────
+_WATCH_ENABLED  = os.environ.get("SCRAPER_WATCH", "0") != "0"       # the app watches opened products; off by default
+_WATCH_RATE     = float(os.environ.get("SCRAPER_WATCH_RATE", "20"))   # section refreshes per minute; 0 = off
+_WATCH_WORKERS  = 2
+_WATCH_MAX      = 500              # products watched; the least popular drop off
+_WATCH_HALF     = 3 * _DAY         # an open counts half as much after this long
+_WATCH_IDLE     = 14 * _DAY        # products not opened for this long are dropped
+_WATCH_SECTIONS = ("page", "used_offers")
+_WATCH_LEAD     = (0.7, 0.9)       # refresh at this share of the section's TTL, drawn per fetch
+_WATCH_TICK     = 5.0              # seconds between scheduling passes
+
+
+def _section_ttl(section: str) -> float:
+    return min(_field_ttl(k) for k in _SECTION_KEYS[section])
+
+
+class _Watcher:
+    """Refreshes watched products' price sections shortly before they expire.
+
+    ``hits`` counts a product's opens, decayed with a ``_WATCH_HALF``
+    half-life; products not opened for ``_WATCH_IDLE`` are dropped.  Only
+    sections already in the cache are refreshed — one nobody has asked
+    for is never fetched.  Each pass ranks the due sections by how far
+    into their TTL they are, weighted by popularity, and starts as many as
+    the per-minute budget and ``workers`` allow.  Requests go out at
+    ``watch`` priority, behind everything a user is waiting for.
+    """
+
+    def __init__(self, path: str, rate: float = _WATCH_RATE, workers: int = _WATCH_WORKERS):
+        self.rate, self.workers = rate, workers
+        self._db   = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="watch")
+        self._due:      dict = {}     # (asin, section) -> (fetched_at, refresh at)
+        self._inflight: set  = set()
+        self._failed:   dict = {}
+        self._tokens  = 1.0
+        self._stamp   = time.monotonic()
+        self._started = False
+        self._stats   = Counter()
+        with self._lock:
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS watchlist ("
+                " asin TEXT PRIMARY KEY, url TEXT NOT NULL, hits REAL NOT NULL, last_seen REAL NOT NULL)")
+
+    # Opens decayed to ``now``: 1 / (1 + age / half-life), cheap enough to run inside SQLite
+    _DECAYED = "hits * ? / (? + ? - last_seen)"
+
+    def watch(self, asin: str, url: str, now: float | None = None) -> None:
+        now = time.time() if now is None else now
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO watchlist VALUES (?, ?, 1, ?) ON CONFLICT (asin) DO UPDATE"
+                f" SET url = excluded.url, hits = {self._DECAYED} + 1, last_seen = excluded.last_seen",
+                (asin, url, now, _WATCH_HALF, _WATCH_HALF, now))
+            self._db.execute(
+                "DELETE FROM watchlist WHERE asin NOT IN"
+                f" (SELECT asin FROM watchlist ORDER BY {self._DECAYED} DESC, last_seen DESC LIMIT ?)",
+                (_WATCH_HALF, _WATCH_HALF, now, _WATCH_MAX))
+
+    def unwatch(self, asin: str) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM watchlist WHERE asin = ?", (asin,))
+
+    def watched(self, now: float | None = None) -> list:
+        """``(asin, url, decayed hits)`` per watched product, after dropping the idle ones."""
+        now = time.time() if now is None else now
+        with self._lock:
+            self._db.execute("DELETE FROM watchlist WHERE last_seen < ?", (now - _WATCH_IDLE,))
+            return self._db.execute(f"SELECT asin, url, {self._DECAYED} FROM watchlist",
+                                    (_WATCH_HALF, _WATCH_HALF, now)).fetchall()
+
+    def _refresh_at(self, asin: str, section: str, fetched: float) -> float:
+        known = self._due.get((asin, section))
+        if known is None or known[0] != fetched:
+            known = self._due[(asin, section)] = (fetched, fetched + _section_ttl(section) * random.uniform(*_WATCH_LEAD))
+        return known[1]
+
+    def tick(self, now: float | None = None) -> list:
+        """One scheduling pass; returns the ``(asin, section)`` refreshes it started."""
+        now  = time.time() if now is None else now
+        rows = self.watched(now)
+        with self._lock:
+            # Forget schedules and failures of products no longer watched
+            keep = {r[0] for r in rows}
+            for table in (self._due, self._failed):
+                for key in [k for k in table if k[0] not in keep]:
+                    del table[key]
+        if not rows:
+            return []
+        fetched = _product_cache().fetched_at([a for a, _u, _h in rows])
+        busy = {(a, s) for a in {r[0] for r in rows} for s in _background_fetcher().inflight(a)}
+        ranked = []
+        for asin, url, hits in rows:
+            for section in _WATCH_SECTIONS:
+                t = fetched.get((asin, section))
+                if (t is None or (asin, section) in self._inflight or (asin, section) in busy
+                        or now - self._failed.get((asin, section), 0) < _BACKGROUND_RETRY_AFTER):
+                    continue
+                if now < self._refresh_at(asin, section, t):
+                    continue
+                age = min(4.0, (now - t) / _section_ttl(section))
+                ranked.append((age * (1 + math.log1p(hits)), asin, url, section))
+        ranked.sort(reverse=True)
+
+        started = []
+        with self._lock:
+            mono = time.monotonic()
+            self._tokens = min(self.workers, self._tokens + (mono - self._stamp) * self.rate / 60)
+            self._stamp  = mono
+            for _score, asin, url, section in ranked:
+                if self._tokens < 1 or len(self._inflight) >= self.workers:
+                    break
+                self._tokens -= 1
+                self._inflight.add((asin, section))
+                started.append((asin, section))
+                self._pool.submit(self._refresh, url, asin, section)
+            self._stats["due"] = len(ranked)
+        return started
+
+    def _refresh(self, url: str, asin: str, section: str) -> None:
+        try:
+            with _priority("watch"):
+                _fetch_section(url, asin, section)
+            failed = False
+        except Exception:
+            failed = True
+        with self._lock:
+            self._inflight.discard((asin, section))
+            self._stats["failed" if failed else "refreshed"] += 1
+            if failed:
+                self._failed[(asin, section)] = time.time()
+            else:
+                self._failed.pop((asin, section), None)
+
+    def start(self) -> None:
+        """Run ``tick`` every few seconds on a daemon thread, once per process; no-op when the rate is 0."""
+        with self._lock:
+            if self._started or self.rate <= 0:
+                return
+            self._started = True
+        threading.Thread(target=self._loop, name="watcher", daemon=True).start()
+
+    def _loop(self) -> None:
+        while True:
+            try:
+                self.tick()
+            except Exception:
+                with self._lock:
+                    self._stats["errors"] += 1
+            time.sleep(_WATCH_TICK)
+
+    def stats(self) -> dict:
+        with self._lock:
+            n = self._db.execute("SELECT COUNT(*) FROM watchlist").fetchone()[0]
+            return {"watched": n, "refreshing": len(self._inflight), **self._stats}
+
+
+@_process_singleton
+def _watcher() -> _Watcher:
+    watcher = _Watcher(_CACHE_PATH)
+    metrics.register_collector(lambda: {f"watch_{k}": v for k, v in watcher.stats().items()})
+    return watcher
+
+
+def fetch_amazon_data(url: str, stale_ok: bool = False, background=(), sections=None) -> dict:
+    """Scraped product data for ``url``.
+
+    Cached by canonical ASIN, so any spelling of a product URL shares one
+    entry; only sections with an expired field go back to the network.
+    ``sections`` limits the result to those sections (the page is always
+    included); the default is all of them.
+
+    Sections named in ``background`` are never waited for: they are fetched
+    off-thread and listed under ``_pending`` until they land in the cache.
+    With ``stale_ok`` an expired section that is still cached is returned as
+    is — its keys listed under ``_stale`` — and refreshed in the background.
+    ``_inflight`` names every section still being fetched, and ``_version``
+    is the cache's write count for the product when it was read (see
+    ``_ProductCache.version``), so a caller can tell when partial results land.
+    """
+    wanted = {"page", *(_SECTION_FETCHERS if sections is None else sections)}
+    asin   = _asin_from_url(url)
+    t0     = time.perf_counter()
+    vers   = _product_cache().version(asin) if asin else 0
+    cached = {s: entry for s, entry in (_product_cache().load(asin) if asin else {}).items() if s in wanted}
+    metrics.observe("cache_load_seconds", time.perf_counter() - t0)
+    found  = {s: fields for s, (fields, _stale) in cached.items()}
+    todo   = [s for s in _SECTION_FETCHERS
+              if s in wanted and (s not in cached or cached[s][1]) and (asin or s == "page")]
+    for s in wanted:
+        result = "miss" if s not in cached else "stale" if cached[s][1] else "hit"
+        metrics.inc("cache_lookups_total", section=s, result=result)
+        metrics.event("cache", result, asin=asin, section=s)
+    if not todo:
+        return _assemble(asin, found)
+
+    deferred = [s for s in todo if asin and (s in background or (stale_ok and s in cached))]
+    blocking = [s for s in todo if s not in deferred]
+    if not stale_ok:
+        for s in deferred:
+            found.pop(s, None)
+    if blocking:
+        error = _fetch_sections(url, asin, blocking, found)
+        if error:
+            return {"_error": error}
+
+    data = _assemble(asin, found)
+    if deferred:
+        inflight = _background_fetcher().submit(url, asin, deferred)
+        markers  = {
+            "_version":  vers,
+            "_stale":    sorted(_stale_keys(cached, [s for s in deferred if s in found])),
+            "_pending":  sorted(s for s in deferred if s not in found and s in inflight),
+            "_inflight": sorted(inflight),
+        }
+        data.update({k: v for k, v in markers.items() if v})
+    return data
+
+
+# ─────────────────────────────────────────────────────────────
+# Product records — the compact, typed form a UI session keeps per column
+# ─────────────────────────────────────────────────────────────
+_EMPTY_MAPPING = types.MappingProxyType({})
+
+
+def _frozen(value):
+    """``value`` with every dict made a read-only proxy and every list a tuple."""
+    if isinstance(value, dict):
+        return types.MappingProxyType({k: _frozen(v) for k, v in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(_frozen(v) for v in value)
+    return value
+
+
+@dataclass(frozen=True, slots=True, weakref_slot=True)
+class ProductContent:
+    """A product's bulky parts; shared by every session showing it (see ``_ContentTable``).
+
+    Read-only all the way down — mappings are ``MappingProxyType``, sequences
+    tuples (``_frozen``) — since one session must not change what others see.
+    """
+    images:                     tuple   = ()
+    review_images:              tuple   = ()
+    features:                   tuple   = ()
+    description:                str     = ""
+    variants:                   Mapping = field(default_factory=lambda: _EMPTY_MAPPING)   # {type: (option, …)}
+    frequently_bought_together: tuple   = ()                                              # {"name", "price", "img"} each
+    used_offers:                tuple   = ()                                              # {"cond", "price", "ship"} each
+    review_sentiment:           Mapping = field(default_factory=lambda: _EMPTY_MAPPING)
+
+
+_NO_CONTENT     = ProductContent()
+_CONTENT_FIELDS = tuple(ProductContent.__dataclass_fields__)
+
+
+class _ContentTable:
+    """ASIN -> the ``ProductContent`` open sessions share, for as long as any of them holds it.
+
+    A new fetch gets the existing object back when nothing changed; when
+    something did, the parts that didn't are still the existing objects,
+    so a hundred sessions showing one product hold one copy of its images,
+    features and description.
+    """
+
+    def __init__(self):
+        self._lock    = threading.Lock()
+        self._content = weakref.WeakValueDictionary()
+        self._stats   = Counter()
+
+    def intern(self, asin: str, content: ProductContent) -> ProductContent:
+        if content == _NO_CONTENT:
+            return _NO_CONTENT
+        if not asin:
+            return content
+        with self._lock:
+            known = self._content.get(asin)
+            if known == content:
+                self._stats["shared"] += 1
+                return known
+            if known is not None:
+                content = ProductContent(**{f: getattr(known if getattr(known, f) == getattr(content, f) else content, f)
+                                            for f in _CONTENT_FIELDS})
+            self._content[asin] = content
+            self._stats["new"] += 1
+            return content
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"products": len(self._content), **self._stats}
+
+
+@_process_singleton
+def _content_table() -> _ContentTable:
+    table = _ContentTable()
+    metrics.register_collector(lambda: {f"shared_content_{k}": v for k, v in table.stats().items()})
+    return table
+
+
+@dataclass(slots=True)
+class ProductRecord:
+    """One product as the UI holds it: display strings, the numbers parsed from them, and fetch state.
+
+    Built from ``fetch_amazon_data``'s dict by ``from_data``.  The bulky
+    parts live in a shared ``ProductContent``; debug-only fields are left out.
+    """
+    url:            str = ""
+    asin:           str = ""
+    name:           str = "N/A"
+    pricing:        str = "N/A"          # as shown on the page, e.g. "$19.99"
+    price:          float | None = None
+    average_rating: str = "N/A"
+    rating:         float | None = None
+    total_reviews:  int | None = None
+    pct_5:          int | None = None    # share of 5★ reviews
+    pct_4:          int | None = None
+    arrival_date:   str = "N/A"
+    seller:         str = "N/A"
+    sold_by_amazon: bool = False
+    customers_say:  str = "N/A"
+    brand:          str = "N/A"
+    availability:   str = "N/A"
+    categories:     str = "N/A"
+    content:        ProductContent = _NO_CONTENT
+    # Fetch state, as the markers of the same names in fetch_amazon_data
+    error:          str | None = None
+    stale:          tuple = ()
+    pending:        tuple = ()
+    inflight:       tuple = ()
+    version:        int = 0
+
+    @classmethod
+    def from_data(cls, data: dict, url: str = "") -> "ProductRecord":
+        if "_error" in data:
+            return cls(url=url, error=data["_error"])
+        asin, seller = data.get("asin", ""), data.get("seller") or {}
+        content = ProductContent(
+            images=_frozen(data.get("images") or ()), review_images=_frozen(data.get("review_images") or ()),
+            features=_frozen(data.get("features") or ()), description=data.get("description") or "",
+            variants=_frozen(data.get("variants") or {}),
+            frequently_bought_together=_frozen(data.get("frequently_bought_together") or ()),
+            used_offers=_frozen(data.get("used_offers") or ()), review_sentiment=_frozen(data.get("review_sentiment") or {}))
+        return cls(
+            url=url, asin=asin, name=data.get("name") or "N/A",
+            pricing=data.get("pricing") or "N/A", price=_price_float(data.get("pricing", "")),
+            average_rating=data.get("average_rating") or "N/A", rating=_price_float(data.get("average_rating", "")),
+            total_reviews=data.get("total_reviews"),
+            pct_5=data.get("5_star_percentage"), pct_4=data.get("4_star_percentage"),
+            arrival_date=data.get("arrival_date") or "N/A",
+            seller=seller.get("name") or "N/A", sold_by_amazon=bool(seller.get("is_amazon")),
+            customers_say=(data.get("customers_say") or {}).get("summary") or "N/A",
+            brand=data.get("brand") or "N/A", availability=data.get("availability") or "N/A",
+            categories=data.get("categories") or "N/A",
+            content=_content_table().intern(asin, content),
+            stale=tuple(data.get("_stale", ())), pending=tuple(data.get("_pending", ())),
+            inflight=tuple(data.get("_inflight", ())), version=data.get("_version", 0))
+
+    # The shared parts, read as if they were the record's own
+    images                     = property(lambda self: self.content.images)
+    review_images              = property(lambda self: self.content.review_images)
+    features                   = property(lambda self: self.content.features)
+    description                = property(lambda self: self.content.description)
+    variants                   = property(lambda self: self.content.variants)
+    frequently_bought_together = property(lambda self: self.content.frequently_bought_together)
+    used_offers                = property(lambda self: self.content.used_offers)
+    review_sentiment           = property(lambda self: self.content.review_sentiment)
+
+    @property
+    def positive_pct(self) -> int | None:
+        """4★ + 5★ share, or ``None`` without a star breakdown."""
+        return (self.pct_4 or 0) + (self.pct_5 or 0) if (self.pct_4 or self.pct_5) else None
+
+
+# ─────────────────────────────────────────────────────────────
+# Best value scorer
+# ─────────────────────────────────────────────────────────────
+def _compute_best_value(records):
+    """Score each ``ProductRecord`` (``None`` for an empty column): price (40%) > review count (30%) > rating (20%) > arrival (10%)."""
+    def norm(vals, higher_better=True):
+        valid = [v for v in vals if v is not None]
+        if len(valid) < 2:
+            return [0.5 if v is not None else None for v in vals]
+        mn, mx = min(valid), max(valid)
+        if mx == mn:
+            return [0.5 if v is not None else None for v in vals]
+        return [((v - mn) / (mx - mn) if higher_better else (mx - v) / (mx - mn))
+                if v is not None else None for v in vals]
+
+    prices   = [r and r.price for r in records]
+    ratings  = [r and r.rating for r in records]
+    rev_cnts = [r and r.total_reviews for r in records]
+
+    # Arrival: extract first number (day of month) as a rough proxy for sooner = better
+    def _arrival_days(r):
+        m = re.search(r"\b(\d{1,2})\b", r.arrival_date) if r else None
+        return int(m.group(1)) if m else None
+    arrivals = [_arrival_days(r) for r in records]
+
+    p_norm = norm(prices,   higher_better=False)
+    r_norm = norm(ratings,  higher_better=True)
+    c_norm = norm(rev_cnts, higher_better=True)
+    a_norm = norm(arrivals, higher_better=False)
+
+    scores = []
+    for i in range(len(records)):
+        parts = [
+            (p_norm[i], 0.40),
+            (c_norm[i], 0.30),
+            (r_norm[i], 0.20),
+            (a_norm[i], 0.10),
+        ]
+        total_w = sum(w for v, w in parts if v is not None)
+        if total_w == 0:
+            scores.append(None)
+        else:
+            s = sum(v * w for v, w in parts if v is not None) / total_w
+            scores.append(round(s * 100))
+    return scores
+
+
+# ─────────────────────────────────────────────────────────────
+# CSV export helper
+# ─────────────────────────────────────────────────────────────
+_CSV_FIELDS = {
+    "Name":         lambda r: r.name,
+    "Price":        lambda r: r.pricing,
+    "Rating":       lambda r: r.average_rating,
+    "Reviews":      lambda r: "" if r.total_reviews is None else str(r.total_reviews),
+    "Brand":        lambda r: r.brand,
+    "Availability": lambda r: r.availability,
+    "Seller":       lambda r: r.seller,
+    "Arrival":      lambda r: r.arrival_date,
+    "Description":  lambda r: r.description[:200],
+    "URL":          lambda r: r.url,
+}
+
+def _csv_values(record: ProductRecord) -> list:
+    """``_CSV_FIELDS`` for one product; a failed fetch has only its URL."""
+    return [fn(record) if not record.error or label == "URL" else "" for label, fn in _CSV_FIELDS.items()]
+
+
+def _build_csv(records) -> str:
+    """One column per ``ProductRecord``."""
+    buf     = io.StringIO()
+    writer  = csv.writer(buf)
+    headers = ["Field"] + [f"Product {i+1}" for i in range(len(records))]
+    writer.writerow(headers)
+    columns = [_csv_values(r) for r in records]
+    for i, label in enumerate(_CSV_FIELDS):
+        writer.writerow([label] + [col[i] for col in columns])
+    return buf.getvalue()
+
+
+# ─────────────────────────────────────────────────────────────
+# Batch CLI
+# ─────────────────────────────────────────────────────────────
+def _input_url(line: str) -> str:
+    return f"{_AMAZON_BASE}/dp/{line}" if re.fullmatch(r"[A-Z0-9]{10}", line) else line
+
+
+def compare_many(urls, concurrency: int = 8, sections=None):
+    """Yield ``(url, data)`` for every URL, in completion order.
+
+    At most ``concurrency`` products are fetched at once and only a bounded
+    window of the input is read ahead, so arbitrarily long lists stream.
+    """
+    urls = iter(urls)
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="compare") as pool:
+        running: dict = {}
+        while True:
+            for url in urls:
+                running[pool.submit(fetch_amazon_data, url, sections=sections)] = url
+                if len(running) >= 2 * concurrency:
+                    break
+            if not running:
+                return
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield running.pop(future), future.result()
+
+
+def main(argv=None) -> int:
+    global _RECORD_PATH, _REPLAY_PATH, _REPLAY_LATENCY, _HOST_RATE, _SENTIMENT_PAGES
+    ap = argparse.ArgumentParser(
+        description="Fetch Amazon products headlessly and stream the results.",
+        epilog="Results are written in completion order, not input order: each JSONL line "
+               "carries its url and asin, each CSV row its URL and ASIN columns.  However "
+               "high --concurrency goes, requests to Amazon never exceed --rate per second.")
+    ap.add_argument("input", help="file with one product URL or ASIN per line ('-' for stdin)")
+    ap.add_argument("-c", "--concurrency", type=int, default=8, help="products fetched at once (default 8)")
+    ap.add_argument("--rate", type=float, default=_HOST_RATE,
+                    help="requests per second to the host, at most, shared by all products (default %(default)s)")
+    ap.add_argument("--sentiment-pages", type=int, default=_SENTIMENT_PAGES,
+                    help="review listing pages read per star rating for the sentiment keywords; "
+                         "each costs two requests per product (default %(default)s)")
+    ap.add_argument("-f", "--format", choices=("jsonl", "csv"), default="jsonl")
+    ap.add_argument("-o", "--output", default="-", help="output file (default stdout)")
+    ap.add_argument("--sections", default=",".join(_SECTION_FETCHERS),
+                    help="comma-separated sections to fetch (default all: %(default)s)")
+    ap.add_argument("--metrics", metavar="PATH",
+                    help="write the run's timings and counters as JSON to PATH ('-' for stderr)")
+    ap.add_argument("--record", metavar="ARCHIVE", help="append every HTTP exchange to ARCHIVE (.jsonl.gz)")
+    ap.add_argument("--replay", metavar="ARCHIVE", help="serve responses from ARCHIVE instead of the network")
+    ap.add_argument("--replay-latency", action="store_true", help="wait each response's recorded time on replay")
+    ap.add_argument("--watch", action="store_true",
+                    help="add the products to the watchlist and keep them fresh in the cache until interrupted")
+    args = ap.parse_args(argv)
+    if args.record and args.replay:
+        ap.error("--record and --replay are mutually exclusive")
+    if args.rate <= 0 or args.sentiment_pages < 1:
+        ap.error("--rate must be above 0 and --sentiment-pages at least 1")
+
+    _HOST_RATE, _SENTIMENT_PAGES = args.rate, args.sentiment_pages
+    _RECORD_PATH    = args.record or _RECORD_PATH
+    _REPLAY_PATH    = args.replay or _REPLAY_PATH
+    _REPLAY_LATENCY = args.replay_latency or _REPLAY_LATENCY
+    metrics.serve()   # /metrics when SCRAPER_METRICS_PORT is set
+
+    sections = [s.strip() for s in args.sections.split(",") if s.strip()]
+    unknown  = set(sections) - set(_SECTION_FETCHERS)
+    if unknown:
+        ap.error(f"unknown section(s): {', '.join(sorted(unknown))}")
+
+    src = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")
+    if args.watch:
+        if _WATCH_RATE <= 0:
+            ap.error("--watch needs SCRAPER_WATCH_RATE above 0")
+        with src:
+            for line in src:
+                url  = _input_url(line.strip())
+                asin = _asin_from_url(url) if line.strip() and not line.startswith("#") else None
+                if asin:
+                    _watcher().watch(asin, url)
+        _watcher().start()
+        try:
+            while True:
+                time.sleep(60)
+                print(json.dumps(_watcher().stats()), file=sys.stderr)
+        except KeyboardInterrupt:
+            return 0
+    out = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8", newline="")
+    urls = (_input_url(line.strip()) for line in src if line.strip() and not line.startswith("#"))
+    writer = None
+    if args.format == "csv":
+        writer = csv.writer(out)
+        writer.writerow(list(_CSV_FIELDS) + ["ASIN", "Error"])
+    failures = 0
+    try:
+        for url, data in compare_many(urls, args.concurrency, sections):
+            failures += "_error" in data
+            if writer:
+                writer.writerow(_csv_values(ProductRecord.from_data(data, url)) + [data.get("asin", ""), data.get("_error", "")])
+            else:
+                out.write(json.dumps({"url": url, **data}, ensure_ascii=False) + "\n")
+            out.flush()
+    finally:
+        if src is not sys.stdin: src.close()
+        if out is not sys.stdout: out.close()
+    if args.metrics:
+        dump = json.dumps(metrics.snapshot(), indent=1)
+        if args.metrics == "-":
+            print(dump, file=sys.stderr)
+        else:
+            with open(args.metrics, "w", encoding="utf-8") as f:
+                f.write(dump)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,257 @@
+# Hot-path timings and counters for the scraper and the UI.
+#
+# Everything is aggregated process-wide (Prometheus text format, served on
+# SCRAPER_METRICS_PORT when set) and, while a product is being fetched,
+# also logged to that product's trace for the Debug panel.
+
+import contextvars
+import http.server
+import os
+import sys
+import threading
+import time
+import types
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+
+_PREFIX       = "scraper_"
+_TRACE_EVENTS = 64    # per product
+_TRACE_ASINS  = 256   # products with a trace kept
+
+_lock        = threading.Lock()
+_counters:  dict = {}              # (name, labels) -> value
+_summaries: dict = {}              # (name, labels) -> [count, sum, max]
+_collectors: list = []             # callables returning {name: value}, read at scrape time
+_traces      = OrderedDict()       # asin -> deque of events
+_current     = contextvars.ContextVar("metrics_trace", default=None)
+_captured    = contextvars.ContextVar("metrics_capture", default=None)
+
+
+def _key(name: str, labels: dict) -> tuple:
+    return name, tuple(sorted(labels.items()))
+
+
+def inc(name: str, value: float = 1, **labels) -> None:
+    if (records := _captured.get()) is not None:
+        records.append(("inc", (name, value), labels)); return
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def observe(name: str, seconds: float, **labels) -> None:
+    if (records := _captured.get()) is not None:
+        records.append(("observe", (name, seconds), labels)); return
+    key = _key(name, labels)
+    with _lock:
+        s = _summaries.get(key)
+        if s is None:
+            _summaries[key] = [1, seconds, seconds]
+        else:
+            s[0] += 1; s[1] += seconds; s[2] = max(s[2], seconds)
+
+
+def register_collector(fn) -> None:
+    """``fn()`` -> ``{metric name: value}``, exported as gauges on every scrape."""
+    with _lock:
+        _collectors.append(fn)
+
+
+# ── Per-product traces ───────────────────────────────────
+@contextmanager
+def trace(asin: str | None, section: str):
+    """Attribute events logged on this thread to ``asin``/``section`` until exit."""
+    token = _current.set((asin, section))
+    try:
+        yield
+    finally:
+        _current.reset(token)
+
+
+def current():
+    """This thread's trace context, to hand to work running elsewhere (see ``adopt``)."""
+    return _current.get()
+
+
+def adopt(ctx) -> None:
+    """Make ``ctx`` the trace context of the running task for the rest of its life."""
+    _current.set(ctx)
+
+
+def current_section() -> str:
+    ctx = _current.get()
+    return ctx[1] if ctx else "other"
+
+
+def event(kind: str, what: str, seconds: float | None = None, asin=None, section=None, **extra) -> None:
+    """Log one event to the current product's trace, or to ``asin``/``section`` if given."""
+    if (records := _captured.get()) is not None:
+        records.append(("event", (kind, what, seconds, asin, section), extra)); return
+    ctx = _current.get()
+    asin, section = asin or (ctx and ctx[0]), section or (ctx and ctx[1])
+    if not asin:
+        return
+    entry = {"at": time.time(), "section": section, "kind": kind, "what": what, "seconds": seconds, **extra}
+    with _lock:
+        events = _traces.get(asin)
+        if events is None:
+            events = _traces[asin] = deque(maxlen=_TRACE_EVENTS)
+            if len(_traces) > _TRACE_ASINS:
+                _traces.popitem(last=False)
+        else:
+            _traces.move_to_end(asin)
+        events.append(entry)
+
+
+def product_trace(asin: str) -> list:
+    with _lock:
+        return list(_traces.get(asin, ()))
+
+
+@contextmanager
+def timed(name: str, kind: str, what: str, **labels):
+    """Time the block into summary ``name`` and the current trace."""
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        dt = time.perf_counter() - t0
+        observe(name, dt, **labels)
+        event(kind, what, dt)
+
+
+# ── Work done in another process ─────────────────────────
+@contextmanager
+def capture():
+    """Collect the block's metrics in a picklable list instead of recording them."""
+    records = []
+    token   = _captured.set(records)
+    try:
+        yield records
+    finally:
+        _captured.reset(token)
+
+
+def replay(records: list) -> None:
+    """Record what ``capture`` collected elsewhere, as if it had happened on this thread."""
+    calls = {"inc": inc, "observe": observe, "event": event}
+    for kind, args, labels in records:
+        calls[kind](*args, **labels)
+
+
+# ── Memory ───────────────────────────────────────────────
+def deep_size(obj, stop: tuple = ()) -> int:
+    """Approximate bytes held by ``obj`` and everything it reaches, each object counted once.
+
+    Instances of the ``stop`` types are neither counted nor followed, for
+    parts that are owned elsewhere (shared between sessions, say).
+    """
+    seen, todo, total = set(), [obj], 0
+    while todo:
+        o = todo.pop()
+        if id(o) in seen or isinstance(o, stop):
+            continue
+        seen.add(id(o))
+        total += sys.getsizeof(o)
+        if isinstance(o, types.MappingProxyType):   # its dict is reachable only through it
+            total += sys.getsizeof(o.copy())
+        if isinstance(o, (type, types.ModuleType, types.FunctionType)):
+            continue
+        if isinstance(o, (dict, types.MappingProxyType)):
+            todo.extend(o.keys()); todo.extend(o.values())
+        elif isinstance(o, (list, tuple, set, frozenset, deque)):
+            todo.extend(o)
+        else:
+            todo.extend(getattr(o, s) for c in type(o).__mro__ for s in getattr(c, "__slots__", ())
+                        if s != "__weakref__" and hasattr(o, s))
+            if hasattr(o, "__dict__"):
+                todo.append(o.__dict__)
+    return total
+
+
+# ── Export ───────────────────────────────────────────────
+def snapshot() -> dict:
+    """Every metric as plain data (for a JSON dump)."""
+    with _lock:
+        counters   = dict(_counters)
+        summaries  = {k: list(v) for k, v in _summaries.items()}
+        collectors = list(_collectors)
+    gauges = {}
+    for fn in collectors:
+        gauges.update(fn())
+    return {
+        "counters":  [{"name": n, "labels": dict(l), "value": v} for (n, l), v in sorted(counters.items())],
+        "summaries": [{"name": n, "labels": dict(l), "count": c, "sum": s, "max": m}
+                      for (n, l), (c, s, m) in sorted(summaries.items())],
+        "gauges":    gauges,
+    }
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+
+def render_text() -> str:
+    """Prometheus text exposition format."""
+    snap, lines, typed = snapshot(), [], set()
+    def _type(name, kind):
+        if name not in typed:
+            typed.add(name); lines.append(f"# TYPE {name} {kind}")
+    for c in snap["counters"]:
+        name = _PREFIX + c["name"]
+        _type(name, "counter")
+        lines.append(f"{name}{_labels(c['labels'])} {c['value']}")
+    for s in snap["summaries"]:
+        name = _PREFIX + s["name"]
+        _type(name, "summary")
+        lines.append(f"{name}_count{_labels(s['labels'])} {s['count']}")
+        lines.append(f"{name}_sum{_labels(s['labels'])} {s['sum']:.6f}")
+    for s in snap["summaries"]:
+        name = _PREFIX + s["name"] + "_max"
+        _type(name, "gauge")
+        lines.append(f"{name}{_labels(s['labels'])} {s['max']:.6f}")
+    for gname, value in sorted(snap["gauges"].items()):
+        name = _PREFIX + gname
+        _type(name, "gauge")
+        lines.append(f"{name} {value}")
+    return "\n".join(lines) + "\n"
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        body = render_text().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+_server = None
+
+
+def serve(port: int | None = None, host: str = "127.0.0.1"):
+    """Serve ``/metrics`` on a daemon thread, once per process.
+
+    ``port`` defaults to ``SCRAPER_METRICS_PORT``; without either this does
+    nothing.  Returns the server, or ``None``.
+    """
+    global _server
+    port = port if port is not None else int(os.environ.get("SCRAPER_METRICS_PORT", "0") or 0)
+    with _lock:
+        if _server is None and port:
+            _server = http.server.ThreadingHTTPServer((host, port), _Handler)
+            threading.Thread(target=_server.serve_forever, name="metrics", daemon=True).start()
+        return _server
@@ -0,0 +1,9 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+# Keep engine's process-wide singletons off the repo's own .cache; tests build their own instances
+os.environ.setdefault("PRODUCT_CACHE_PATH", os.path.join(tempfile.mkdtemp(), "products.sqlite3"))
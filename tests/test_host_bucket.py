@@ -0,0 +1,53 @@
+import asyncio
+import time
+
+import engine
+
+
+def test_burst_then_rate():
+    async def run():
+        bucket = engine._HostBucket(rate=20, burst=3)
+        t0 = time.monotonic()
+        for _ in range(3):
+            await bucket.take()
+        burst = time.monotonic() - t0
+        for _ in range(4):
+            await bucket.take()
+        return burst, time.monotonic() - t0
+
+    burst, total = asyncio.run(run())
+    assert burst < 0.05
+    assert 0.15 <= total < 1.0     # four tokens at 20/s past the burst
+
+
+def test_throttle_halves_the_rate_and_success_creeps_back():
+    bucket = engine._HostBucket(rate=16, burst=4)
+    bucket.throttled()
+    assert bucket.rate == 8 and bucket.tokens <= 0
+    for _ in range(10):
+        bucket.throttled()
+    assert bucket.rate == 1        # never below a sixteenth of the configured rate
+    bucket.succeeded()
+    assert bucket.rate == 2
+    for _ in range(20):
+        bucket.succeeded()
+    assert bucket.rate == 16
+
+
+def test_urgent_waiter_goes_first():
+    interactive, background = engine._PRIORITIES.index("interactive"), engine._PRIORITIES.index("background")
+
+    async def run():
+        bucket, order = engine._HostBucket(rate=10, burst=1), []
+        bucket.tokens = 0
+
+        async def take(priority, name):
+            await bucket.take(priority)
+            order.append(name)
+
+        first = asyncio.create_task(take(background, "background"))
+        await asyncio.sleep(0)      # the background request is already waiting
+        await asyncio.gather(first, take(interactive, "interactive"))
+        return order
+
+    assert asyncio.run(run()) == ["interactive", "background"]
@@ -0,0 +1,64 @@
+import os
+from types import SimpleNamespace
+
+import pytest
+
+import engine
+
+
+class _Host:
+    """Serves ``bodies[url]`` as a JPEG in place of the HTTP pool."""
+
+    def __init__(self, bodies):
+        self.bodies = bodies
+
+    def get(self, url, timeout):
+        return SimpleNamespace(status_code=200, headers={"Content-Type": "image/jpeg"}, content=self.bodies[url])
+
+
+@pytest.fixture
+def make_cache(tmp_path, monkeypatch):
+    bodies = {f"https://img/{name}.jpg": name.encode() * 1000 for name in "abcd"}
+    bodies["https://img/a-copy.jpg"] = bodies["https://img/a.jpg"]
+    monkeypatch.setattr(engine, "_http_pool", lambda: _Host(bodies))
+
+    def make(budget):
+        cache = engine._ImageCache(str(tmp_path / "img"), str(tmp_path / "index.sqlite3"), budget)
+        cache._thumbnail = lambda data: None
+        return cache
+    return make
+
+
+def test_least_recently_shown_is_evicted(make_cache):
+    cache = make_cache(budget=2500)
+    cache._fetch("https://img/a.jpg")
+    cache._fetch("https://img/b.jpg")
+    assert cache.files("https://img/a.jpg")          # shown: b is now the oldest
+    cache._fetch("https://img/c.jpg")
+    assert list(cache._lru) == ["https://img/a.jpg", "https://img/c.jpg"]
+    assert cache.stats()["bytes"] == 2000
+    assert len(os.listdir(cache.root)) == 2
+
+
+def test_urls_with_the_same_bytes_share_one_file(make_cache):
+    cache = make_cache(budget=2500)
+    for name in ("a", "b", "a-copy"):
+        cache._fetch(f"https://img/{name}.jpg")
+    assert cache._lru["https://img/a.jpg"] == cache._lru["https://img/a-copy.jpg"]
+    assert cache.stats()["bytes"] == 2000
+    cache._fetch("https://img/c.jpg")                 # a goes, freeing nothing while a-copy uses it, then b
+    assert list(cache._lru) == ["https://img/a-copy.jpg", "https://img/c.jpg"]
+    assert cache.stats()["bytes"] == 2000
+    assert os.path.exists(os.path.join(cache.root, cache.files("https://img/a-copy.jpg")[1]))
+
+
+def test_index_survives_a_restart_in_lru_order(make_cache):
+    cache = make_cache(budget=10_000)
+    for name in "abc":
+        cache._fetch(f"https://img/{name}.jpg")
+    cache.files("https://img/a.jpg")
+    cache._fetch("https://img/d.jpg")                 # writes a's last-shown time
+    reloaded = make_cache(budget=2500)
+    assert list(reloaded._lru) == [f"https://img/{name}.jpg" for name in "bcad"]
+    reloaded._fetch("https://img/a-copy.jpg")
+    assert list(reloaded._lru) == ["https://img/a.jpg", "https://img/d.jpg", "https://img/a-copy.jpg"]
@@ -0,0 +1,55 @@
+import os
+
+import pytest
+
+import engine
+
+T0 = 1_700_000_000.0
+
+
+@pytest.fixture
+def history(tmp_path):
+    return engine._PriceHistory(str(tmp_path / "history"))
+
+
+def test_range_reads_columns_between_two_times(history):
+    history.append("B000000001", 19.99, None, "In Stock", at=T0)
+    history.append("B000000001", 17.49, 12.0, "Only 2 left in stock", at=T0 + engine._DAY)
+    history.append("B000000001", None, 11.5, "Currently unavailable", at=T0 + 2 * engine._DAY)
+    assert history.range("B000000001") == {
+        "at":           [T0, T0 + engine._DAY, T0 + 2 * engine._DAY],
+        "new":          [19.99, 17.49, None],
+        "used":         [None, 12.0, 11.5],
+        "availability": ["in stock", "low stock", "unavailable"],
+    }
+    assert history.range("B000000001", T0 + engine._DAY, T0 + 2 * engine._DAY)["new"] == [17.49, None]
+    assert history.range("B000000001", T0 + 3 * engine._DAY)["at"] == []
+    assert history.range("B000000002")["at"] == []
+
+
+def test_unchanged_rows_are_written_at_most_hourly(history):
+    assert history.append("B000000001", 19.99, None, "In Stock", at=T0)
+    assert not history.append("B000000001", 19.99, None, "In Stock", at=T0 + 60)
+    assert history.append("B000000001", 18.99, None, "In Stock", at=T0 + 120)
+    assert history.append("B000000001", 18.99, None, "In Stock", at=T0 + 120 + engine._HISTORY_MIN_GAP)
+    assert len(history.range("B000000001")["at"]) == 3
+
+
+def test_rows_stay_in_time_order(history):
+    history.append("B000000001", 19.99, None, "In Stock", at=T0)
+    history.append("B000000001", 18.99, None, "In Stock", at=T0 - 60)   # a clock step back
+    assert history.range("B000000001")["at"] == [T0, T0]
+
+
+def test_series_reload_from_disk_and_ignore_a_torn_write(tmp_path):
+    root = str(tmp_path / "history")
+    first = engine._PriceHistory(root)
+    first.append("B000000001", 19.99, None, "In Stock", at=T0)
+    first.append("B000000001", 18.99, 9.5, "In Stock", at=T0 + 60)
+    with open(os.path.join(root, "B000000001.bin"), "ab") as f:
+        f.write(b"\x00" * (engine._HISTORY_RECORD.size - 3))
+    again = engine._PriceHistory(root, keep=1)
+    assert again.range("B000000001")["new"] == [19.99, 18.99]
+    again.range("B000000002")                    # pushes B000000001 out of memory
+    assert list(again._series) == ["B000000002"]
+    assert again.range("B000000001")["used"] == [None, 9.5]
@@ -0,0 +1,61 @@
+import sqlite3
+import time
+
+import pytest
+
+import engine
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return engine._ProductCache(str(tmp_path / "products.sqlite3"))
+
+
+def test_each_field_goes_stale_on_its_own_ttl(cache):
+    cache.store("B000000001", "page", {"name": "Lamp", "pricing": "$10.00", "average_rating": "4.5",
+                                       "5_star_percentage": 70}, fetched_at=time.time() - 20 * engine._MINUTE)
+    fields, stale = cache.load("B000000001")["page"]
+    assert fields["name"] == "Lamp" and fields["5_star_percentage"] == 70
+    assert stale == {"pricing"}
+
+    cache.store("B000000001", "page", {"name": "Lamp", "average_rating": "4.5", "5_star_percentage": 70},
+                fetched_at=time.time() - 13 * engine._HOUR)
+    assert cache.load("B000000001")["page"][1] == {"average_rating", "5_star_percentage"}
+
+
+def test_fetched_at_zero_reads_as_stale(cache):
+    cache.store("B000000001", "sentiment", {"review_sentiment": {"positive": ["bright"]}}, fetched_at=0)
+    assert cache.load("B000000001")["sentiment"][1] == {"review_sentiment"}
+
+
+def test_store_replaces_the_section_only(cache):
+    cache.store("B000000001", "page", {"name": "Lamp", "brand": "Acme"})
+    cache.store("B000000001", "used_offers", {"used_offers": []})
+    cache.store("B000000001", "page", {"name": "Desk lamp"})
+    sections = cache.load("B000000001")
+    assert sections["page"] == ({"name": "Desk lamp"}, set())
+    assert "used_offers" in sections
+    assert cache.version("B000000001") == 3
+
+
+def test_invalidate_drops_only_the_given_sections(cache):
+    cache.store("B000000001", "page", {"name": "Lamp"})
+    cache.store("B000000001", "used_offers", {"used_offers": []})
+    cache.store("B000000002", "page", {"name": "Chair"})
+    cache.invalidate("B000000001", ["used_offers"])
+    assert set(cache.load("B000000001")) == {"page"}
+    cache.invalidate("B000000001")
+    assert cache.load("B000000001") == {}
+    assert cache.value("B000000002", "page", "name") == "Chair"
+
+
+def test_a_failed_store_rolls_back_and_leaves_the_cache_usable(cache):
+    cache.store("B000000001", "page", {"name": "Lamp"})
+    cache._db.execute("CREATE TRIGGER boom BEFORE INSERT ON product_fields WHEN NEW.value = '\"boom\"'"
+                      " BEGIN SELECT RAISE(ABORT, 'boom'); END")
+    with pytest.raises(sqlite3.IntegrityError):
+        cache.store("B000000001", "page", {"name": "boom"})     # fails after the DELETE
+    assert cache.load("B000000001")["page"][0] == {"name": "Lamp"}
+    cache.store("B000000001", "page", {"name": "Desk lamp"})
+    assert cache.load("B000000001")["page"][0] == {"name": "Desk lamp"}
+    assert cache.version("B000000001") == 2
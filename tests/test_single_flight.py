@@ -0,0 +1,47 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import engine
+
+
+def test_concurrent_callers_share_one_call():
+    flights, started, release, calls = engine._SingleFlight(), threading.Event(), threading.Event(), []
+
+    def fetch(asin):
+        calls.append(asin)
+        started.set()
+        release.wait(5)
+        return {"name": asin}
+
+    with ThreadPoolExecutor(4) as ex:
+        leader = ex.submit(flights.do, ("B000000001", "page"), fetch, "B000000001")
+        started.wait(5)
+        followers = [ex.submit(flights.do, ("B000000001", "page"), fetch, "B000000001") for _ in range(3)]
+        while flights.stats()["coalesced"] < 3:
+            time.sleep(0.01)
+        release.set()
+        results = [f.result() for f in [leader, *followers]]
+    assert calls == ["B000000001"]
+    assert all(r is results[0] for r in results)
+    assert flights.stats() == {"fetches": 1, "coalesced": 3}
+
+
+def test_exception_reaches_every_caller_and_the_key_is_freed():
+    flights = engine._SingleFlight()
+
+    def fail():
+        raise engine.ThrottledError("HTTP 503")
+
+    with pytest.raises(engine.ThrottledError):
+        flights.do("k", fail)
+    assert flights.do("k", lambda: 1) == 1      # a later call runs afresh
+    assert flights.stats() == {"fetches": 2, "coalesced": 0}
+
+
+def test_different_keys_do_not_wait_on_each_other():
+    flights = engine._SingleFlight()
+    assert [flights.do(k, str.upper, k) for k in ("a", "b")] == ["A", "B"]
+    assert flights.stats()["fetches"] == 2
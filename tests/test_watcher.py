@@ -0,0 +1,68 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import engine
+
+T0  = time.time()
+TTL = engine._section_ttl("page")
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    cache = engine._ProductCache(str(tmp_path / "products.sqlite3"))
+    monkeypatch.setattr(engine, "_product_cache", lambda: cache)
+    monkeypatch.setattr(engine, "_background_fetcher", lambda: SimpleNamespace(inflight=lambda asin: set()))
+    monkeypatch.setattr(engine, "_WATCH_LEAD", (0.8, 0.8))
+    return cache
+
+
+@pytest.fixture
+def watcher(tmp_path, cache):
+    watcher = engine._Watcher(str(tmp_path / "products.sqlite3"), rate=60, workers=4)
+    watcher._tokens = 4
+    watcher.submitted = []
+    watcher._pool = SimpleNamespace(submit=lambda fn, *args: watcher.submitted.append(args))
+    return watcher
+
+
+def test_only_cached_sections_near_expiry_are_refreshed(watcher, cache):
+    watcher.watch("B000000001", "https://www.amazon.com/dp/B000000001", now=T0)
+    assert watcher.tick(now=T0) == []                       # nothing cached: nothing fetched
+    cache.store("B000000001", "page", {"pricing": "$10.00"}, fetched_at=T0)
+    assert watcher.tick(now=T0 + 0.5 * TTL) == []           # cached, not yet due
+    assert watcher.tick(now=T0 + 0.85 * TTL) == [("B000000001", "page")]
+    assert watcher.submitted == [("https://www.amazon.com/dp/B000000001", "B000000001", "page")]
+    assert watcher.tick(now=T0 + 0.9 * TTL) == []           # already in flight
+
+
+def test_popular_and_overdue_sections_go_first(watcher, cache):
+    watcher.workers = 1
+    for asin, opens in (("B000000001", 1), ("B000000002", 5)):
+        for _ in range(opens):
+            watcher.watch(asin, f"https://www.amazon.com/dp/{asin}", now=T0)
+        cache.store(asin, "page", {"pricing": "$10.00"}, fetched_at=T0)
+    assert watcher.tick(now=T0 + TTL) == [("B000000002", "page")]
+
+
+def test_opens_decay_and_idle_products_drop_out(watcher, cache):
+    watcher.watch("B000000001", "u1", now=T0)
+    watcher.watch("B000000001", "u1", now=T0 + engine._WATCH_HALF)
+    watcher.watch("B000000002", "u2", now=T0 + engine._WATCH_IDLE)
+    hits = {asin: h for asin, _url, h in watcher.watched(now=T0 + engine._WATCH_IDLE)}
+    assert hits["B000000001"] == pytest.approx(1.5 * 3 / 14)  # 1.5 at the second open, then 11 days on
+    assert hits["B000000002"] == 1
+
+    cache.store("B000000001", "page", {"pricing": "$10.00"}, fetched_at=T0)
+    watcher.tick(now=T0 + engine._WATCH_HALF + 0.1 * TTL)
+    assert ("B000000001", "page") in watcher._due
+    watcher.tick(now=T0 + engine._WATCH_HALF + engine._WATCH_IDLE + 1)
+    assert [r[0] for r in watcher.watched(now=T0 + engine._WATCH_HALF + engine._WATCH_IDLE + 1)] == ["B000000002"]
+    assert ("B000000001", "page") not in watcher._due
+
+
+def test_start_is_a_no_op_at_rate_zero(tmp_path):
+    watcher = engine._Watcher(str(tmp_path / "products.sqlite3"), rate=0)
+    watcher.start()
+    assert not watcher._started